@@ -3,6 +3,9 @@ import os
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Django system checks import the URLconf and with it the whole API, which
+# workers never use. The checks already run when the backend migrates.
+os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
 
 app = Celery('backend')
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -51,6 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.tracing.TraceMiddleware',
+    'main.middleware.MetricsMiddleware',
+    'main.middleware.NPlusOneMiddleware',
+    'main.db_router.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "allauth.account.middleware.AccountMiddleware",
+    'main.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -85,6 +90,17 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Each process keeps a pool of connections (psycopg_pool) instead of opening
+# one per request. Size it to the threads that query at once: sync views run
+# on asgiref's thread pool (ASGI_THREADS, same default as asgiref), while a
+# Celery prefork child runs one task at a time (compose sets
+# DB_POOL_MAX_SIZE=2 there). DB_POOL_MAX_SIZE=0 disables pooling, e.g. behind
+# PgBouncer, and falls back to persistent connections with health checks.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', min(32, (os.cpu_count() or 1) + 4)))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', ASGI_THREADS))
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', min(2, DB_POOL_MAX_SIZE)))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+
 if os.environ.get('DB_NAME'):
     DATABASES = {
         'default': {
@@ -92,17 +108,74 @@ if os.environ.get('DB_NAME'):
             'NAME': os.environ.get('DB_NAME'),
             'USER': os.environ.get('DB_USER'),
             'PASSWORD': os.environ.get('DB_PASSWORD'),
-            'HOST': 'db',
+            'HOST': os.environ.get('DB_HOST', 'db'),
             'PORT': os.environ.get('DB_PORT', '5432'),
         }
     }
+    if DB_POOL_MAX_SIZE > 0:
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': DB_POOL_MIN_SIZE,
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': DB_POOL_TIMEOUT,
+                'max_idle': 300,  # close connections idle for 5 minutes, down to min_size
+                'max_lifetime': 1800,  # recycle connections every 30 minutes
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 60
+    # With a pool, Django has it run ConnectionPool.check_connection before handing out a connection
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    # Streaming replicas of the primary, comma-separated hosts -> aliases replica1, replica2, ...
+    READ_REPLICAS = []
+    for index, host in enumerate(h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+        READ_REPLICAS.append(f'replica{index + 1}')
+        DATABASES[READ_REPLICAS[-1]] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+        },
+        # Stand-in replica for the routing tests, which enable it with override_settings.
+        # Its test database is created from the models, not by running the data migrations.
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db-replica.sqlite3',
+            'TEST': {'MIGRATE': False},
+        },
     }
+    READ_REPLICAS = []
+
+# Read replicas (see main.db_router): GET requests to these URL route templates
+# read from a replica, unless the client wrote within READ_REPLICA_PIN_SECONDS.
+DATABASE_ROUTERS = ['main.db_router.ReplicaRouter']
+READ_REPLICA_PIN_SECONDS = int(os.environ.get('READ_REPLICA_PIN_SECONDS', '10'))
+READ_REPLICA_ROUTES = [
+    'api/events',
+    'api/event/<event_id>',
+    'api/event/<event_id>/speakers',
+    'api/institutions',
+    # Staff reports. Not the dashboard's api/event/<event_id>/stats: it creates a missing counters row.
+    'api/event/<event_id>/payments/summary',
+    'api/event/<event_id>/payments/export',
+    'api/admin/payments/summary',
+    'api/admin/payments/export',
+]
+
+# The default cache is per-process. "shared" lives in the database (run
+# createcachetable), so web processes and Celery workers see the same entries;
+# use it for values another process must be able to invalidate.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
 
 
 
@@ -220,6 +293,10 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=4, minute=0),  # Run daily at 4:00 AM UTC
         'kwargs': {'min_age_hours': 24},  # Only delete files older than 24 hours
     },
+    'reconcile-event-counters-hourly': {
+        'task': 'main.tasks.reconcile_event_counters',
+        'schedule': crontab(minute=30),  # Run hourly at :30
+    },
 }
 
 # Toss Payments Configuration
@@ -234,20 +311,54 @@ PAYPAL_API_URL = os.environ.get('PAYPAL_API_URL', 'https://api-m.sandbox.paypal.
 # Open Exchange Rates API (for currency conversion)
 OPENEXCHANGERATES_APP_ID = os.environ.get('OPENEXCHANGERATES_APP_ID', '')
 
+# Metrics: each process (web, celery) writes snapshots here; /api/metrics merges them.
+# Leave unset to only expose the metrics of the process serving the request.
+METRICS_DIR = os.environ.get('METRICS_DIR', None)
+
+# N+1 query detection: 'log' warns, 'raise' fails the request (tests), 'off' disables.
+# A query shape repeated from one call site more than NPLUSONE_THRESHOLD times is reported.
+# Detection walks the stack on every query, so it is off unless DEBUG or set explicitly.
+NPLUSONE_MODE = os.environ.get('NPLUSONE_MODE', 'log' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', '5'))
+
+# Request profiling: staff can profile any /api/ request with the X-Profile header or
+# ?_profile=cprofile|sample; PROFILING_SAMPLE_RATE (0-1) profiles a random share of requests.
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '50'))
+
 ADMIN_PAGE_NAME = os.environ.get('DJANGO_ADMIN_PAGE_NAME', 'djangoadmin')
 SITE_ID = 1
 
+# Spans (request, SQL, template, HTTP client, SMTP, Celery task) are appended here as JSON lines.
+# Off unless set: the file is never rotated, so enable it while investigating, not permanently.
+TRACE_FILE = os.environ.get('TRACE_FILE') or None
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "json": {
+            "()": "main.tracing.JsonFormatter",
+        },
+    },
+    "filters": {
+        "trace_id": {
+            "()": "main.tracing.TraceIdFilter",
+        },
+    },
     "handlers": {
         'console':{
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
+            'formatter': 'json',
+            'filters': ['trace_id'],
         },
         "file": {
             "class": "logging.FileHandler",
             "filename": os.environ.get('LOG_FILE', "/dev/null"),
+            'formatter': 'json',
+            'filters': ['trace_id'],
         },
     },
     "loggers": {
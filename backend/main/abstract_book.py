@@ -0,0 +1,371 @@
+"""
+Abstract book compilation.
+
+compile_book() turns all abstracts of an event into one HTML or DOCX
+document: talks first, then posters whose authors asked for a short talk,
+then the other posters, each group ordered by title, with a table of
+contents and an author index. Abstract files are converted in a process
+pool, as conversion is CPU-bound Python; the pool is billiard's, as the
+prefork Celery worker's processes are daemonic and multiprocessing does
+not let those start children. The HTML is kept in AbstractRendering and
+reused on later runs while the file is unchanged; abstract_bodies() shares
+it with the API's abstract bodies.
+Progress is written to the AbstractBook row, which the API polls.
+"""
+import html
+import io
+import logging
+import os
+import time
+import uuid
+from html.parser import HTMLParser
+
+import billiard
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from main.models import AbstractBook, AbstractRendering
+from main.converters import docx_to_html, odt_to_html
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = [
+    # (key, heading, number prefix)
+    ('talks', 'Talks', 'T'),
+    ('short_talks', 'Posters with short talks', 'S'),
+    ('posters', 'Posters', 'P'),
+]
+PROGRESS_INTERVAL = 1.0  # Seconds between progress writes
+CONVERSION_ERROR = '<p>This abstract could not be converted.</p>'
+
+
+def convert_file(full_path):
+    """HTML of a DOCX or ODT abstract file (run in the process pool)"""
+    if full_path.endswith('.docx'):
+        return docx_to_html(full_path)
+    if full_path.endswith('.odt'):
+        return odt_to_html(full_path)
+    return ''
+
+
+def _convert(item):
+    """(abstract id, HTML or CONVERSION_ERROR) for an (abstract id, file path) pair"""
+    abstract_id, full_path = item
+    try:
+        return abstract_id, convert_file(full_path)
+    except Exception:
+        logger.exception("Could not convert abstract %s", abstract_id)
+        return abstract_id, CONVERSION_ERROR
+
+
+def convert_files(items, workers):
+    """
+    Yields (abstract id, HTML or CONVERSION_ERROR) for (abstract id, file
+    path) pairs, in order, converting them in `workers` processes
+    """
+    if workers > 1 and len(items) > 1:
+        pool = billiard.Pool(min(workers, len(items)))
+        try:
+            # One apply_async per file: billiard only counts results it can tie to a worker, and
+            # a worker waits up to 30 seconds for its results to be counted before it exits
+            results = [pool.apply_async(_convert, (item,)) for item in items]
+            for result in results:
+                yield result.get()
+        finally:
+            # Let the workers exit on their own: terminate() can kill one holding the task queue's
+            # lock, leaving the others blocked on it
+            pool.close()
+            pool.join()
+    else:
+        for item in items:
+            yield _convert(item)
+
+
+def _source(file_path):
+    """Identifies the version of the file an abstract's HTML was converted from"""
+    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return full_path, None
+    return full_path, f'{file_path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def abstract_bodies(items):
+    """
+    {abstract id: HTML, or None if the file could not be converted} for
+    (abstract id, file path) pairs, as the API serves abstract bodies:
+    renderings of unchanged files are reused, the rest are converted in
+    this process and stored for the next request or book
+    """
+    cached = {r.abstract_id: r for r in AbstractRendering.objects.filter(abstract_id__in=[i for i, _ in items])}
+    result, converted = {}, []
+    for abstract_id, file_path in items:
+        full_path, source = _source(file_path)
+        rendering = cached.get(abstract_id)
+        if source is None:
+            result[abstract_id] = None
+        elif rendering is not None and rendering.source == source:
+            result[abstract_id] = rendering.html
+        else:
+            html_or_error = _convert((abstract_id, full_path))[1]
+            if html_or_error == CONVERSION_ERROR:
+                result[abstract_id] = None
+            else:
+                result[abstract_id] = html_or_error
+                converted.append(AbstractRendering(abstract_id=abstract_id, source=source, html=html_or_error))
+    AbstractRendering.objects.bulk_create(
+        converted, batch_size=500,
+        update_conflicts=True, unique_fields=['abstract'], update_fields=['source', 'html'],
+    )
+    return result
+
+
+def _section(abstract):
+    if abstract.type == 'speaker':
+        return 'talks'
+    return 'short_talks' if abstract.wants_short_talk else 'posters'
+
+
+def book_entries(abstracts):
+    """
+    The book's entries in order: dicts with the abstract, its number and
+    section key. `abstracts` must have their attendee loaded.
+    """
+    order = {key: index for index, (key, _, _) in enumerate(SECTIONS)}
+    prefixes = {key: prefix for key, _, prefix in SECTIONS}
+    entries, numbers = [], {}
+    for abstract in sorted(abstracts, key=lambda a: (order[_section(a)], a.title.casefold(), a.id)):
+        section = _section(abstract)
+        numbers[section] = numbers.get(section, 0) + 1
+        entries.append({'abstract': abstract, 'section': section, 'number': f'{prefixes[section]}{numbers[section]}'})
+    return entries
+
+
+def _author(abstract):
+    attendee = abstract.attendee
+    if attendee is None:
+        return '', ''
+    return attendee.name, attendee.institute
+
+
+def author_index(entries):
+    """[(author, institute, [numbers])] sorted by last name, then first name"""
+    authors = {}
+    for entry in entries:
+        attendee = entry['abstract'].attendee
+        if attendee is None:
+            continue
+        key = (attendee.last_name.casefold(), attendee.first_name.casefold(), attendee.name, attendee.institute)
+        authors.setdefault(key, []).append(entry['number'])
+    return [(key[2], key[3], numbers) for key, numbers in sorted(authors.items())]
+
+
+class _Progress:
+    def __init__(self, book):
+        self.book = book
+        self.written = 0.0
+
+    def update(self, converted, force=False):
+        now = time.monotonic()
+        if force or now - self.written >= PROGRESS_INTERVAL:
+            AbstractBook.objects.filter(id=self.book.id).update(converted=converted)
+            self.written = now
+
+
+def render_abstracts(book, abstracts, workers):
+    """
+    {abstract id: HTML} for `abstracts`, reusing cached renderings of
+    unchanged files and converting the rest with `workers` processes
+    """
+    cached = {r.abstract_id: r for r in AbstractRendering.objects.filter(abstract__in=abstracts)}
+    result, pending, reused = {}, {}, 0
+    for abstract in abstracts:
+        full_path, source = _source(abstract.file_path)
+        rendering = cached.get(abstract.id)
+        if source is None:
+            result[abstract.id] = CONVERSION_ERROR
+        elif rendering is not None and rendering.source == source:
+            result[abstract.id] = rendering.html
+            reused += 1
+        else:
+            pending[abstract.id] = (full_path, source)
+    AbstractBook.objects.filter(id=book.id).update(total=len(abstracts), converted=len(result), reused=reused)
+
+    progress = _Progress(book)
+    converted = []
+
+    def done(abstract_id, html_or_error):
+        result[abstract_id] = html_or_error
+        if html_or_error != CONVERSION_ERROR:
+            converted.append(AbstractRendering(
+                abstract_id=abstract_id, source=pending[abstract_id][1], html=html_or_error,
+            ))
+        progress.update(len(result))
+
+    items = [(abstract_id, full_path) for abstract_id, (full_path, _) in pending.items()]
+    for abstract_id, html_or_error in convert_files(items, workers):
+        done(abstract_id, html_or_error)
+
+    AbstractRendering.objects.bulk_create(
+        converted, batch_size=500,
+        update_conflicts=True, unique_fields=['abstract'], update_fields=['source', 'html'],
+    )
+    progress.update(len(result), force=True)
+    return result
+
+
+def build_html(event, entries, bodies):
+    """The book as a standalone HTML document"""
+    headings = {key: heading for key, heading, _ in SECTIONS}
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{html.escape(event.name)} - Abstract Book</title></head><body>',
+        f'<h1>{html.escape(event.name)}</h1>',
+        '<nav id="contents"><h2>Contents</h2>',
+    ]
+    section = None
+    for entry in entries:
+        if entry['section'] != section:
+            if section is not None:
+                parts.append('</ol>')
+            section = entry['section']
+            parts.append(f'<h3>{headings[section]}</h3><ol>')
+        parts.append(
+            f'<li><a href="#abstract-{entry["number"]}">{entry["number"]}. {html.escape(entry["abstract"].title)}</a></li>'
+        )
+    if section is not None:
+        parts.append('</ol>')
+    parts.append('</nav>')
+
+    section = None
+    for entry in entries:
+        abstract = entry['abstract']
+        if entry['section'] != section:
+            section = entry['section']
+            parts.append(f'<h2>{headings[section]}</h2>')
+        author, institute = _author(abstract)
+        parts.append(
+            f'<article id="abstract-{entry["number"]}">'
+            f'<h3>{entry["number"]}. {html.escape(abstract.title)}</h3>'
+            f'<p class="authors">{html.escape(author)}'
+            f'{f", <i>{html.escape(institute)}</i>" if institute else ""}</p>'
+            f'{bodies[abstract.id]}</article>'
+        )
+
+    parts.append('<section id="author-index"><h2>Author Index</h2><ul>')
+    for author, institute, numbers in author_index(entries):
+        links = ', '.join(f'<a href="#abstract-{number}">{number}</a>' for number in numbers)
+        parts.append(f'<li>{html.escape(author)} ({html.escape(institute)}): {links}</li>')
+    parts.append('</ul></section></body></html>')
+    return ''.join(parts)
+
+
+class _DocxWriter(HTMLParser):
+    """Adds the HTML produced by docx_to_html()/odt_to_html() to a python-docx document"""
+    FORMATS = {'b': 'bold', 'i': 'italic', 'u': 'underline', 'sub': 'subscript', 'sup': 'superscript'}
+
+    def __init__(self, document):
+        super().__init__()
+        self.document = document
+        self.paragraph = None
+        self.open = []
+
+    def handle_starttag(self, tag, attrs):
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+        if tag == 'p':
+            self.paragraph = self.document.add_paragraph()
+            style = dict(attrs).get('style') or ''
+            alignment = style.partition('text-align:')[2].strip(' ;')
+            self.paragraph.alignment = {
+                'center': WD_ALIGN_PARAGRAPH.CENTER, 'right': WD_ALIGN_PARAGRAPH.RIGHT,
+                'justify': WD_ALIGN_PARAGRAPH.JUSTIFY,
+            }.get(alignment)
+        elif tag == 'br' and self.paragraph is not None:
+            self.paragraph.add_run().add_break()
+        elif tag in self.FORMATS:
+            self.open.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag == 'p':
+            self.paragraph = None
+        elif tag in self.FORMATS and tag in self.open:
+            self.open.remove(tag)
+
+    def handle_data(self, data):
+        if self.paragraph is None:
+            self.paragraph = self.document.add_paragraph()
+        run = self.paragraph.add_run(data)
+        for tag in self.open:
+            if tag in ('sub', 'sup'):
+                setattr(run.font, self.FORMATS[tag], True)
+            else:
+                setattr(run, self.FORMATS[tag], True)
+
+
+def build_docx(event, entries, bodies):
+    """The book as DOCX bytes"""
+    import docx
+
+    headings = {key: heading for key, heading, _ in SECTIONS}
+    document = docx.Document()
+    document.add_heading(event.name, level=0)
+
+    document.add_heading('Contents', level=1)
+    section = None
+    for entry in entries:
+        if entry['section'] != section:
+            section = entry['section']
+            document.add_heading(headings[section], level=2)
+        document.add_paragraph(f'{entry["number"]}. {entry["abstract"].title}')
+
+    section = None
+    for entry in entries:
+        abstract = entry['abstract']
+        if entry['section'] != section:
+            section = entry['section']
+            document.add_page_break()
+            document.add_heading(headings[section], level=1)
+        document.add_heading(f'{entry["number"]}. {abstract.title}', level=2)
+        author, institute = _author(abstract)
+        authors = document.add_paragraph()
+        authors.add_run(author)
+        if institute:
+            authors.add_run(f', {institute}').italic = True
+        writer = _DocxWriter(document)
+        writer.feed(bodies[abstract.id])
+        writer.close()
+
+    document.add_page_break()
+    document.add_heading('Author Index', level=1)
+    for author, institute, numbers in author_index(entries):
+        document.add_paragraph(f'{author} ({institute}): {", ".join(numbers)}')
+
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def compile_book(book_id, workers=None):
+    """Compile the AbstractBook `book_id`, recording progress and the result on it"""
+    book = AbstractBook.objects.select_related('event').get(id=book_id)
+    AbstractBook.objects.filter(id=book.id).update(status='running')
+    try:
+        abstracts = list(book.event.abstracts.select_related('attendee'))
+        bodies = render_abstracts(book, abstracts, workers or os.cpu_count() or 1)
+        entries = book_entries(abstracts)
+        if book.format == 'docx':
+            content = build_docx(book.event, entries, bodies)
+        else:
+            content = build_html(book.event, entries, bodies).encode()
+        path = default_storage.save(
+            f'abstract_books/{book.event_id}/{uuid.uuid4().hex}/abstract-book.{book.format}', ContentFile(content),
+        )
+    except Exception as e:
+        logger.exception("Abstract book %s failed", book.id)
+        AbstractBook.objects.filter(id=book.id).update(status='failed', error=str(e), finished_at=timezone.now())
+        raise
+    AbstractBook.objects.filter(id=book.id).update(status='completed', file_path=path, finished_at=timezone.now())
@@ -1,9 +1,13 @@
+import logging
+
 from allauth.account.adapter import DefaultAccountAdapter
 from main.tasks import send_mail
 
+logger = logging.getLogger(__name__)
+
 
 class CeleryEmailAdapter(DefaultAccountAdapter):
     def send_mail(self, template_prefix, email, context):
         msg = self.render_mail(template_prefix, email, context)
-        print(msg.subject, msg.body, email)
+        logger.info("Queueing %s email to %s", template_prefix, email, extra={"to": email, "template": template_prefix})
         send_mail.delay(msg.subject, msg.body, email)
@@ -0,0 +1,222 @@
+"""
+Writing attendees' answers to custom questions.
+
+upsert_answers() is shared by registration, staff edits and imports: all
+referenced questions are validated with one query and the answers are
+upserted on (attendee, reference), so an edited answer keeps its row.
+
+Options picked in select and checkbox answers are also stored as
+AnswerChoice rows, updated together with the answers, so that
+answer_analytics() can count them per option in the database. The counts
+are cached per event until one of its answers or questions changes, in
+the shared cache so that a change handled by any process drops them.
+"""
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+
+from main.models import AnswerChoice, CustomAnswer, CustomQuestion
+
+CHOICE_TYPES = ('select', 'checkbox')
+ANALYTICS_CACHE = 'shared'
+ANALYTICS_CACHE_TIMEOUT = 60 * 60  # 1 hour, invalidated earlier when answers change
+
+
+class AnswerError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def registration_answers(questions, data):
+    """
+    Answers from registration form data: '<question id>' for most types,
+    '<question id>_<option index>' per option of a checkbox question
+    """
+    answers = []
+    for q in questions:
+        if q.question["type"] == "checkbox":
+            answer = '\n'.join(
+                f"- {option}: {data.get(f'{q.id}_{index}')}" for index, option in enumerate(q.question["options"])
+            )
+        else:
+            answer = data.get(f"{q.id}")
+        answers.append({"reference_id": q.id, "answer": answer})
+    return answers
+
+
+def selected_options(question, answer):
+    """
+    Options picked in `answer`, the stored text of an answer to `question`:
+    the option itself for select questions, the '- option: value' lines
+    with a checked value for checkbox questions. An option listed twice in
+    the question is picked once.
+    """
+    options = dict.fromkeys(question.question.get("options") or [])
+    if question.question["type"] == "select":
+        return [answer] if answer in options else []
+    if question.question["type"] == "checkbox":
+        checked = set()
+        for line in answer.splitlines():
+            option, _, value = line.removeprefix("- ").rpartition(": ")
+            if value.strip().lower() in ("true", "on", "1"):
+                checked.add(option)
+        return [option for option in options if option in checked]
+    return []
+
+
+def _sync_choices(answers):
+    """Make the AnswerChoice rows of `answers` (saved, with .reference set) match their text"""
+    answers = [a for a in answers if a.reference.question["type"] in CHOICE_TYPES]
+    if not answers:
+        return
+    current = {
+        (answer_id, option): choice_id
+        for choice_id, answer_id, option in AnswerChoice.objects.filter(
+            answer_id__in=[a.id for a in answers]
+        ).values_list("id", "answer_id", "option")
+    }
+    desired = {
+        (a.id, option): a.reference_id
+        for a in answers for option in selected_options(a.reference, a.answer)
+    }
+    removed = [choice_id for key, choice_id in current.items() if key not in desired]
+    if removed:
+        AnswerChoice.objects.filter(id__in=removed).delete()
+    added = [
+        AnswerChoice(answer_id=answer_id, question_id=question_id, option=option)
+        for (answer_id, option), question_id in desired.items() if (answer_id, option) not in current
+    ]
+    if added:
+        AnswerChoice.objects.bulk_create(added)
+
+
+def rebuild_choices(questions):
+    """Rebuild the AnswerChoice rows of `questions`, e.g. after their type or options changed"""
+    questions = {q.id: q for q in questions}
+    with transaction.atomic():
+        AnswerChoice.objects.filter(question_id__in=questions).delete()
+        choices = [
+            AnswerChoice(answer_id=answer_id, question_id=question_id, option=option)
+            for answer_id, question_id, answer in CustomAnswer.objects.filter(
+                reference_id__in=questions
+            ).values_list("id", "reference_id", "answer").iterator(chunk_size=2000)
+            for option in selected_options(questions[question_id], answer)
+        ]
+        AnswerChoice.objects.bulk_create(choices, batch_size=2000)
+
+
+def upsert_answers(attendee, answers, replace=False, questions=None):
+    """
+    Write `answers`, a list of {'reference_id', 'answer'} and, for answers
+    that don't reference a question (reference_id None or -1), 'question'
+    with the question text. Referenced questions must belong to the
+    attendee's event; pass `questions` if the caller already loaded them.
+    With `replace`, the attendee's other answers are deleted. Detached
+    answers are matched on their question text. Raises AnswerError.
+    """
+    references = [a["reference_id"] for a in answers if a.get("reference_id") not in (None, -1)]
+    if len(references) != len(set(references)):
+        raise AnswerError("duplicated_references", "Duplicated references found.")
+    if questions is None:
+        questions = CustomQuestion.objects.filter(event_id=attendee.event_id, id__in=references)
+    questions = {q.id: q for q in questions if q.event_id == attendee.event_id}
+    if not questions.keys() >= set(references):
+        raise AnswerError("invalid_reference", "Question not found.")
+
+    referenced, detached = [], {}
+    for a in answers:
+        text = a.get("answer") or ""
+        if a.get("reference_id") in (None, -1):
+            detached[a.get("question", "")] = text
+        else:
+            question = questions[a["reference_id"]]
+            referenced.append(CustomAnswer(
+                attendee=attendee, reference=question, question=question.question["question"], answer=text,
+            ))
+
+    with transaction.atomic():
+        if referenced:
+            CustomAnswer.objects.bulk_create(
+                referenced,
+                update_conflicts=True,
+                unique_fields=["attendee", "reference"],
+                update_fields=["question", "answer"],
+            )
+            _sync_choices(referenced)
+        if detached or replace:
+            existing = {
+                answer.question: answer
+                for answer in CustomAnswer.objects.filter(attendee=attendee, reference__isnull=True)
+            }
+            changed = []
+            for question, text in detached.items():
+                if question in existing and existing[question].answer != text:
+                    existing[question].answer = text
+                    changed.append(existing[question])
+            if changed:
+                CustomAnswer.objects.bulk_update(changed, ["answer"])
+            new = [
+                CustomAnswer(attendee=attendee, reference=None, question=question, answer=text)
+                for question, text in detached.items() if question not in existing
+            ]
+            if new:
+                CustomAnswer.objects.bulk_create(new)
+        if replace:
+            attendee.custom_answers.exclude(reference_id__in=references).exclude(
+                reference__isnull=True, question__in=list(detached),
+            ).delete()
+        transaction.on_commit(lambda: invalidate_answer_analytics(attendee.event_id))
+
+
+def _analytics_cache_key(event_id):
+    return f"answer_analytics:{event_id}"
+
+
+def invalidate_answer_analytics(event_id):
+    """Drop the cached analytics of an event (called whenever its answers or questions change)"""
+    caches[ANALYTICS_CACHE].delete(_analytics_cache_key(event_id))
+
+
+def answer_analytics(event):
+    """
+    Per-option counts for the event's select and checkbox questions:
+    [{'id', 'type', 'question', 'responses', 'options': [{'option', 'count'}]}]
+    in question order. 'responses' is the number of answers to the question.
+    """
+    questions = [q for q in event.custom_questions.all() if q.question["type"] in CHOICE_TYPES]
+    ids = [q.id for q in questions]
+    responses = dict(
+        CustomAnswer.objects.filter(reference_id__in=ids)
+        .values("reference_id").annotate(n=Count("id")).values_list("reference_id", "n")
+    )
+    counts = {
+        (question_id, option): n
+        for question_id, option, n in AnswerChoice.objects.filter(question_id__in=ids)
+        .values("question_id", "option").annotate(n=Count("id")).values_list("question_id", "option", "n")
+    }
+    return [
+        {
+            "id": q.id,
+            "type": q.question["type"],
+            "question": q.question["question"],
+            "responses": responses.get(q.id, 0),
+            "options": [
+                {"option": option, "count": counts.get((q.id, option), 0)}
+                for option in dict.fromkeys(q.question.get("options") or [])
+            ],
+        }
+        for q in questions
+    ]
+
+
+def get_answer_analytics(event):
+    """Cached wrapper around answer_analytics()"""
+    cache = caches[ANALYTICS_CACHE]
+    key = _analytics_cache_key(event.id)
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = answer_analytics(event)
+        cache.set(key, analytics, ANALYTICS_CACHE_TIMEOUT)
+    return analytics
@@ -4,18 +4,20 @@ import uuid
 import requests
 from functools import wraps
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List
 from django.utils import timezone
 
 from ninja import NinjaAPI
 from ninja.security import django_auth
 
+from django.http import FileResponse, HttpResponse
+from django.utils.http import parse_etags, quote_etag
 from django.middleware.csrf import get_token
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.template import Template, Context
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Max
 
 from django.conf import settings
@@ -23,11 +25,24 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from main.models import Event, EmailTemplate, Attendee, CustomQuestion, CustomAnswer, Abstract, AbstractVote, OnSiteAttendee, Institution, PaymentHistory, BusinessSettings, ExchangeRate, ManualTransaction, AccountSettings, PrivacyPolicy, TermsOfService, Organizer, SiteSettings
+from main.models import Event, EmailTemplate, Attendee, Abstract, AbstractBook, Vote, OnSiteAttendee, Institution, PaymentHistory, BusinessSettings, ExchangeRate, ManualTransaction, AccountSettings, PrivacyPolicy, TermsOfService, Organizer, SiteSettings
 from main.schema import *
 from main.utils import validate_abstract_file, sanitize_filename, rate_limit, sanitize_email_header, validate_email_format, validate_editor_file, generate_onsite_code
-
-from .tasks import send_mail, send_mail_with_attachment
+from main.permissions import get_request_event, has_event_role
+from main.loaders import prime_loaders
+from main.metrics import render as render_metrics
+from main.profiling import list_profiles, load_profile, profile_path
+from main.payments import get_toss_payment_by_order, extract_receipt_url, save_receipt_url, toss_headers
+from main.reports import filter_payments, get_payment_summary, ledger_csv_response, ledger_xlsx_response
+from main.counters import dashboard
+from main.checkin import (
+    KINDS as CHECKIN_KINDS, CheckInError, changes_since, check_in, checkin_token, snapshot, upload_check_ins,
+)
+from main.answers import AnswerError, get_answer_analytics, registration_answers, upsert_answers
+from main.questions import QuestionSetError, apply_question_set
+from main.voting import BallotError, ballot_version, submit_ballot, withdraw_votes
+
+from .tasks import compile_abstract_book, send_mail, send_mail_with_attachment
 
 api = NinjaAPI(csrf=True, auth=django_auth)
 
@@ -45,20 +60,32 @@ def ensure_staff(func):
         return func(*args, **kwargs)
     return wrapper
 
-def ensure_event_staff(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        request = args[0]
-        event_id = kwargs["event_id"]
-        user = request.user
-        if not (user.is_staff or user in Event.objects.get(id=event_id).admins.all()):
-            return api.create_response(
-                request,
-                {"code": "permission_denied", "message": "Permission denied"},
-                status=403,
-            )
-        return func(*args, **kwargs)
-    return wrapper
+def _ensure_event_role(role):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            request = args[0]
+            event_id = kwargs["event_id"]
+            try:
+                get_request_event(request, event_id)
+            except Event.DoesNotExist:
+                return api.create_response(
+                    request,
+                    {"code": "not_found", "message": "Event not found."},
+                    status=404,
+                )
+            if not has_event_role(request, event_id, role):
+                return api.create_response(
+                    request,
+                    {"code": "permission_denied", "message": "Permission denied"},
+                    status=403,
+                )
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+ensure_event_staff = _ensure_event_role('staff')
+ensure_event_reviewer = _ensure_event_role('staff_or_reviewer')
 
 @api.get("/me", response=UserSchema)
 def get_user(request):
@@ -222,7 +249,10 @@ def get_registration_history(request):
     Get the registration history for the current user.
     """
     user = request.user
-    attendees = Attendee.objects.filter(user=user).select_related('event')
+    attendees = Attendee.objects.filter(user=user).select_related('event').prefetch_related('event__organizer_set')
+    paid_attendee_ids = set(
+        PaymentHistory.objects.filter(attendee__user=user, status='completed').values_list('attendee_id', flat=True)
+    )
 
     registration_history = []
     for attendee in attendees:
@@ -244,7 +274,7 @@ def get_registration_history(request):
             payment_status = 'free'
         else:
             # Check if there's a completed payment for this attendee
-            if PaymentHistory.objects.filter(attendee=attendee, status='completed').exists():
+            if attendee.id in paid_attendee_ids:
                 payment_status = 'completed'
             else:
                 payment_status = 'pending'
@@ -386,8 +416,7 @@ def delete_institution(request, institution_id: int):
 @api.get("/admin/events", response=List[EventAdminSchema])
 @ensure_staff
 def get_admin_events(request):
-    events = Event.objects.all()
-    return events
+    return prime_loaders(request, EventAdminSchema, Event.objects.all())
 
 @api.get("/events", response=PaginatedEventsSchema, auth=None)
 def get_events(request, offset: int = 0, limit: int = 20, year: str = None, search: str = None, showOnlyOpen: bool = False):
@@ -426,11 +455,11 @@ def get_events(request, offset: int = 0, limit: int = 20, year: str = None, sear
     events = events.order_by('-start_date').distinct()
     total = events.count()
 
-    # Apply pagination and prefetch organizers to prevent N+1 queries
-    events = events[offset:offset + limit].prefetch_related('organizer_set')
+    # Apply pagination and batch-load organizers to prevent N+1 queries
+    events = prime_loaders(request, EventSchema, events[offset:offset + limit])
 
     return {
-        "events": list(events),
+        "events": events,
         "total": total,
         "offset": offset,
         "limit": limit
@@ -558,7 +587,7 @@ def add_event(request):
 @api.get("/event/{event_id}", response=EventSchema, auth=None)
 def get_event(request, event_id: int):
     try:
-        event = Event.objects.get(id=event_id)
+        event = get_request_event(request, event_id)
     except Event.DoesNotExist:
         return api.create_response(
             request,
@@ -600,7 +629,7 @@ def get_event(request, event_id: int):
 @ensure_event_staff
 def get_admin_event(request, event_id: int):
     try:
-        event = Event.objects.get(id=event_id)
+        event = get_request_event(request, event_id)
     except Event.DoesNotExist:
         return api.create_response(
             request,
@@ -613,7 +642,7 @@ def get_admin_event(request, event_id: int):
 @ensure_event_staff
 def update_event(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     event.name = data["name"]
     event.description = data.get("description", "")
     event.category = data.get("category", "conference")
@@ -663,7 +692,7 @@ def update_event(request, event_id: int):
 @api.post("/event/{event_id}/toggle_published", response=MessageSchema)
 @ensure_event_staff
 def toggle_published(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     event.published = not event.published
     event.save()
     return {"code": "success", "message": "Event published status updated."}
@@ -672,7 +701,7 @@ def toggle_published(request, event_id: int):
 @ensure_staff
 def archive_event(request, event_id: int):
     try:
-        event = Event.objects.get(id=event_id)
+        event = get_request_event(request, event_id)
         event.is_archived = not event.is_archived
         event.save()
     except Event.DoesNotExist:
@@ -689,7 +718,7 @@ def update_nametag_settings(request, event_id: int):
     """Update nametag paper size and orientation settings for an event"""
     data = json.loads(request.body)
     try:
-        event = Event.objects.get(id=event_id)
+        event = get_request_event(request, event_id)
     except Event.DoesNotExist:
         return api.create_response(
             request,
@@ -711,7 +740,7 @@ def update_nametag_settings(request, event_id: int):
 @ensure_event_staff
 def update_event_emailtemplates(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     event.email_template_registration.subject = data["email_template_registration_subject"]
     event.email_template_registration.body = data["email_template_registration_body"]
     event.email_template_registration.save()
@@ -735,7 +764,7 @@ def update_event_emailtemplates(request, event_id: int):
 @api.get("/event/{event_id}/registered", response=RegistrationStatusSchema)
 def check_registration_status(request, event_id: int):
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendee = event.attendees.filter(user__id=user.id).first()
 
     if not attendee:
@@ -756,49 +785,79 @@ def check_registration_status(request, event_id: int):
 
 @api.get("/event/{event_id}/questions", response=List[QuestionSchema])
 def get_event_questions(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     questions = event.custom_questions.all()
     return questions
 
 @api.post("/event/{event_id}/questions", response=MessageSchema)
 @ensure_event_staff
 def update_event_questions(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     data = json.loads(request.body)
-    for q in event.custom_questions.all():
-        if not any(q.id == q2.get("id") for q2 in data["questions"]):
-            q.delete()
-    for idx, q in enumerate(data["questions"]):
-        if q.get("id") == -1:
-            cq = CustomQuestion.objects.create(
-                event=event,
-                question=q["question"],
-                order=idx
-            )
-        else:
-            # Validate question belongs to this event to prevent cross-event modification
-            cq = CustomQuestion.objects.get(id=q["id"], event=event)
-            cq.question = q["question"]
-            cq.order = idx
-            cq.save()
-            for ca in CustomAnswer.objects.filter(reference=cq):
-                ca.question = q["question"]["question"]
-                ca.save()
+    try:
+        apply_question_set(event, data["questions"])
+    except QuestionSetError as e:
+        return api.create_response(request, {"code": e.code, "message": e.message}, status=400)
     return {"code": "success", "message": "Questions updated."}
 
+@api.get("/event/{event_id}/questions/analytics", response=List[QuestionAnalyticsSchema])
+@ensure_event_staff
+def get_event_question_analytics(request, event_id: int):
+    event = get_request_event(request, event_id)
+    return get_answer_analytics(event)
+
 @api.get("/event/{event_id}/stats", response=StatsSchema)
 @ensure_event_staff
 def get_event_stats(request, event_id: int):
-    event = Event.objects.get(id=event_id)
-    return {
-        "registered": event.attendees.count(),
-        "abstracts": event.abstracts.count(),
-    }
+    event = get_request_event(request, event_id)
+    return dashboard(event)
+
+@api.post("/event/{event_id}/checkin", response=CheckInResponseSchema)
+@ensure_event_staff
+def check_in_attendees(request, event_id: int, data: CheckInSchema):
+    event = get_request_event(request, event_id)
+    try:
+        results = check_in(event, [item.dict() for item in data.items], attended=data.attended)
+    except CheckInError as e:
+        return api.create_response(request, {"code": e.code, "message": e.message}, status=400)
+    return {"results": results, "counters": dashboard(event)}
+
+@api.get("/event/{event_id}/checkin/snapshot", response=CheckInSyncSchema)
+@ensure_event_staff
+def get_checkin_snapshot(request, event_id: int):
+    event = get_request_event(request, event_id)
+    return snapshot(event)
+
+@api.get("/event/{event_id}/checkin/changes", response=CheckInSyncSchema)
+@ensure_event_staff
+def get_checkin_changes(request, event_id: int, cursor: int):
+    event = get_request_event(request, event_id)
+    return changes_since(event, cursor)
+
+@api.post("/event/{event_id}/checkin/upload", response=CheckInUploadResponseSchema)
+@ensure_event_staff
+def upload_checkins(request, event_id: int, data: CheckInUploadSchema):
+    event = get_request_event(request, event_id)
+    try:
+        results = upload_check_ins(event, [item.dict() for item in data.items], data.cursor)
+    except CheckInError as e:
+        return api.create_response(request, {"code": e.code, "message": e.message}, status=400)
+    return {"results": results, "counters": dashboard(event), "changes": changes_since(event, data.cursor)}
+
+@api.get("/event/{event_id}/checkin/tokens", response=List[CheckInTokenSchema])
+@ensure_event_staff
+def get_checkin_tokens(request, event_id: int):
+    event = get_request_event(request, event_id)
+    return [
+        {"kind": kind, "nametag_id": nametag_id, "token": checkin_token(kind, event.id, nametag_id)}
+        for kind, (model, nametag_field, _, _) in CHECKIN_KINDS.items()
+        for nametag_id in model.objects.filter(event=event).order_by(nametag_field).values_list(nametag_field, flat=True)
+    ]
 
 @api.get("/event/{event_id}/attendees", response=List[AttendeeSchema])
 @ensure_event_staff
 def get_event_attendees(request, event_id: int, all: bool = False):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendees = event.attendees.all()
 
     # If event has a registration fee, filter to only those with completed payments
@@ -806,12 +865,12 @@ def get_event_attendees(request, event_id: int, all: bool = False):
     if not all and event.registration_fee and event.registration_fee > 0:
         attendees = attendees.filter(payments__status='completed').distinct()
 
-    return attendees
+    return prime_loaders(request, AttendeeSchema, attendees)
 
 @api.get("/event/{event_id}/registration", response=AttendeeSchema)
 def get_my_registration(request, event_id: int):
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     try:
         attendee = event.attendees.get(user__id=user.id)
         return attendee
@@ -825,7 +884,7 @@ def get_my_registration(request, event_id: int):
 @api.get("/event/{event_id}/registration/payment", response=PaymentHistorySchema)
 def get_my_registration_payment(request, event_id: int):
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     try:
         attendee = event.attendees.get(user__id=user.id)
         # Get the latest completed payment, or latest payment if none completed
@@ -880,7 +939,7 @@ def get_my_registration_payment(request, event_id: int):
 @ensure_event_staff
 def update_attendee(request, event_id: int, attendee_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendee = Attendee.objects.get(id=attendee_id, event=event)
 
     if "is_attended" in data:
@@ -922,34 +981,20 @@ def update_attendee(request, event_id: int, attendee_id: int):
 @ensure_event_staff
 def update_event_answers(request, event_id: int, attendee_id: int):
     data = json.loads(request.body)
-    answers = data.get("answers", [])
-    references = [a["reference_id"] for a in answers if a["reference_id"] is not None]
-    if len(references) != len(set(references)):
-        return api.create_response(
-            request,
-            {"code": "duplicated_references", "message": "Duplicated references found."},
-            status=400,
-        )
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendee = Attendee.objects.get(id=attendee_id, event=event)
-    custom_answer = CustomAnswer.objects.filter(attendee=attendee)
-    custom_answer.delete()
-    for a in answers:
-        # Validate reference belongs to this event to prevent cross-event data leakage
-        reference_question = CustomQuestion.objects.get(id=a["reference_id"], event=event) if not (a["reference_id"] == -1 or a["reference_id"] is None) else None
-        CustomAnswer.objects.create(
-            reference=reference_question,
-            attendee=attendee,
-            question=reference_question.question["question"] if reference_question else a["question"],
-            answer=a["answer"]
-        )
+    try:
+        # Validates that referenced questions belong to this event (no cross-event writes)
+        upsert_answers(attendee, data.get("answers", []), replace=True)
+    except AnswerError as e:
+        return api.create_response(request, {"code": e.code, "message": e.message}, status=400)
     return {"code": "success", "message": "Answers updated."}
 
 @api.post("/event/{event_id}/register", response=MessageSchema)
 def register_event(request, event_id: int):
     # get the deadline for registration
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     if event.registration_deadline is not None and datetime.now().date() > event.registration_deadline:
             return api.create_response(
                 request,
@@ -981,7 +1026,8 @@ def register_event(request, event_id: int):
                 {"code": "invalid_invitation_code", "message": "Invalid invitation code. Please check and try again."},
                 status=400,
             )
-    for q in event.custom_questions.all():
+    questions = event.custom_questions.all()
+    for q in questions:
         if q.question["type"] == "select":
             for oidx, option in enumerate(q.question["options"]):
                 if not data.get(f"{q.id}"):
@@ -1011,35 +1057,24 @@ def register_event(request, event_id: int):
             status=400,
         )
 
-    attendee = Attendee.objects.create(
-        user=user,
-        event=event,
-        first_name=data.get("first_name", ""),
-        middle_initial=data.get("middle_initial", ""),
-        last_name=data.get("last_name", ""),
-        korean_name=data.get("korean_name", ""),
-        nationality=data["nationality"],
-        institute=institute_name_en,
-        institute_ko=institute_name_ko,
-        department=data.get("department", ""),
-        job_title=data.get("job_title", ""),
-        disability=data.get("disability", ""),
-        dietary=data.get("dietary", "")
-    )
-
-    for q in event.custom_questions.all():
-        if q.question["type"] == "checkbox":
-            answer = '\n'.join([f"- {option}: {data.get(f"{q.id}_{oidx}")}" for oidx, option in enumerate(q.question["options"])])
-        else:
-            answer = data.get(f"{q.id}")
-        CustomAnswer.objects.create(
-            reference=q,
-            attendee=attendee,
-            question=q.question["question"],
-            answer=answer
-        )
-
-    event.attendees.add(attendee)
+    # The attendee and their answers are written together
+    with transaction.atomic():
+        attendee = Attendee.objects.create(
+            user=user,
+            event=event,
+            first_name=data.get("first_name", ""),
+            middle_initial=data.get("middle_initial", ""),
+            last_name=data.get("last_name", ""),
+            korean_name=data.get("korean_name", ""),
+            nationality=data["nationality"],
+            institute=institute_name_en,
+            institute_ko=institute_name_ko,
+            department=data.get("department", ""),
+            job_title=data.get("job_title", ""),
+            disability=data.get("disability", ""),
+            dietary=data.get("dietary", "")
+        )
+        upsert_answers(attendee, registration_answers(questions, data), questions=questions)
 
     send_mail.delay(
         Template(event.email_template_registration.subject).render(Context({"event": event, "attendee": attendee}, autoescape=False)),
@@ -1052,14 +1087,16 @@ def register_event(request, event_id: int):
 @api.post("/event/{event_id}/attendee/{attendee_id}/deregister", response=MessageSchema)
 @ensure_event_staff
 def deregister_event(request, event_id: int, attendee_id: int):
-    event = Event.objects.get(id=event_id)
-    Attendee.objects.get(id=attendee_id, event=event).delete()
+    event = get_request_event(request, event_id)
+    attendee = Attendee.objects.get(id=attendee_id, event=event)
+    withdraw_votes(attendee)
+    attendee.delete()
     return {"code": "success", "message": "Successfully deregistered!"}
 
 @api.post("/event/{event_id}/change-request", response=MessageSchema)
 def request_change(request, event_id: int):
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     # Verify user is registered for this event
     try:
@@ -1117,7 +1154,7 @@ Please review and respond to this request.
 
 @api.post("/event/{event_id}/abstract", response=MessageSchema)
 def submit_abstract(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     if not event.accepts_abstract:
         return api.create_response(
             request,
@@ -1203,14 +1240,14 @@ def submit_abstract(request, event_id: int):
 
 @api.get("/event/{event_id}/speakers", response=List[SpeakerSchema], auth=None)
 def get_speakers(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     return event.speakers.all()
 
 @api.post("/event/{event_id}/speaker/add", response=MessageSchema)
 @ensure_event_staff
 def add_speaker(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     if not data.get("name") or not data.get("email") or not data.get("affiliation") or data.get("is_domestic") is None or not data.get("type"):
         return api.create_response(
@@ -1233,7 +1270,7 @@ def add_speaker(request, event_id: int):
 @api.post("/event/{event_id}/speaker/{speaker_id}/update", response=MessageSchema)
 @ensure_event_staff
 def update_speaker(request, event_id: int, speaker_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     speaker = event.speakers.get(id=speaker_id)
     data = json.loads(request.body)
     speaker.name = data["name"]
@@ -1249,7 +1286,7 @@ def update_speaker(request, event_id: int, speaker_id: int):
 @api.post("/event/{event_id}/speaker/{speaker_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_speaker(request, event_id: int, speaker_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     speaker = event.speakers.get(id=speaker_id)
     speaker.delete()
     return {"code": "success", "message": "Speaker deleted."}
@@ -1307,7 +1344,7 @@ def send_certificate(request, event_id: int):
             status=400,
         )
 
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     # Look up the actual attendee
     attendee = None
@@ -1346,14 +1383,14 @@ def send_certificate(request, event_id: int):
 @api.get("/event/{event_id}/reviewers", response=List[AttendeeSchema])
 @ensure_event_staff
 def get_reviewers(request, event_id: int):
-    event = Event.objects.get(id=event_id)
-    return event.reviewers.all()
+    event = get_request_event(request, event_id)
+    return prime_loaders(request, AttendeeSchema, event.reviewers.all())
 
 @api.post("/event/{event_id}/reviewer/add", response=MessageSchema)
 @ensure_event_staff
 def add_reviewer(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendee = Attendee.objects.get(event=event, id=data["id"])
     # check if the user is already a reviewer
     if attendee in event.reviewers.all():
@@ -1363,37 +1400,48 @@ def add_reviewer(request, event_id: int):
             status=400,
         )
     event.reviewers.add(attendee)
-    AbstractVote.objects.create(reviewer=attendee)
     return {"code": "success", "message": "Reviewer added."}
 
 @api.post("/event/{event_id}/reviewer/{reviewer_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_reviewer(request, event_id: int, reviewer_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     attendee = Attendee.objects.get(event=event, id=reviewer_id)
     event.reviewers.remove(attendee)
-    AbstractVote.objects.get(reviewer=attendee).delete()
+    withdraw_votes(attendee)
     return {"code": "success", "message": "Reviewer deleted."}
 
 @api.get("/event/{event_id}/abstracts", response=List[AbstractShortSchema])
+@ensure_event_reviewer
 def get_abstracts(request, event_id: int):
-    user = request.user
-    if not (user.is_staff or
-            user in Event.objects.get(id=event_id).admins.all() or
-            user in Event.objects.get(id=event_id).reviewers.all()):
+    event = request.event
+    return prime_loaders(request, AbstractShortSchema, event.abstracts.all())
+
+@api.post("/event/{event_id}/abstract_book", response=AbstractBookSchema)
+@ensure_event_staff
+def create_abstract_book(request, event_id: int, data: AbstractBookRequestSchema):
+    event = get_request_event(request, event_id)
+    if data.format not in dict(AbstractBook.FORMAT_CHOICES):
         return api.create_response(
             request,
-            {"code": "permission_denied", "message": "Permission denied"},
-            status=403,
+            {"code": "invalid_format", "message": "Format must be html or docx."},
+            status=400,
         )
-    event = Event.objects.get(id=event_id)
-    abstracts = event.abstracts.all()
-    return abstracts
+    book = AbstractBook.objects.create(event=event, format=data.format)
+    compile_abstract_book.delay(book.id)
+    book.refresh_from_db()
+    return book
+
+@api.get("/event/{event_id}/abstract_books", response=List[AbstractBookSchema])
+@ensure_event_staff
+def get_abstract_books(request, event_id: int):
+    event = get_request_event(request, event_id)
+    return event.abstract_books.all()[:20]
 
 @api.get("/event/{event_id}/abstract", response=AbstractUserSchema)
 def get_user_abstract(request, event_id: int):
     user = request.user
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     try:
         attendee = Attendee.objects.get(user=user, event=event)
     except Attendee.DoesNotExist:
@@ -1413,24 +1461,23 @@ def get_user_abstract(request, event_id: int):
     return abstract
 
 @api.get("/event/{event_id}/abstract/{abstract_id}", response=AbstractSchema)
+@ensure_event_reviewer
 def get_abstract(request, event_id: int, abstract_id: int):
-    user = request.user
-    if not (user.is_staff or
-            user in Event.objects.get(id=event_id).admins.all() or
-            user in Event.objects.get(id=event_id).reviewers.all()):
-        return api.create_response(
-            request,
-            {"code": "permission_denied", "message": "Permission denied"},
-            status=403,
-        )
-    event = Event.objects.get(id=event_id)
+    event = request.event
     abstract = event.abstracts.get(id=abstract_id)
     return abstract
 
+@api.get("/event/{event_id}/reviewer/abstracts", response=List[AbstractSchema])
+@ensure_event_reviewer
+def get_reviewer_abstracts(request, event_id: int):
+    """All abstracts of the event with their bodies, in one request for the reviewer page"""
+    event = request.event
+    return prime_loaders(request, AbstractSchema, event.abstracts.all())
+
 @api.post("/event/{event_id}/abstract/{abstract_id}/update", response=MessageSchema)
 @ensure_event_staff
 def update_abstract(request, event_id: int, abstract_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     abstract = event.abstracts.get(id=abstract_id)
     data = json.loads(request.body)
     abstract.title = data["title"]
@@ -1442,26 +1489,20 @@ def update_abstract(request, event_id: int, abstract_id: int):
 @api.post("/event/{event_id}/abstract/{abstract_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_abstract(request, event_id: int, abstract_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     abstract = event.abstracts.get(id=abstract_id)
     abstract.delete()
     return {"code": "success", "message": "Abstract deleted."}
 
 @api.get("/event/{event_id}/reviewer", response=bool)
 def is_reviewer(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     if not event.accepts_abstract:
         return False # Event does not accept abstracts
-    user = request.user
-    try:
-        attendee = Attendee.objects.get(user=user, event_id=event_id)
-    except Attendee.DoesNotExist:
-        return False # User is not registered to the event
-    return attendee in Event.objects.get(id=event_id).reviewers.all()
+    return has_event_role(request, event_id, 'reviewer')
 
-@api.get("/event/{event_id}/reviewer/vote", response=AbstractVoteSchema)
-def get_reviewer_votes(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+def _voting_closed(request, event):
+    """Error response if the event's abstracts can't be voted on (yet), else None"""
     if not event.accepts_abstract:
         return api.create_response(
             request,
@@ -1474,49 +1515,139 @@ def get_reviewer_votes(request, event_id: int):
             {"code": "deadline_not_passed", "message": "Abstract submission deadline has not passed."},
             status=400,
         )
+    return None
+
+@api.get("/event/{event_id}/reviewer/vote", response=BallotSchema)
+def get_reviewer_votes(request, event_id: int):
+    event = get_request_event(request, event_id)
+    closed = _voting_closed(request, event)
+    if closed is not None:
+        return closed
     user = request.user
-    if not (user.is_staff or
-            user in Event.objects.get(id=event_id).admins.all() or
-            user in Event.objects.get(id=event_id).reviewers.all()):
+    if not has_event_role(request, event_id, 'staff_or_reviewer'):
         return api.create_response(
             request,
             {"code": "permission_denied", "message": "Permission denied"},
             status=403,
         )
-    event = Event.objects.get(id=event_id)
     reviewer = Attendee.objects.get(user=user, event=event)
-    votes = AbstractVote.objects.get(reviewer=reviewer)
-    return votes
+    votes = list(reviewer.votes.select_related('abstract').order_by('id'))
+    prime_loaders(request, AttendeeSchema, [reviewer])
+    abstracts = prime_loaders(request, AbstractShortSchema, [vote.abstract for vote in votes])
+    return {"reviewer": reviewer, "voted_abstracts": abstracts, "votes": votes}
+
+@api.get("/event/{event_id}/reviewer/ballot", response=CompactBallotSchema)
+def get_reviewer_ballot(request, event_id: int, response: HttpResponse):
+    """
+    The reviewer's votes as abstract IDs only, for pages that already have
+    the abstract list. Supports conditional requests: the version is also
+    the ETag, and a matching If-None-Match gets 304 Not Modified.
+    """
+    event = get_request_event(request, event_id)
+    closed = _voting_closed(request, event)
+    if closed is not None:
+        return closed
+    if not has_event_role(request, event_id, 'reviewer'):
+        return api.create_response(
+            request,
+            {"code": "permission_denied", "message": "Permission denied"},
+            status=403,
+        )
+    votes = list(
+        Vote.objects.filter(reviewer__user=request.user, reviewer__event=event)
+        .only('abstract_id', 'score', 'created_at').order_by('abstract_id')
+    )
+    version = ballot_version(votes)
+    etag = quote_etag(version)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        not_modified = HttpResponse(status=304)
+        not_modified["ETag"] = etag
+        return not_modified
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return {"version": version, "votes": votes}
 
 @api.post("/event/{event_id}/reviewer/vote", response=MessageSchema)
-def vote_abstract(request, event_id: int):
-    event = Event.objects.get(id=event_id)
-    if not event.accepts_abstract:
+def vote_abstract(request, event_id: int, data: BallotSubmitSchema):
+    event = get_request_event(request, event_id)
+    closed = _voting_closed(request, event)
+    if closed is not None:
+        return closed
+    if not has_event_role(request, event_id, 'reviewer'):
         return api.create_response(
             request,
-            {"code": "not_accepted", "message": "This event does not accept abstracts."},
-            status=400,
+            {"code": "permission_denied", "message": "Permission denied"},
+            status=403,
         )
-    if event.abstract_deadline is not None and datetime.now().date() < event.abstract_deadline:
+    reviewer = Attendee.objects.get(user=request.user, event=event)
+    try:
+        submit_ballot(event, reviewer, [
+            (abstract_id, data.scores.get(abstract_id, 1)) for abstract_id in data.voted_abstracts
+        ])
+    except BallotError as e:
+        return api.create_response(request, {"code": e.code, "message": e.message}, status=400)
+    return {"code": "success", "message": "Votes submitted."}
+
+@api.get("/event/{event_id}/abstracts/ranking", response=List[AbstractRankingSchema])
+@ensure_event_staff
+def get_abstract_ranking(request, event_id: int):
+    """Abstracts by total score, then number of votes; ties share a rank"""
+    abstracts = list(
+        request.event.abstracts.select_related('attendee').order_by('-vote_score', '-vote_count', 'id')
+    )
+    previous = None
+    for position, abstract in enumerate(abstracts, start=1):
+        if (abstract.vote_score, abstract.vote_count) != previous:
+            rank = position
+            previous = (abstract.vote_score, abstract.vote_count)
+        abstract.rank = rank
+    return abstracts
+
+@api.get("/metrics")
+@ensure_staff
+def get_metrics(request):
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api.get("/admin/profiles", response=List[ProfileSummarySchema])
+@ensure_staff
+def get_profiles(request):
+    return list_profiles()
+
+@api.get("/admin/profiles/{profile_id}", response=ProfileSchema)
+@ensure_staff
+def get_profile(request, profile_id: str):
+    profile = load_profile(profile_id)
+    if profile is None:
         return api.create_response(
             request,
-            {"code": "deadline_not_passed", "message": "Abstract submission deadline has not passed."},
+            {"code": "not_found", "message": "Profile not found."},
+            status=404,
+        )
+    return profile
+
+@api.get("/admin/profiles/{profile_id}/download")
+@ensure_staff
+def download_profile(request, profile_id: str, format: str = "pstats"):
+    """Download a stored profile as pstats, collapsed stacks (flamegraph input) or JSON with the SQL timeline"""
+    if format not in ("pstats", "collapsed", "json"):
+        return api.create_response(
+            request,
+            {"code": "invalid_format", "message": "Format must be pstats, collapsed or json."},
             status=400,
         )
-    user = request.user
-    event = Event.objects.get(id=event_id)
-    reviewer = Attendee.objects.get(user=user, event=event)
-    data = json.loads(request.body)
-    vote = AbstractVote.objects.get(reviewer=reviewer)
-    for abstract_id in data["voted_abstracts"]:
-        # Validate abstract belongs to this event to prevent cross-event voting
-        vote.voted_abstracts.add(Abstract.objects.get(id=abstract_id, event=event))
-    return {"code": "success", "message": "Votes submitted."}
+    path = profile_path(profile_id, f".{format}")
+    if path is None:
+        return api.create_response(
+            request,
+            {"code": "not_found", "message": "Profile not found."},
+            status=404,
+        )
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=f"{profile_id}.{format}")
 
 @api.get("/admin/users", response=List[UserSchema])
 @ensure_staff
 def get_all_users(request):
-    return User.objects.all().order_by('-date_joined')
+    return prime_loaders(request, UserSchema, User.objects.all().order_by('-date_joined'))
 
 @api.post("/admin/user/{user_id}/toggle-active", response=MessageSchema)
 @ensure_staff
@@ -1711,19 +1842,19 @@ def resend_verification_email(request, data: ResendVerificationSchema):
 @api.get("/users", response=List[UserSchema])
 @ensure_staff
 def get_users(request):
-    return User.objects.all()
+    return prime_loaders(request, UserSchema, User.objects.all())
 
 @api.get("/event/{event_id}/eventadmins", response=List[UserSchema])
 @ensure_event_staff
 def get_event_admins(request, event_id: int):
-    event = Event.objects.get(id=event_id)
-    return event.admins.all()
+    event = get_request_event(request, event_id)
+    return prime_loaders(request, UserSchema, event.admins.all())
 
 @api.post("/event/{event_id}/eventadmin/add", response=MessageSchema)
 @ensure_event_staff
 def add_event_admin(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     user = User.objects.get(id=data["id"])
     if user in event.admins.all():
         return api.create_response(
@@ -1737,7 +1868,7 @@ def add_event_admin(request, event_id: int):
 @api.post("/event/{event_id}/eventadmin/{admin_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_event_admin(request, event_id: int, admin_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     user = User.objects.get(id=admin_id)
     event.admins.remove(user)
     return {"code": "success", "message": "Admin deleted."}
@@ -1745,14 +1876,14 @@ def delete_event_admin(request, event_id: int, admin_id: int):
 @api.get("/event/{event_id}/organizers", response=List[OrganizerSchema])
 @ensure_event_staff
 def get_organizers(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     return event.organizer_set.all()
 
 @api.post("/event/{event_id}/organizer/add", response=MessageSchema)
 @ensure_event_staff
 def add_organizer(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     if not data.get("name"):
         return api.create_response(
@@ -1776,7 +1907,7 @@ def add_organizer(request, event_id: int):
 @api.post("/event/{event_id}/organizer/{organizer_id}/update", response=MessageSchema)
 @ensure_event_staff
 def update_organizer(request, event_id: int, organizer_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     organizer = event.organizer_set.get(id=organizer_id)
     data = json.loads(request.body)
     organizer.name = data["name"]
@@ -1790,7 +1921,7 @@ def update_organizer(request, event_id: int, organizer_id: int):
 @api.post("/event/{event_id}/organizer/{organizer_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_organizer(request, event_id: int, organizer_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     organizer = event.organizer_set.get(id=organizer_id)
     organizer.delete()
     return {"code": "success", "message": "Organizer deleted."}
@@ -1799,7 +1930,7 @@ def delete_organizer(request, event_id: int, organizer_id: int):
 @ensure_event_staff
 def reorder_organizers(request, event_id: int):
     data = json.loads(request.body)
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     order = data.get("order", [])
     for idx, org_id in enumerate(order):
         event.organizer_set.filter(id=org_id).update(order=idx)
@@ -1808,7 +1939,7 @@ def reorder_organizers(request, event_id: int):
 @api.get("/event/{event_id}/email_templates", response=dict[str, EmailTemplateSchema | None])
 @ensure_event_staff
 def get_email_templates(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     rtn = {
         "registration": event.email_template_registration,
         "abstract": event.email_template_abstract_submission,
@@ -1819,7 +1950,7 @@ def get_email_templates(request, event_id: int):
 @api.get("/event/{event_id}/onsite/verify", auth=None)
 def verify_onsite_code(request, event_id: int, code: str = ""):
     try:
-        event = Event.objects.get(id=event_id)
+        event = get_request_event(request, event_id)
     except Event.DoesNotExist:
         return api.create_response(request, {"code": "not_found", "message": "Event not found."}, status=404)
     if not event.onsite_code or code.strip().upper() != event.onsite_code:
@@ -1830,7 +1961,7 @@ def verify_onsite_code(request, event_id: int, code: str = ""):
 @rate_limit(max_requests=20, window_seconds=60)
 def register_on_site(request, event_id: int):
     from zoneinfo import ZoneInfo
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     tz = ZoneInfo(BusinessSettings.get_instance().timezone)
     today = datetime.now(tz).date()
@@ -1872,13 +2003,13 @@ def register_on_site(request, event_id: int):
 @api.get("/event/{event_id}/onsite", response=List[OnSiteAttendeeSchema])
 @ensure_event_staff
 def get_on_site_attendees(request, event_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     return event.onsite_attendees.all()
 
 @api.post("/event/{event_id}/onsite/{onsite_id}/delete", response=MessageSchema)
 @ensure_event_staff
 def delete_on_site_attendee(request, event_id: int, onsite_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     oa = OnSiteAttendee.objects.get(id=onsite_id, event=event)
     oa.delete()
     return {"code": "success", "message": "On-site attendee deleted."}
@@ -1886,7 +2017,7 @@ def delete_on_site_attendee(request, event_id: int, onsite_id: int):
 @api.post("/event/{event_id}/onsite/{onsite_id}/update", response=MessageSchema)
 @ensure_event_staff
 def update_on_site_attendee(request, event_id: int, onsite_id: int):
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     oa = OnSiteAttendee.objects.get(id=onsite_id, event=event)
     data = json.loads(request.body)
 
@@ -2028,7 +2159,7 @@ def update_site_settings(request, data: SiteSettingsUpdateSchema):
 @ensure_event_staff
 def get_event_payments(request, event_id: int):
     """Get all payments for an event (event admin only)."""
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
     payments = PaymentHistory.objects.filter(event=event).select_related('manual_transaction')
 
     payment_list = []
@@ -2085,11 +2216,76 @@ def get_event_payments(request, event_id: int):
     return payment_list
 
 
+def _parse_event_ids(event_ids):
+    """Parse a comma-separated list of event IDs from a query parameter."""
+    if not event_ids:
+        return None
+    return [int(event_id) for event_id in event_ids.split(",") if event_id.strip()]
+
+
+def _ledger_response(request, payments, format, filename):
+    if format == "xlsx":
+        return ledger_xlsx_response(payments, f"{filename}.xlsx")
+    if format == "csv":
+        return ledger_csv_response(payments, f"{filename}.csv")
+    return api.create_response(
+        request,
+        {"code": "invalid_format", "message": "Format must be csv or xlsx."},
+        status=400,
+    )
+
+
+@api.get("/event/{event_id}/payments/summary", response=PaymentSummarySchema)
+@ensure_event_staff
+def get_event_payment_summary(request, event_id: int, start_date: date = None, end_date: date = None):
+    """Get aggregated payment totals for an event (event admin only)."""
+    return get_payment_summary([event_id], start_date, end_date)
+
+
+@api.get("/event/{event_id}/payments/export")
+@ensure_event_staff
+def export_event_payments(request, event_id: int, format: str = "csv", start_date: date = None, end_date: date = None):
+    """Download the payment ledger of an event as CSV or XLSX (event admin only)."""
+    payments = filter_payments([event_id], start_date, end_date)
+    return _ledger_response(request, payments, format, f"payments_event_{event_id}")
+
+
+@api.get("/admin/payments/summary", response=PaymentSummarySchema)
+@ensure_staff
+def get_payment_report_summary(request, event_ids: str = "", start_date: date = None, end_date: date = None):
+    """Get aggregated payment totals across events and a date range (admin only)."""
+    try:
+        ids = _parse_event_ids(event_ids)
+    except ValueError:
+        return api.create_response(
+            request,
+            {"code": "invalid_event_ids", "message": "Invalid event IDs."},
+            status=400,
+        )
+    return get_payment_summary(ids, start_date, end_date)
+
+
+@api.get("/admin/payments/export")
+@ensure_staff
+def export_payment_report(request, event_ids: str = "", format: str = "csv", start_date: date = None, end_date: date = None):
+    """Download the payment ledger across events and a date range as CSV or XLSX (admin only)."""
+    try:
+        ids = _parse_event_ids(event_ids)
+    except ValueError:
+        return api.create_response(
+            request,
+            {"code": "invalid_event_ids", "message": "Invalid event IDs."},
+            status=400,
+        )
+    payments = filter_payments(ids, start_date, end_date)
+    return _ledger_response(request, payments, format, "payments")
+
+
 @api.post("/event/{event_id}/payment/add", response=MessageSchema)
 @ensure_event_staff
 def create_event_payment(request, event_id: int, data: PaymentCreateSchema):
     """Create a new payment for an attendee (event admin only)."""
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     # Validate attendee exists and belongs to this event
     try:
@@ -2156,7 +2352,7 @@ def create_event_payment(request, event_id: int, data: PaymentCreateSchema):
 @ensure_event_staff
 def cancel_event_payment(request, event_id: int, payment_id: int, data: PaymentCancelSchema):
     """Cancel a payment (event admin only). If paid via Toss, cancels with Toss API."""
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     try:
         payment = PaymentHistory.objects.get(id=payment_id, event=event)
@@ -2183,15 +2379,10 @@ def cancel_event_payment(request, event_id: int, payment_id: int, data: PaymentC
                 status=500,
             )
 
-        auth_string = base64.b64encode(f"{settings.TOSS_SECRET_KEY}:".encode()).decode()
-
         try:
             response = requests.post(
                 f"{settings.TOSS_API_URL}/payments/{payment.toss_payment_key}/cancel",
-                headers={
-                    "Authorization": f"Basic {auth_string}",
-                    "Content-Type": "application/json",
-                },
+                headers=toss_headers(),
                 json={"cancelReason": data.cancel_reason},
                 timeout=30,
             )
@@ -2229,7 +2420,7 @@ def cancel_event_payment(request, event_id: int, payment_id: int, data: PaymentC
 @ensure_event_staff
 def update_payment_note(request, event_id: int, payment_id: int, data: PaymentNoteUpdateSchema):
     """Update payment note (event admin only)."""
-    event = Event.objects.get(id=event_id)
+    event = get_request_event(request, event_id)
 
     try:
         payment = PaymentHistory.objects.get(id=payment_id, event=event)
@@ -2302,16 +2493,10 @@ def confirm_toss_payment(request, data: TossPaymentConfirmSchema):
         )
 
     # Call Toss Payments confirm API
-    # Authorization: Basic base64(secretKey:)
-    auth_string = base64.b64encode(f"{settings.TOSS_SECRET_KEY}:".encode()).decode()
-
     try:
         response = requests.post(
             f"{settings.TOSS_API_URL}/payments/confirm",
-            headers={
-                "Authorization": f"Basic {auth_string}",
-                "Content-Type": "application/json",
-            },
+            headers=toss_headers(),
             json={
                 "paymentKey": data.paymentKey,
                 "orderId": data.orderId,
@@ -2351,6 +2536,7 @@ def confirm_toss_payment(request, data: TossPaymentConfirmSchema):
         payment_type=toss_payment.get('method', 'card'),
         toss_order_id=data.orderId,
         toss_payment_key=data.paymentKey,
+        receipt_url=extract_receipt_url(toss_payment),
     )
     payment.copy_attendee_info(attendee)
     payment.copy_event_info(event)
@@ -2373,6 +2559,8 @@ def get_card_receipt(request, order_id: str):
     """
     Get Toss receipt URL for a card payment.
     Returns the URL to redirect to Toss's receipt page.
+    The URL is stored on the payment at confirmation time; older payments
+    are looked up once and the result is persisted.
     """
     user = request.user
 
@@ -2394,6 +2582,9 @@ def get_card_receipt(request, order_id: str):
             status=400,
         )
 
+    if payment.receipt_url:
+        return {"code": "success", "receipt_url": payment.receipt_url}
+
     # Validate secret key is configured
     if not settings.TOSS_SECRET_KEY:
         return api.create_response(
@@ -2403,16 +2594,8 @@ def get_card_receipt(request, order_id: str):
         )
 
     # Call Toss Payments API to get payment details
-    auth_string = base64.b64encode(f"{settings.TOSS_SECRET_KEY}:".encode()).decode()
-
     try:
-        response = requests.get(
-            f"{settings.TOSS_API_URL}/payments/orders/{order_id}",
-            headers={
-                "Authorization": f"Basic {auth_string}",
-            },
-            timeout=30,
-        )
+        response = get_toss_payment_by_order(order_id)
     except requests.RequestException as e:
         logger.error(f"Toss API request failed: {e}")
         return api.create_response(
@@ -2433,8 +2616,7 @@ def get_card_receipt(request, order_id: str):
             status=400,
         )
 
-    toss_data = response.json()
-    receipt_url = toss_data.get("receipt", {}).get("url", "")
+    receipt_url = extract_receipt_url(response.json())
 
     if not receipt_url:
         return api.create_response(
@@ -2443,6 +2625,8 @@ def get_card_receipt(request, order_id: str):
             status=404,
         )
 
+    save_receipt_url(payment, receipt_url)
+
     return {"code": "success", "receipt_url": receipt_url}
 
 
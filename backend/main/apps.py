@@ -7,3 +7,7 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         import main.signals  # noqa: F401
+        import main.metrics  # noqa: F401  (connects Celery task signals)
+        import main.db_pool  # noqa: F401  (pool metrics, Celery fork handling)
+        from main.tracing import instrument
+        instrument()
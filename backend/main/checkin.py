@@ -0,0 +1,235 @@
+"""
+Registration desk check-in.
+
+People are looked up by nametag number, (event, attendee_nametag_id) for
+attendees and (event, onsiteattendee_nametag_id) for on-site attendees,
+both covered by the models' unique indexes, or by the signed token printed
+as a QR code on their nametag. A batch is applied with one UPDATE per kind
+of attendee. Those updates send no signals, so the dashboard counters are
+adjusted here by the number of rows that changed.
+
+Desks can work offline. They download a snapshot() once, then only
+changes_since() their cursor. Saving an attendee or on-site attendee sets
+its change_seq to 0; before answering, a sync gives those rows the
+event's next change sequence number (see number_changes() and
+EventCounters.next_change_seq), so saves don't hold the counters row
+lock that keeps the numbers in commit order. Deletions leave a
+SyncTombstone. Check-ins queued while offline are sent with
+upload_check_ins().
+"""
+from django.core import signing
+from django.db import transaction
+
+from main import counters
+from main.models import Attendee, EventCounters, OnSiteAttendee, SyncTombstone
+
+MAX_BATCH = 500
+TOKEN_SALT = 'main.checkin'
+
+# Kind: (model, nametag field, checked-in field, counter)
+KINDS = {
+    'attendee': (Attendee, 'attendee_nametag_id', 'is_attended', 'attended'),
+    'onsite': (OnSiteAttendee, 'onsiteattendee_nametag_id', 'is_confirmed', 'onsite_confirmed'),
+}
+_TOKEN_KINDS = {'a': 'attendee', 'o': 'onsite'}
+_NAME_FIELDS = {
+    'attendee': ['first_name', 'middle_initial', 'last_name', 'korean_name'],
+    'onsite': ['name'],
+}
+
+
+class CheckInError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def checkin_token(kind, event_id, nametag_id):
+    """Signed token identifying a nametag, for its QR code"""
+    prefix = next(key for key, value in _TOKEN_KINDS.items() if value == kind)
+    return signing.Signer(salt=TOKEN_SALT).sign(f'{prefix}{event_id}-{nametag_id}')
+
+
+def _read_token(token, event_id):
+    """(kind, nametag_id) of a token issued for this event, or None"""
+    try:
+        value = signing.Signer(salt=TOKEN_SALT).unsign(token)
+        token_event_id, nametag_id = value[1:].split('-')
+        kind = _TOKEN_KINDS[value[0]]
+    except (signing.BadSignature, KeyError, ValueError):
+        return None
+    if int(token_event_id) != event_id:
+        return None
+    return kind, int(nametag_id)
+
+
+def _lookup(item, event_id):
+    """(kind, nametag_id) an item refers to, or None for an invalid token"""
+    if item.get('token'):
+        return _read_token(item['token'], event_id)
+    if item.get('nametag_id') is not None:
+        return 'attendee', item['nametag_id']
+    if item.get('onsite_nametag_id') is not None:
+        return 'onsite', item['onsite_nametag_id']
+    raise CheckInError('invalid_item', 'Each item needs a nametag_id, onsite_nametag_id or token.')
+
+
+def _name(row):
+    if 'name' in row:
+        return row['name']
+    middle = f" {row['middle_initial']}" if row['middle_initial'] else ''
+    return f"{row['first_name']}{middle} {row['last_name']}"
+
+
+def number_changes(event):
+    """Give attendees and on-site attendees saved since the last sync the event's next change sequence number"""
+    pending = [model.objects.filter(event=event, change_seq=0) for model, _, _, _ in KINDS.values()]
+    if not any(people.exists() for people in pending):
+        return
+    with transaction.atomic():
+        change_seq = EventCounters.next_change_seq(event.id)
+        if change_seq:
+            for people in pending:
+                people.update(change_seq=change_seq)
+
+
+def check_in(event, items, attended=True, unchanged_since=None):
+    """
+    Check in (or, with attended=False, check out) a batch of people. Each
+    item is {'nametag_id': ...} for an attendee, {'onsite_nametag_id': ...}
+    for an on-site attendee or {'token': ...} from a nametag QR code.
+    With `unchanged_since`, people changed after that sync cursor are left
+    alone; so are people saved but not yet numbered (change_seq 0).
+    Returns one result per item: {'kind', 'nametag_id', 'name',
+    'status'} with status 'checked_in'/'checked_out', 'unchanged',
+    'conflict', 'not_found' or 'invalid_token'. Raises CheckInError.
+    """
+    if len(items) > MAX_BATCH:
+        raise CheckInError('too_many', f'Check in at most {MAX_BATCH} people at once.')
+    lookups = [_lookup(item, event.id) for item in items]
+
+    found = {}
+    with transaction.atomic():
+        change_seq = None
+        for kind, (model, nametag_field, flag, counter) in KINDS.items():
+            nametag_ids = {lookup[1] for lookup in lookups if lookup is not None and lookup[0] == kind}
+            if not nametag_ids:
+                continue
+            people = model.objects.filter(event=event, **{f'{nametag_field}__in': nametag_ids})
+            for row in people.values(nametag_field, flag, 'change_seq', *_NAME_FIELDS[kind]):
+                stale = unchanged_since is not None and not 0 < row['change_seq'] <= unchanged_since
+                found[kind, row[nametag_field]] = (_name(row), row[flag], stale)
+            if unchanged_since is not None:
+                people = people.filter(change_seq__gt=0, change_seq__lte=unchanged_since)
+            if change_seq is None:
+                change_seq = EventCounters.next_change_seq(event.id)
+            changed = people.filter(**{flag: not attended}).update(**{flag: attended, 'change_seq': change_seq})
+            counters.adjust(event.id, **{counter: changed if attended else -changed})
+
+    results, seen = [], set()
+    for lookup in lookups:
+        if lookup is None:
+            results.append({'kind': None, 'nametag_id': None, 'name': '', 'status': 'invalid_token'})
+            continue
+        kind, nametag_id = lookup
+        if lookup not in found:
+            status, name = 'not_found', ''
+        else:
+            name, was_attended, stale = found[lookup]
+            # A nametag listed twice in a batch only changes once
+            if was_attended == attended or lookup in seen:
+                status = 'unchanged'
+            elif stale:
+                status = 'conflict'
+            else:
+                status = 'checked_in' if attended else 'checked_out'
+        seen.add(lookup)
+        results.append({'kind': kind, 'nametag_id': nametag_id, 'name': name, 'status': status})
+    return results
+
+
+def upload_check_ins(event, items, cursor):
+    """
+    Apply check-ins queued by an offline desk: items as for check_in(),
+    each with 'attended', in the order they were made; `cursor` is the
+    desk's sync cursor when it went offline. Items for the same person
+    collapse to the last one ('superseded'). Check-ins always apply, as
+    someone arriving is a fact; a check-out of someone changed since
+    `cursor` is a 'conflict' and the server state wins.
+    """
+    if len(items) > MAX_BATCH:
+        raise CheckInError('too_many', f'Check in at most {MAX_BATCH} people at once.')
+    lookups = [_lookup(item, event.id) for item in items]
+    last = {lookup: index for index, lookup in enumerate(lookups) if lookup is not None}
+    check_ins = [index for index in last.values() if items[index].get('attended', True)]
+    check_outs = [index for index in last.values() if not items[index].get('attended', True)]
+
+    results = {}
+    with transaction.atomic():
+        for indexes, attended, since in ((check_ins, True, None), (check_outs, False, cursor)):
+            applied = check_in(event, [items[index] for index in indexes], attended, unchanged_since=since)
+            results.update(zip(indexes, applied))
+    return [
+        results.get(index) or {
+            'kind': lookup and lookup[0], 'nametag_id': lookup and lookup[1], 'name': '',
+            'status': 'invalid_token' if lookup is None else 'superseded',
+        }
+        for index, lookup in enumerate(lookups)
+    ]
+
+
+def _people(event, kind, since=None):
+    model, nametag_field, flag, _ = KINDS[kind]
+    people = model.objects.filter(event=event)
+    if since is not None:
+        people = people.filter(change_seq__gt=since)
+    return [
+        {
+            'id': row['id'],
+            'nametag_id': row[nametag_field],
+            'name': _name(row),
+            'korean_name': row.get('korean_name', ''),
+            'institute': row['institute'],
+            'checked_in': row[flag],
+        }
+        for row in people.order_by(nametag_field).values('id', nametag_field, flag, 'institute', *_NAME_FIELDS[kind])
+    ]
+
+
+def _cursor(event):
+    return EventCounters.objects.filter(event=event).values_list('change_seq', flat=True).first() or 0
+
+
+def snapshot(event):
+    """Everyone a desk needs to check in, with the cursor to ask for changes_since()"""
+    number_changes(event)
+    # Read the cursor first: every change numbered up to it is committed, so it is in the lists below
+    cursor = _cursor(event)
+    return {
+        'cursor': cursor, 'full': True,
+        'attendees': _people(event, 'attendee'), 'onsite': _people(event, 'onsite'),
+        'deleted_attendees': [], 'deleted_onsite': [],
+    }
+
+
+def changes_since(event, cursor):
+    """
+    What changed after `cursor`: changed people and the ids of deleted ones.
+    A cursor this server did not issue (e.g. after a restore) gets a full
+    snapshot instead, marked 'full'.
+    """
+    number_changes(event)
+    current = _cursor(event)
+    if cursor > current:
+        return snapshot(event)
+    deleted = {'attendee': [], 'onsite': []}
+    for kind, record_id in SyncTombstone.objects.filter(event=event, change_seq__gt=cursor).values_list(
+        'kind', 'record_id'
+    ):
+        deleted[kind].append(record_id)
+    return {
+        'cursor': current, 'full': False,
+        'attendees': _people(event, 'attendee', cursor), 'onsite': _people(event, 'onsite', cursor),
+        'deleted_attendees': deleted['attendee'], 'deleted_onsite': deleted['onsite'],
+    }
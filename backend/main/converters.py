@@ -0,0 +1,385 @@
+"""
+DOCX and ODT abstracts to HTML.
+
+Both converters stream the document XML with iterparse, so a paragraph is
+rendered as soon as it ends and then dropped. Paragraph styles are
+resolved once per style name into flat formatting tuples, and the opening
+and closing tags of each combination of formatting are built once, so a
+run or span costs a dictionary lookup and an append.
+
+The output is byte-for-byte what the previous converters (kept in
+main.utils as legacy_docx_to_html() and legacy_odt_to_html()) produced,
+including their quirks, e.g. a DOCX paragraph style applies only its own
+formatting, not that of the style it is based on. ConverterTests checks
+this against a corpus from main.datagen.converter_corpus(), and the
+benchmark_converters command measures both.
+"""
+import html
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+# DOCX
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY, W_P, W_R, W_HYPERLINK = f'{_W}body', f'{_W}p', f'{_W}r', f'{_W}hyperlink'
+W_PPR, W_RPR, W_PSTYLE, W_JC, W_STYLE = f'{_W}pPr', f'{_W}rPr', f'{_W}pStyle', f'{_W}jc', f'{_W}style'
+W_VAL, W_TYPE = f'{_W}val', f'{_W}type'
+_RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+_STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+# Run children with a text equivalent, as in python-docx's Run.text
+_DOCX_TEXT = {f'{_W}tab': '\t', f'{_W}ptab': '\t', f'{_W}cr': '\n', f'{_W}noBreakHyphen': '-'}
+_DOCX_ALIGNMENTS = {
+    'left': 'left', 'center': 'center', 'right': 'right', 'both': 'justify',
+    # python-docx rejects these
+    'start': 'left', 'end': 'right',
+    # The previous converter wrote other alignments as python-docx's enum members
+    'distribute': 'DISTRIBUTE (4)', 'mediumKashida': 'JUSTIFY_MED (5)', 'highKashida': 'JUSTIFY_HI (7)',
+    'lowKashida': 'JUSTIFY_LOW (8)', 'thaiDistribute': 'THAI_JUSTIFY (9)',
+}
+# (bold, italic, underline, subscript, superscript), each True, False or None if not set,
+# nested with bold innermost
+_DOCX_TAGS = ('b', 'i', 'u', 'sub', 'sup')
+_DOCX_UNSET = (None,) * 5
+
+# ODT
+_STYLE_NS = 'urn:oasis:names:tc:opendocument:xmlns:style:1.0'
+_FO_NS = 'urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0'
+_TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+STYLE_STYLE = f'{{{_STYLE_NS}}}style'
+STYLE_NAME, STYLE_PARENT = f'{{{_STYLE_NS}}}name', f'{{{_STYLE_NS}}}parent-style-name'
+STYLE_PARAGRAPH_PROPERTIES, STYLE_TEXT_PROPERTIES = (
+    f'{{{_STYLE_NS}}}paragraph-properties', f'{{{_STYLE_NS}}}text-properties',
+)
+AUTOMATIC_STYLES = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}automatic-styles'
+TEXT_P, TEXT_SPAN, TEXT_LINE_BREAK = f'{{{_TEXT_NS}}}p', f'{{{_TEXT_NS}}}span', f'{{{_TEXT_NS}}}line-break'
+TEXT_STYLE_NAME = f'{{{_TEXT_NS}}}style-name'
+FO_TEXT_ALIGN, FO_FONT_WEIGHT, FO_FONT_STYLE = (
+    f'{{{_FO_NS}}}text-align', f'{{{_FO_NS}}}font-weight', f'{{{_FO_NS}}}font-style',
+)
+STYLE_UNDERLINE, STYLE_POSITION = f'{{{_STYLE_NS}}}text-underline-style', f'{{{_STYLE_NS}}}text-position'
+# (bold, italic, underline, superscript, subscript), nested with bold outermost
+_ODT_TAGS = ('b', 'i', 'u', 'sup', 'sub')
+
+
+class _Wrapper(dict):
+    """{formatting: (opening tags, closing tags)} for formatting tuples matching `tags`, built on first use"""
+
+    def __init__(self, tags, innermost_first):
+        super().__init__()
+        self.tags = tags
+        self.innermost_first = innermost_first
+
+    def __missing__(self, formatting):
+        names = [tag for tag, on in zip(self.tags, formatting) if on]
+        if self.innermost_first:
+            names.reverse()
+        opening, closing = ''.join(f'<{tag}>' for tag in names), ''.join(f'</{tag}>' for tag in reversed(names))
+        self[formatting] = (opening, closing)
+        return opening, closing
+
+
+def _docx_part(archive, source, relationship):
+    """Name of the part that `source` ('' for the package) relates to with `relationship`, or None"""
+    directory, name = posixpath.split(source)
+    try:
+        relationships = ET.fromstring(archive.read(posixpath.join(directory, '_rels', f'{name}.rels')))
+    except KeyError:
+        return None
+    for rel in relationships.iter(_RELATIONSHIP):
+        if rel.get('Type') == relationship and rel.get('TargetMode') != 'External':
+            return posixpath.normpath(posixpath.join(directory, rel.get('Target'))).lstrip('/')
+    return None
+
+
+def _on(element):
+    """Value of an on/off property such as <w:b/>: None when absent"""
+    if element is None:
+        return None
+    return element.get(W_VAL, 'true') in ('1', 'true', 'on')
+
+
+def _docx_formatting(rPr):
+    """Formatting set directly by a w:rPr, as python-docx's Font reads it"""
+    if rPr is None:
+        return _DOCX_UNSET
+    underline = rPr.find(f'{_W}u')
+    underline = None if underline is None or underline.get(W_VAL) is None else underline.get(W_VAL) != 'none'
+    position = rPr.find(f'{_W}vertAlign')
+    position = None if position is None else position.get(W_VAL)
+    return (
+        _on(rPr.find(f'{_W}b')),
+        _on(rPr.find(f'{_W}i')),
+        underline,
+        None if position is None else position == 'subscript',
+        None if position is None else position == 'superscript',
+    )
+
+
+def _docx_styles(archive, part):
+    """
+    ({style id: (alignment, formatting)}, default) for the paragraph styles
+    in `part`. An id used by another type of style maps to None, meaning
+    the default style, as does a missing id.
+    """
+    styles, default = {}, (None, _DOCX_UNSET)
+    if part is None or part not in archive.namelist():
+        # python-docx then uses its own default styles, which set no formatting
+        return styles, default
+    root = ET.fromstring(archive.read(part))
+    for style in root.iterfind(W_STYLE):
+        if style.get(W_TYPE) != 'paragraph':
+            styles.setdefault(style.get(f'{_W}styleId'), None)
+            continue
+        pPr = style.find(W_PPR)
+        jc = pPr.find(W_JC) if pPr is not None else None
+        resolved = (jc.get(W_VAL) if jc is not None else None, _docx_formatting(style.find(W_RPR)))
+        styles.setdefault(style.get(f'{_W}styleId'), resolved)
+        # The last default style wins
+        if style.get(f'{_W}default') in ('1', 'true', 'on'):
+            default = resolved
+    return styles, default
+
+
+def _docx_text(run):
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == f'{_W}t':
+            parts.append(child.text or '')
+        elif tag == f'{_W}br':
+            # Page and column breaks have no text
+            parts.append('\n' if child.get(W_TYPE, 'textWrapping') == 'textWrapping' else '')
+        elif tag in _DOCX_TEXT:
+            parts.append(_DOCX_TEXT[tag])
+    return ''.join(parts)
+
+
+def docx_to_html(file_path):
+    """
+    Convert a DOCX document to HTML focusing only on basic formatting:
+    - Paragraph alignment
+    - Bold, italic, underline
+    - Superscript, subscript
+
+    Only paragraphs directly in the body are converted, not those in tables.
+
+    Args:
+        file_path (str): Path to the DOCX file
+
+    Returns:
+        str: HTML content of the document
+    """
+    wrap = _Wrapper(_DOCX_TAGS, innermost_first=True)
+    output = []
+    with zipfile.ZipFile(file_path) as archive:
+        document = _docx_part(archive, '', _OFFICE_DOCUMENT) or 'word/document.xml'
+        styles, default = _docx_styles(archive, _docx_part(archive, document, _STYLES))
+
+        with archive.open(document) as stream:
+            depth, body = 0, None
+            for event, element in ET.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2 and element.tag == W_BODY:
+                        body = element
+                    continue
+                depth -= 1
+                if depth != 2 or body is None:
+                    continue
+                # A child of w:body has ended
+                if element.tag == W_P:
+                    alignment, style_id = None, None
+                    pPr = element.find(W_PPR)
+                    if pPr is not None:
+                        jc, pStyle = pPr.find(W_JC), pPr.find(W_PSTYLE)
+                        alignment = jc.get(W_VAL) if jc is not None else None
+                        style_id = pStyle.get(W_VAL) if pStyle is not None else None
+                    style_alignment, inherited = (styles.get(style_id) if style_id else None) or default
+                    if alignment is None:
+                        alignment = style_alignment
+                    output.append(
+                        '<p class="docx_paragraphs" style="text-align: '
+                        f'{_DOCX_ALIGNMENTS.get(alignment, "left") if alignment else "left"};">'
+                    )
+                    for child in element:
+                        if child.tag == W_R:
+                            runs = (child,)
+                        elif child.tag == W_HYPERLINK:
+                            runs = child.iterfind(W_R)
+                        else:
+                            continue
+                        for run in runs:
+                            own = _docx_formatting(run.find(W_RPR))
+                            if own is not _DOCX_UNSET:
+                                own = tuple(
+                                    value if value is not None else style_value
+                                    for value, style_value in zip(own, inherited)
+                                )
+                            opening, closing = wrap[inherited if own is _DOCX_UNSET else own]
+                            text = _docx_text(run)
+                            output.append(f'{opening}{html.escape(text) if text else ""}{closing}')
+                    output.append('</p>')
+                body.remove(element)
+    return ''.join(output)
+
+
+def _odt_properties(style):
+    """The properties of a style:style the converter uses, as {attribute: value}"""
+    properties = {}
+    paragraph = style.find(f'.//{STYLE_PARAGRAPH_PROPERTIES}')
+    if paragraph is not None and FO_TEXT_ALIGN in paragraph.attrib:
+        properties[FO_TEXT_ALIGN] = paragraph.attrib[FO_TEXT_ALIGN]
+    text = style.find(f'.//{STYLE_TEXT_PROPERTIES}')
+    if text is not None:
+        for attribute in (FO_FONT_WEIGHT, FO_FONT_STYLE, STYLE_UNDERLINE, STYLE_POSITION):
+            if attribute in text.attrib:
+                properties[attribute] = text.attrib[attribute]
+    return properties
+
+
+class _OdtStyles:
+    """
+    Styles from styles.xml and the automatic styles of content.xml, with
+    paragraph styles resolved through their parents once per name
+    """
+
+    def __init__(self):
+        self.styles, self.automatic = {}, {}
+        self.parents, self.automatic_parents = {}, {}
+        self.paragraphs = {}
+        self.spans = {}
+
+    def add(self, style, automatic=False):
+        name = style.get(STYLE_NAME)
+        parent = style.get(STYLE_PARENT)
+        if parent:
+            (self.automatic_parents if automatic else self.parents)[name] = parent
+        (self.automatic if automatic else self.styles)[name] = _odt_properties(style)
+
+    def _resolve(self, name, own, other, parents, seen):
+        # Parents are looked up in the same styles first, then once in the other ones
+        if name in seen:
+            return {}
+        resolved = {}
+        parent = parents.get(name)
+        if parent:
+            if parent in own:
+                resolved.update(self._resolve(parent, own, other, parents, seen | {name}))
+            elif other and parent in other:
+                resolved.update(self._resolve(parent, other, None, parents, seen | {name}))
+        resolved.update(own[name])
+        return resolved
+
+    def paragraph(self, name):
+        """(alignment, formatting) of a paragraph with style `name`"""
+        result = self.paragraphs.get(name)
+        if result is None:
+            style = {}
+            if name:
+                parents = {**self.parents, **self.automatic_parents}
+                if name in self.automatic:
+                    style = self._resolve(name, self.automatic, self.styles, parents, frozenset())
+                elif name in self.styles:
+                    style = self._resolve(name, self.styles, self.automatic, parents, frozenset())
+            position = style.get(STYLE_POSITION, '')
+            result = self.paragraphs[name] = (style.get(FO_TEXT_ALIGN, 'left'), (
+                style.get(FO_FONT_WEIGHT) == 'bold',
+                style.get(FO_FONT_STYLE) == 'italic',
+                style.get(STYLE_UNDERLINE, 'none') != 'none',
+                position.startswith('super'),
+                position.startswith('sub'),
+            ))
+        return result
+
+    def span(self, name, inherited):
+        """Formatting of a span with style `name` in a paragraph formatted `inherited`"""
+        key = (name, inherited)
+        formatting = self.spans.get(key)
+        if formatting is None:
+            style = self.automatic.get(name)
+            if style is None:
+                style = self.styles.get(name, {})
+            bold, italic, underline, superscript, subscript = inherited
+            if FO_FONT_WEIGHT in style:
+                bold = style[FO_FONT_WEIGHT] == 'bold'
+            if FO_FONT_STYLE in style:
+                italic = style[FO_FONT_STYLE] == 'italic'
+            if STYLE_UNDERLINE in style:
+                underline = style[STYLE_UNDERLINE] != 'none'
+            if STYLE_POSITION in style:
+                superscript = style[STYLE_POSITION].startswith('super')
+                subscript = style[STYLE_POSITION].startswith('sub')
+            formatting = self.spans[key] = (bold, italic, underline, superscript, subscript)
+        return formatting
+
+
+def _odt_paragraph(paragraph, styles, wrap):
+    alignment, inherited = styles.paragraph(paragraph.get(TEXT_STYLE_NAME))
+    opening, closing = wrap[inherited]
+    output = [f'<p class="odt_paragraphs" style="text-align: {alignment};">']
+    # Text outside spans has the paragraph's formatting; whitespace-only text is dropped
+    if paragraph.text and paragraph.text.strip():
+        output.append(f'{opening}{html.escape(paragraph.text)}{closing}')
+    for child in paragraph:
+        if child.tag == TEXT_SPAN:
+            span_opening, span_closing = wrap[styles.span(child.get(TEXT_STYLE_NAME), inherited)]
+            output.append(f'{span_opening}{html.escape(child.text) if child.text else ""}{span_closing}')
+        elif child.tag == TEXT_LINE_BREAK:
+            output.append('<br/>')
+        elif child.text and child.text.strip():
+            output.append(f'{opening}{html.escape(child.text)}{closing}')
+        if child.tail and child.tail.strip():
+            output.append(f'{opening}{html.escape(child.tail)}{closing}')
+    output.append('</p>')
+    return ''.join(output)
+
+
+def odt_to_html(file_path):
+    """
+    Convert an ODT document to HTML focusing only on basic formatting:
+    - Paragraph alignment
+    - Bold, italic, underline
+    - Superscript, subscript
+
+    Every text:p is converted, in document order, including those nested
+    in others (e.g. in notes), which follow the paragraph they are in.
+
+    Args:
+        file_path (str): Path to the ODT file
+
+    Returns:
+        str: HTML content of the document
+    """
+    styles = _OdtStyles()
+    wrap = _Wrapper(_ODT_TAGS, innermost_first=False)
+    with zipfile.ZipFile(file_path) as archive:
+        if 'styles.xml' in archive.namelist():
+            with archive.open('styles.xml') as stream:
+                for _, element in ET.iterparse(stream):
+                    if element.tag == STYLE_STYLE:
+                        styles.add(element)
+                        element.clear()
+
+        # Paragraphs end inside out but are output in the order they start
+        output, open_paragraphs, automatic = [], [], False
+        with archive.open('content.xml') as stream:
+            for event, element in ET.iterparse(stream, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == TEXT_P:
+                        open_paragraphs.append(len(output))
+                        output.append('')
+                    elif tag == AUTOMATIC_STYLES:
+                        automatic = True
+                elif tag == TEXT_P:
+                    output[open_paragraphs.pop()] = _odt_paragraph(element, styles, wrap)
+                    # A nested paragraph's text and tail belong to the paragraph around it
+                    if not open_paragraphs:
+                        element.clear()
+                elif tag == STYLE_STYLE and automatic:
+                    styles.add(element, automatic=True)
+                    element.clear()
+                elif tag == AUTOMATIC_STYLES:
+                    automatic = False
+    return ''.join(output)
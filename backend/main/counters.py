@@ -0,0 +1,247 @@
+"""
+Per-event dashboard counters.
+
+EventCounters holds the numbers shown on an event's dashboard, so serving
+them is a single-row read. They are adjusted with F() updates in the same
+transaction as the change that causes them: main.signals forwards saves
+and deletes of Attendee, OnSiteAttendee, Abstract and PaymentHistory here.
+Queryset update() and bulk_create() send no signals, so code that uses
+them must call adjust() itself. reconcile_counters() recounts from the
+rows; main.tasks.reconcile_event_counters runs it periodically to repair
+any drift.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from main.models import Abstract, Attendee, Event, EventCounters, OnSiteAttendee, PaymentHistory
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = [
+    'registered', 'paid', 'attended', 'onsite', 'onsite_confirmed',
+    'speaker_abstracts', 'poster_abstracts', 'short_talk_requests',
+]
+
+
+def _attendee_counts(attendee):
+    return {'registered': 1, 'attended': int(attendee.is_attended)}
+
+
+def _onsite_counts(onsite):
+    return {'onsite': 1, 'onsite_confirmed': int(onsite.is_confirmed)}
+
+
+def _abstract_counts(abstract):
+    return {
+        'speaker_abstracts': int(abstract.type == 'speaker'),
+        'poster_abstracts': int(abstract.type == 'poster'),
+        'short_talk_requests': int(abstract.type == 'poster' and abstract.wants_short_talk),
+    }
+
+
+# Model: (fields the counts depend on, counts of one instance)
+COUNTED = {
+    Attendee: ({'event_id', 'is_attended'}, _attendee_counts),
+    OnSiteAttendee: ({'event_id', 'is_confirmed'}, _onsite_counts),
+    Abstract: ({'event_id', 'type', 'wants_short_talk'}, _abstract_counts),
+}
+
+
+def adjust(event_id, **deltas):
+    """Add `deltas` to the event's counters, e.g. adjust(event.id, attended=3)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if event_id is None or not deltas:
+        return
+    # A missing row (the event is being deleted, or predates the counters) is left to reconcile_counters()
+    EventCounters.objects.filter(event_id=event_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def _state(instance):
+    """(event_id, counts) of a counted instance, or None if a field they depend on is deferred"""
+    fields, counts = COUNTED[type(instance)]
+    if fields & instance.get_deferred_fields():
+        return None
+    return instance.event_id, counts(instance)
+
+
+def _payment_state(payment):
+    """(attendee_id, completed) of a payment, or None if a field it depends on is deferred"""
+    if {'attendee_id', 'status'} & payment.get_deferred_fields():
+        return None
+    return payment.attendee_id, payment.status == 'completed'
+
+
+def remember(instance):
+    """Record what `instance` counts for as loaded, so a later save can count the difference"""
+    instance._counted = (_payment_state if isinstance(instance, PaymentHistory) else _state)(instance)
+
+
+def before_save(instance):
+    """Load the stored state of an instance that was loaded with deferred fields"""
+    if not instance._state.adding and getattr(instance, '_counted', None) is None:
+        stored = type(instance).objects.filter(pk=instance.pk).first()
+        instance._counted = stored._counted if stored is not None else None
+
+
+def _current(instance):
+    if isinstance(instance, PaymentHistory):
+        fields, state = {'attendee_id', 'status'}, _payment_state
+    else:
+        fields, state = COUNTED[type(instance)][0], _state
+    deferred = fields & instance.get_deferred_fields()
+    if deferred:
+        # Without a field list, refresh_from_db() reloads only the fields already loaded
+        instance.refresh_from_db(fields=deferred)
+    return state(instance)
+
+
+def _count_change(old, new):
+    changes = defaultdict(lambda: defaultdict(int))
+    if old is not None:
+        for field, value in old[1].items():
+            changes[old[0]][field] -= value
+    if new is not None:
+        for field, value in new[1].items():
+            changes[new[0]][field] += value
+    for event_id, deltas in changes.items():
+        adjust(event_id, **deltas)
+
+
+def _payment_change(payment, old, new):
+    """An attendee counts as paid while they have at least one completed payment"""
+    if old == new:
+        return
+    for state, delta in ((old, -1), (new, 1)):
+        if state is None or state[0] is None or not state[1]:
+            continue
+        others = PaymentHistory.objects.filter(attendee=OuterRef('pk'), status='completed').exclude(pk=payment.pk)
+        event_id = (
+            Attendee.objects.filter(pk=state[0]).exclude(Exists(others)).values_list('event_id', flat=True).first()
+        )
+        adjust(event_id, paid=delta)
+
+
+def saved(instance, created):
+    old = None if created else getattr(instance, '_counted', None)
+    new = _current(instance)
+    if isinstance(instance, PaymentHistory):
+        _payment_change(instance, old, new)
+    else:
+        _count_change(old, new)
+    instance._counted = new
+
+
+def before_delete(attendee):
+    # Deleting an attendee detaches their payments (SET_NULL) without sending signals
+    attendee._counted_paid = attendee.payments.filter(status='completed').exists()
+
+
+def deleted(instance):
+    old = getattr(instance, '_counted', None) or _current(instance)
+    if isinstance(instance, PaymentHistory):
+        _payment_change(instance, old, None)
+        return
+    _count_change(old, None)
+    if getattr(instance, '_counted_paid', False):
+        adjust(old[0], paid=-1)
+
+
+def count_events(event_ids=None):
+    """Count everything the counters track from the rows: {event_id: {field: count}}"""
+    def scoped(queryset):
+        return queryset if event_ids is None else queryset.filter(event_id__in=event_ids)
+
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    querysets = [
+        scoped(Attendee.objects).values('event_id').annotate(
+            registered=Count('id'), attended=Count('id', filter=Q(is_attended=True)),
+        ),
+        scoped(Attendee.objects.filter(payments__status='completed')).values('event_id').annotate(
+            paid=Count('id', distinct=True),
+        ),
+        scoped(OnSiteAttendee.objects).values('event_id').annotate(
+            onsite=Count('id'), onsite_confirmed=Count('id', filter=Q(is_confirmed=True)),
+        ),
+        scoped(Abstract.objects).values('event_id').annotate(
+            speaker_abstracts=Count('id', filter=Q(type='speaker')),
+            poster_abstracts=Count('id', filter=Q(type='poster')),
+            short_talk_requests=Count('id', filter=Q(type='poster', wants_short_talk=True)),
+        ),
+    ]
+    for queryset in querysets:
+        for row in queryset.order_by():
+            counts[row.pop('event_id')].update(row)
+    return counts
+
+
+def _correct(event_id, now):
+    """
+    Recount one event with its counters row locked and store the counts.
+    Returns whether the stored counters were wrong.
+    """
+    with transaction.atomic():
+        # Locking the row makes concurrent adjust() calls wait, so none of them is overwritten
+        current = EventCounters.objects.select_for_update().filter(event_id=event_id).first()
+        values = count_events([event_id])[event_id]
+        if current is None:
+            EventCounters.objects.bulk_create(
+                [EventCounters(event_id=event_id, reconciled_at=now, **values)],
+                update_conflicts=True, unique_fields=['event'], update_fields=[*COUNTER_FIELDS, 'reconciled_at'],
+            )
+            return False
+        drifted = any(getattr(current, field) != values[field] for field in COUNTER_FIELDS)
+        EventCounters.objects.filter(pk=current.pk).update(reconciled_at=now, **values)
+        return drifted
+
+
+def reconcile_counters(event_ids=None):
+    """
+    Recount the counters of `event_ids` (all events by default) and store
+    them, creating missing rows. Returns the ids of events whose stored
+    counters were wrong.
+
+    The recount runs without locks; only an event whose counters look wrong
+    or are missing is recounted again in its own short transaction, with
+    just its counters row locked.
+    """
+    events = Event.objects.all() if event_ids is None else Event.objects.filter(id__in=event_ids)
+    stored = {
+        row['event_id']: row
+        for row in EventCounters.objects.filter(event__in=events).values('event_id', *COUNTER_FIELDS)
+    }
+    counts = count_events(event_ids)
+    now = timezone.now()
+    correct, drifted = [], []
+    for event_id in events.values_list('id', flat=True):
+        values = counts[event_id]
+        current = stored.get(event_id)
+        if current is not None and all(current[field] == values[field] for field in COUNTER_FIELDS):
+            correct.append(event_id)
+        elif _correct(event_id, now):
+            drifted.append(event_id)
+    for start in range(0, len(correct), 2000):
+        EventCounters.objects.filter(event_id__in=correct[start:start + 2000]).update(reconciled_at=now)
+    if drifted:
+        logger.warning("Event counters drifted for %d events", len(drifted), extra={"event_ids": drifted[:100]})
+    return drifted
+
+
+def dashboard(event):
+    """The event's counters as served by the dashboard, with pending and total abstracts derived"""
+    counters = EventCounters.objects.filter(event=event).first()
+    if counters is None:
+        reconcile_counters([event.id])
+        counters = EventCounters.objects.get(event=event)
+    has_fee = bool(event.registration_fee and event.registration_fee > 0)
+    return {
+        **{field: getattr(counters, field) for field in COUNTER_FIELDS},
+        'pending': counters.registered - counters.paid if has_fee else 0,
+        'abstracts': counters.speaker_abstracts + counters.poster_abstracts,
+        'reconciled_at': counters.reconciled_at,
+    }
@@ -0,0 +1,611 @@
+"""
+Deterministic synthetic data for benchmarks, load tests and the
+generate_dataset command.
+
+Everything is generated from a seeded random.Random and inserted with
+batched bulk_create(), so the same seed always produces the same dataset
+and large volumes (100k+ rows) build in seconds. Model save() hooks are
+bypassed, so nametag IDs and copied payment fields are filled in here.
+Abstract files are real DOCX/ODT documents, built on a thread pool.
+"""
+import io
+import random
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from main.models import (
+    User, Institution, Event, EmailTemplate, Organizer, Attendee, OnSiteAttendee, Abstract, Vote,
+    CustomQuestion, CustomAnswer, PaymentHistory, ManualTransaction,
+)
+from main.answers import rebuild_choices
+from main.counters import reconcile_counters
+from main.voting import recount_tallies
+
+FIRST_NAMES = [
+    'Minjun', 'Seoyeon', 'Jiho', 'Haeun', 'Doyun', 'Jiwoo', 'Yejun', 'Seoyun', 'Siwoo', 'Hayoon',
+    'James', 'Emma', 'Oliver', 'Sophia', 'Lucas', 'Mia', 'Noah', 'Ava', 'Liam', 'Chloe',
+]
+LAST_NAMES = [
+    'Kim', 'Lee', 'Park', 'Choi', 'Jung', 'Kang', 'Cho', 'Yoon', 'Jang', 'Lim',
+    'Smith', 'Johnson', 'Brown', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Moore', 'Taylor', 'Clark',
+]
+KOREAN_GIVEN_NAMES = ['민준', '서연', '지호', '하은', '도윤', '지우', '예준', '서윤', '시우', '하윤']
+KOREAN_FAMILY_NAMES = ['김', '이', '박', '최', '정', '강', '조', '윤', '장', '임']
+INSTITUTION_KINDS = [
+    ('University', '대학교'), ('Institute of Science', '과학원'), ('Medical Center', '의료원'),
+    ('Research Institute', '연구소'), ('College', '대학'),
+]
+CITIES = [
+    ('Seoul', '서울'), ('Busan', '부산'), ('Daejeon', '대전'), ('Daegu', '대구'), ('Gwangju', '광주'),
+    ('Incheon', '인천'), ('Ulsan', '울산'), ('Suwon', '수원'), ('Pohang', '포항'), ('Jeju', '제주'),
+]
+DEPARTMENTS = ['Physics', 'Chemistry', 'Biology', 'Medicine', 'Computer Science', 'Mathematics']
+JOB_TITLES = ['Professor', 'Postdoc', 'PhD Student', 'Researcher', 'Engineer', 'MS Student']
+TITLE_WORDS = [
+    'single-molecule', 'imaging', 'dynamics', 'protein', 'folding', 'membrane', 'transport', 'quantum',
+    'network', 'analysis', 'neural', 'cell', 'genome', 'structure', 'mechanism', 'kinetics',
+]
+QUESTIONS = [
+    {'type': 'select', 'question': 'Which banquet menu do you prefer?', 'detail': '',
+     'options': ['Meat', 'Fish', 'Vegetarian']},
+    {'type': 'checkbox', 'question': 'Which sessions will you attend?', 'detail': '',
+     'options': ['Day 1', 'Day 2', 'Workshop']},
+    {'type': 'text', 'question': 'How did you hear about this event?', 'detail': '', 'options': []},
+    {'type': 'textarea', 'question': 'Anything else we should know?', 'detail': '', 'options': []},
+]
+CARD_ISSUERS = ['신한카드', '삼성카드', '현대카드', 'KB국민카드', '롯데카드']
+
+# Fixed timestamp for archive members, so that documents are byte-for-byte reproducible
+_ZIP_DATE = (2020, 1, 1, 0, 0, 0)
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_DOCX_STYLES_TYPE = (
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+)
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="styles.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+    '</Relationships>'
+)
+_DOCX_NAMESPACES = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+_ODT_MIMETYPE = 'application/vnd.oasis.opendocument.text'
+_ODT_MANIFEST = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+    f'<manifest:file-entry manifest:full-path="/" manifest:media-type="{_ODT_MIMETYPE}"/>'
+    '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+    '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+    '</manifest:manifest>'
+)
+_ODT_NAMESPACES = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+    'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink"'
+)
+_ODT_STANDARD_STYLE = (
+    '<style:style style:name="Standard" style:family="paragraph">'
+    '<style:paragraph-properties fo:text-align="start"/></style:style>'
+)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, data, compress in members:
+            info = zipfile.ZipInfo(name, _ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            zf.writestr(info, data)
+    return buffer.getvalue()
+
+
+def docx_package(body, styles=None):
+    """A DOCX whose w:body holds `body`, with a styles part holding `styles` (w:style elements) if given"""
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document {_DOCX_NAMESPACES}><w:body>{body}</w:body></w:document>'
+    )
+    members = [
+        ('[Content_Types].xml', _DOCX_CONTENT_TYPES, True),
+        ('_rels/.rels', _DOCX_RELS, True),
+        ('word/document.xml', document, True),
+    ]
+    if styles is not None:
+        content_types = _DOCX_CONTENT_TYPES.replace('</Types>', f'{_DOCX_STYLES_TYPE}</Types>')
+        styles = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<w:styles {_DOCX_NAMESPACES}>{styles}</w:styles>'
+        )
+        members[0] = ('[Content_Types].xml', content_types, True)
+        members += [
+            ('word/_rels/document.xml.rels', _DOCX_DOCUMENT_RELS, True),
+            ('word/styles.xml', styles, True),
+        ]
+    return _zip(members)
+
+
+def odt_package(text, automatic_styles='', styles=_ODT_STANDARD_STYLE):
+    """An ODT whose office:text holds `text`, with `automatic_styles` in content.xml and `styles` in styles.xml"""
+    content = (
+        f'<?xml version="1.0" encoding="UTF-8"?><office:document-content {_ODT_NAMESPACES} office:version="1.2">'
+        f'<office:automatic-styles>{automatic_styles}</office:automatic-styles>'
+        f'<office:body><office:text>{text}</office:text></office:body></office:document-content>'
+    )
+    styles = (
+        f'<?xml version="1.0" encoding="UTF-8"?><office:document-styles {_ODT_NAMESPACES} office:version="1.2">'
+        f'<office:styles>{styles}</office:styles></office:document-styles>'
+    )
+    # The mimetype must be the first member and stored uncompressed
+    return _zip([
+        ('mimetype', _ODT_MIMETYPE, False),
+        ('META-INF/manifest.xml', _ODT_MANIFEST, True),
+        ('content.xml', content, True),
+        ('styles.xml', styles, True),
+    ])
+
+
+def build_docx(title, authors, paragraphs):
+    """A minimal DOCX: a bold centered title, italic authors and body paragraphs"""
+    def paragraph(text, align=None, bold=False, italic=False):
+        ppr = f'<w:pPr><w:jc w:val="{align}"/></w:pPr>' if align else ''
+        rpr = ('<w:b/>' if bold else '') + ('<w:i/>' if italic else '')
+        rpr = f'<w:rPr>{rpr}</w:rPr>' if rpr else ''
+        return f'<w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    body = paragraph(title, 'center', bold=True) + paragraph(authors, 'center', italic=True)
+    body += ''.join(paragraph(text, 'both') for text in paragraphs)
+    return docx_package(body)
+
+
+def build_odt(title, authors, paragraphs):
+    """A minimal ODT with the same layout as build_docx()"""
+    styles = (
+        '<style:style style:name="Title" style:family="paragraph" style:parent-style-name="Standard">'
+        '<style:paragraph-properties fo:text-align="center"/><style:text-properties fo:font-weight="bold"/>'
+        '</style:style>'
+        '<style:style style:name="Authors" style:family="paragraph" style:parent-style-name="Standard">'
+        '<style:paragraph-properties fo:text-align="center"/><style:text-properties fo:font-style="italic"/>'
+        '</style:style>'
+        '<style:style style:name="Body" style:family="paragraph" style:parent-style-name="Standard">'
+        '<style:paragraph-properties fo:text-align="justify"/>'
+        '</style:style>'
+    )
+    text = f'<text:p text:style-name="Title">{escape(title)}</text:p>'
+    text += f'<text:p text:style-name="Authors">{escape(authors)}</text:p>'
+    text += ''.join(f'<text:p text:style-name="Body">{escape(p)}</text:p>' for p in paragraphs)
+    return odt_package(text, styles)
+
+
+# Styles and formatting that converter_corpus() picks from. They cover what
+# the converters handle: paragraph styles with and without inheritance,
+# run and span formatting that overrides them, hyperlinks, tabs and breaks.
+_CORPUS_DOCX_STYLES = (
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:b/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Quote"><w:name w:val="Quote"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:jc w:val="both"/></w:pPr><w:rPr><w:i/><w:u w:val="single"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Footnote"><w:name w:val="Footnote"/>'
+    '<w:rPr><w:vertAlign w:val="superscript"/></w:rPr></w:style>'
+    '<w:style w:type="character" w:styleId="Strong"><w:name w:val="Strong"/><w:rPr><w:b/></w:rPr></w:style>'
+)
+_CORPUS_DOCX_PARAGRAPH_STYLES = [None, 'Normal', 'Title', 'Quote', 'Footnote', 'Strong', 'Missing']
+_CORPUS_DOCX_ALIGNMENTS = [None, None, 'left', 'center', 'right', 'both']
+_CORPUS_DOCX_RUN_FORMATS = [
+    '<w:b/>', '<w:i/>', '<w:b w:val="0"/>', '<w:i w:val="false"/>', '<w:u w:val="single"/>',
+    '<w:u w:val="double"/>', '<w:u w:val="none"/>', '<w:vertAlign w:val="subscript"/>',
+    '<w:vertAlign w:val="superscript"/>', '<w:vertAlign w:val="baseline"/>', '<w:rStyle w:val="Strong"/>',
+]
+_CORPUS_DOCX_RUN_EXTRAS = ['', '', '', '<w:tab/>', '<w:br/>', '<w:br w:type="page"/>', '<w:noBreakHyphen/>']
+_CORPUS_ODT_STYLES = _ODT_STANDARD_STYLE + (
+    '<style:style style:name="Heading" style:family="paragraph" style:parent-style-name="Standard">'
+    '<style:paragraph-properties fo:text-align="center"/><style:text-properties fo:font-weight="bold"/>'
+    '</style:style>'
+    '<style:style style:name="Quote" style:family="paragraph" style:parent-style-name="Standard">'
+    '<style:paragraph-properties fo:text-align="justify"/>'
+    '<style:text-properties fo:font-style="italic" style:text-underline-style="solid"/></style:style>'
+    '<style:style style:name="Small" style:family="paragraph" style:parent-style-name="Quote">'
+    '<style:text-properties style:text-position="sub 58%"/></style:style>'
+)
+_CORPUS_ODT_AUTOMATIC_STYLES = (
+    '<style:style style:name="P1" style:family="paragraph" style:parent-style-name="Heading">'
+    '<style:paragraph-properties fo:text-align="end"/></style:style>'
+    '<style:style style:name="P2" style:family="paragraph" style:parent-style-name="Small"/>'
+    '<style:style style:name="P3" style:family="paragraph" style:parent-style-name="Standard">'
+    '<style:text-properties fo:font-weight="normal"/></style:style>'
+    '<style:style style:name="T1" style:family="text"><style:text-properties fo:font-weight="bold"/></style:style>'
+    '<style:style style:name="T2" style:family="text"><style:text-properties fo:font-style="italic"/></style:style>'
+    '<style:style style:name="T3" style:family="text">'
+    '<style:text-properties style:text-underline-style="solid"/></style:style>'
+    '<style:style style:name="T4" style:family="text">'
+    '<style:text-properties style:text-position="super 58%"/></style:style>'
+    '<style:style style:name="T5" style:family="text">'
+    '<style:text-properties fo:font-weight="normal" style:text-underline-style="none"/></style:style>'
+)
+# Office suites write out every built-in style and many automatic ones, most of them unused
+_CORPUS_UNUSED_STYLES = 150
+_CORPUS_DOCX_STYLES += ''.join(
+    f'<w:style w:type="paragraph" w:styleId="Unused{i}"><w:name w:val="Unused {i}"/>'
+    f'<w:basedOn w:val="{f"Unused{i - 1}" if i else "Normal"}"/><w:rPr><w:i/></w:rPr></w:style>'
+    for i in range(_CORPUS_UNUSED_STYLES)
+)
+_CORPUS_ODT_STYLES += ''.join(
+    f'<style:style style:name="Unused{i}" style:family="paragraph" '
+    f'style:parent-style-name="{f"Unused{i - 1}" if i else "Standard"}">'
+    '<style:text-properties fo:font-style="italic"/></style:style>'
+    for i in range(_CORPUS_UNUSED_STYLES)
+)
+_CORPUS_ODT_AUTOMATIC_STYLES += ''.join(
+    f'<style:style style:name="A{i}" style:family="text"><style:text-properties fo:font-weight="bold"/></style:style>'
+    for i in range(_CORPUS_UNUSED_STYLES // 3)
+)
+_CORPUS_ODT_PARAGRAPH_STYLES = [None, 'Standard', 'Heading', 'Quote', 'Small', 'P1', 'P2', 'P3', 'Missing']
+_CORPUS_ODT_SPAN_STYLES = [None, 'T1', 'T2', 'T3', 'T4', 'T5', 'Heading', 'Missing']
+_CORPUS_WORDS = TITLE_WORDS + ['<i>', 'R&D', '"quoted"', 'x²', '단백질', '  ']
+
+
+def converter_corpus(seed=0, documents=10, paragraphs=100, runs=20):
+    """
+    Abstract-like DOCX and ODT documents for benchmarking and checking the
+    converters in main.converters: [(extension, content)], alternating
+    formats, each with `paragraphs` paragraphs of about `runs` runs or spans
+    """
+    rng = random.Random(seed)
+
+    def text():
+        return escape(' '.join(rng.choice(_CORPUS_WORDS) for _ in range(rng.randint(1, 6))))
+
+    def docx_paragraph():
+        properties = ''
+        style, alignment = rng.choice(_CORPUS_DOCX_PARAGRAPH_STYLES), rng.choice(_CORPUS_DOCX_ALIGNMENTS)
+        if style:
+            properties += f'<w:pStyle w:val="{style}"/>'
+        if alignment:
+            properties += f'<w:jc w:val="{alignment}"/>'
+        content = []
+        for _ in range(rng.randint(1, 2 * runs)):
+            formats = ''.join(rng.sample(_CORPUS_DOCX_RUN_FORMATS, rng.randint(0, 2)))
+            run = (
+                f'<w:r>{f"<w:rPr>{formats}</w:rPr>" if formats else ""}'
+                f'<w:t xml:space="preserve">{text()}</w:t>{rng.choice(_CORPUS_DOCX_RUN_EXTRAS)}</w:r>'
+            )
+            content.append(f'<w:hyperlink w:history="1">{run}</w:hyperlink>' if rng.random() < 0.05 else run)
+        return f'<w:p>{f"<w:pPr>{properties}</w:pPr>" if properties else ""}{"".join(content)}</w:p>'
+
+    def odt_paragraph():
+        style = rng.choice(_CORPUS_ODT_PARAGRAPH_STYLES)
+        content = [text() if rng.random() < 0.5 else '']
+        for _ in range(rng.randint(1, 2 * runs)):
+            kind = rng.random()
+            if kind < 0.7:
+                span_style = rng.choice(_CORPUS_ODT_SPAN_STYLES)
+                attribute = f' text:style-name="{span_style}"' if span_style else ''
+                content.append(f'<text:span{attribute}>{text()}</text:span>')
+            elif kind < 0.8:
+                content.append('<text:line-break/>')
+            elif kind < 0.9:
+                content.append(f'<text:a xlink:href="https://example.com">{text()}</text:a>')
+            else:
+                content.append('<text:tab/>' if rng.random() < 0.5 else '<text:s text:c="2"/>')
+            if rng.random() < 0.3:
+                content.append(text())
+        attribute = f' text:style-name="{style}"' if style else ''
+        return f'<text:p{attribute}>{"".join(content)}</text:p>'
+
+    corpus = []
+    for index in range(documents):
+        if index % 2 == 0:
+            body = ''.join(docx_paragraph() for _ in range(paragraphs))
+            corpus.append(('.docx', docx_package(body, _CORPUS_DOCX_STYLES)))
+        else:
+            body = ''.join(odt_paragraph() for _ in range(paragraphs))
+            corpus.append(('.odt', odt_package(body, _CORPUS_ODT_AUTOMATIC_STYLES, _CORPUS_ODT_STYLES)))
+    return corpus
+
+
+def _write_document(path, kind, title, authors, paragraphs):
+    data = (build_docx if kind == 'docx' else build_odt)(title, authors, paragraphs)
+    return default_storage.save(path, ContentFile(data))
+
+
+def answer_questions(questions):
+    """A valid register_event() answer for every question, as returned by /questions"""
+    data = {}
+    for q in questions:
+        question = q['question']
+        options = question.get('options') or []
+        if question['type'] == 'checkbox':
+            for i, _ in enumerate(options):
+                data[f'{q["id"]}_{i}'] = i == 0
+        elif options:
+            data[str(q['id'])] = options[0]
+        else:
+            data[str(q['id'])] = 'Load test answer'
+    return data
+
+
+class DatasetBuilder:
+    def __init__(self, seed=0, batch_size=2000, workers=4):
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.workers = workers
+        self._password = None
+
+    def _bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def person(self):
+        """(first_name, last_name, korean_name, nationality)"""
+        r = self.random
+        if r.random() < 0.7:
+            korean_name = r.choice(KOREAN_FAMILY_NAMES) + r.choice(KOREAN_GIVEN_NAMES)
+            return r.choice(FIRST_NAMES[:10]), r.choice(LAST_NAMES[:10]), korean_name, 1
+        return r.choice(FIRST_NAMES[10:]), r.choice(LAST_NAMES[10:]), '', 2
+
+    def title(self, words=6):
+        return ' '.join(self.random.choice(TITLE_WORDS) for _ in range(words)).capitalize()
+
+    def uuid(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def institutions(self, count):
+        objects = []
+        for i in range(count):
+            city, city_ko = CITIES[i % len(CITIES)]
+            kind, kind_ko = INSTITUTION_KINDS[(i // len(CITIES)) % len(INSTITUTION_KINDS)]
+            objects.append(Institution(name_en=f'{city} {kind} {i}', name_ko=f'{city_ko}{kind_ko} {i}'))
+        return self._bulk_create(Institution, objects)
+
+    def users(self, count, institutions=(), prefix='user'):
+        if self._password is None:
+            # Hashing is deliberately slow; every generated user shares one hash
+            self._password = make_password('password')
+        objects = []
+        for i in range(count):
+            first_name, last_name, korean_name, nationality = self.person()
+            email = f'{prefix}{self.seed}-{i}@example.com'
+            objects.append(User(
+                username=email, email=email, password=self._password,
+                first_name=first_name, last_name=last_name, korean_name=korean_name, nationality=nationality,
+                institute=self.random.choice(institutions) if institutions else None,
+                department=self.random.choice(DEPARTMENTS), job_title=self.random.choice(JOB_TITLES),
+            ))
+        return self._bulk_create(User, objects)
+
+    def event(self, name='Synthetic Symposium', capacity=0, registration_fee=0, accepts_abstract=True,
+              start_date=None, organizers=3, **fields):
+        start_date = start_date or date.today() + timedelta(days=60)
+        templates = EmailTemplate.objects.bulk_create([
+            EmailTemplate(subject='Registration Confirmation for {{ event.name }}',
+                          body='Dear {{ attendee.first_name }},\n\nYou are registered for {{ event.name }}.'),
+            EmailTemplate(subject='Abstract Submission Confirmation for {{ event.name }}',
+                          body='Dear {{ attendee.first_name }},\n\nWe received "{{ abstract.title }}".'),
+            EmailTemplate(subject='Certificate of Attendance for {{ event.name }}',
+                          body='Dear {{ attendee.first_name }},\n\nPlease find your certificate attached.'),
+        ])
+        event = Event.objects.create(
+            name=name,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=2),
+            venue='Convention Center',
+            venue_ko='컨벤션센터',
+            capacity=capacity,
+            registration_fee=registration_fee,
+            registration_deadline=start_date - timedelta(days=1),
+            accepts_abstract=accepts_abstract,
+            abstract_deadline=date.today() - timedelta(days=1) if accepts_abstract else None,
+            max_votes=10 if accepts_abstract else None,
+            email_template_registration=templates[0],
+            email_template_abstract_submission=templates[1],
+            email_template_certificate=templates[2],
+            published=True,
+            link_info=f'{settings.HEADLESS_URL_ROOT}/event',
+            **fields,
+        )
+        self._bulk_create(Organizer, [
+            Organizer(event=event, name=' '.join(self.person()[:2]), affiliation=f'Organizer Institute {i}', order=i)
+            for i in range(organizers)
+        ])
+        return event
+
+    def attendees(self, event, users, institutions=()):
+        start = Attendee.objects.filter(event=event).count()
+        objects = []
+        for i, user in enumerate(users, start=start + 1):
+            institution = self.random.choice(institutions) if institutions else None
+            objects.append(Attendee(
+                user=user, event=event, attendee_nametag_id=i,
+                first_name=user.first_name, last_name=user.last_name, korean_name=user.korean_name,
+                nationality=user.nationality,
+                institute=institution.name_en if institution else 'Independent',
+                institute_ko=institution.name_ko if institution else '',
+                department=user.department, job_title=user.job_title, user_email=user.email,
+            ))
+        return self._bulk_create(Attendee, objects)
+
+    def abstracts(self, event, attendees, count, files=False):
+        """
+        `count` abstracts by distinct attendees. With `files`, a DOCX or ODT
+        document is written to default_storage for each one, in parallel.
+        """
+        objects = []
+        documents = []
+        for attendee in self.random.sample(list(attendees), min(count, len(attendees))):
+            kind = 'speaker' if self.random.random() < 0.2 else 'poster'
+            extension = 'docx' if self.random.random() < 0.7 else 'odt'
+            abstract = Abstract(
+                event=event, attendee=attendee, title=self.title(), type=kind,
+                wants_short_talk=kind == 'poster' and self.random.random() < 0.3,
+                file_path=f'abstracts/{self.uuid()}/abstract.{extension}',
+            )
+            objects.append(abstract)
+            if files:
+                authors = f'{attendee.first_name} {attendee.last_name} ({attendee.institute})'
+                paragraphs = [' '.join(self.title(12) for _ in range(4)) + '.' for _ in range(3)]
+                documents.append((abstract.file_path, extension, abstract.title, authors, paragraphs))
+        if documents:
+            # Building and writing the archives is zlib and file I/O, which release the GIL
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(lambda args: _write_document(*args), documents))
+        return self._bulk_create(Abstract, objects)
+
+    def reviewers(self, event, attendees, abstracts, count, votes_per_reviewer=10):
+        """Make `count` attendees reviewers, each with a ballot of `votes_per_reviewer` abstracts"""
+        reviewers = self.random.sample(list(attendees), min(count, len(attendees)))
+        self._bulk_create(Event.reviewers.through, [
+            Event.reviewers.through(event_id=event.id, attendee_id=a.id) for a in reviewers
+        ])
+        votes = []
+        for reviewer in reviewers:
+            for abstract in self.random.sample(list(abstracts), min(votes_per_reviewer, len(abstracts))):
+                votes.append(Vote(reviewer=reviewer, abstract=abstract))
+        self._bulk_create(Vote, votes)
+        recount_tallies(event)
+        return reviewers
+
+    def payments(self, event, attendees, count, manual=0.1):
+        """
+        `count` payments spread over the attendees; most completed, some
+        cancelled. A `manual` fraction are admin-entered (직접입력) with a
+        ManualTransaction.
+        """
+        attendees = list(attendees)
+        # copy_event_info() reads the organizers, so it runs once and is copied
+        event_info = PaymentHistory()
+        event_info.copy_event_info(event)
+        event_fields = {f.attname: getattr(event_info, f.attname)
+                        for f in PaymentHistory._meta.concrete_fields if f.attname.startswith('event_') and f.attname != 'event_id'}
+        amount = event.registration_fee or 50000
+        objects = []
+        for i in range(count):
+            attendee = attendees[i % len(attendees)]
+            is_manual = self.random.random() < manual
+            payment = PaymentHistory(
+                attendee=attendee, event=event, amount=amount,
+                status='completed' if self.random.random() < 0.9 else 'cancelled',
+                payment_type='직접입력' if is_manual else self.random.choice(['카드', '카드', '계좌이체']),
+                toss_order_id=None if is_manual else self.uuid().hex,
+                **event_fields,
+            )
+            payment.copy_attendee_info(attendee)
+            objects.append(payment)
+        payments = self._bulk_create(PaymentHistory, objects)
+
+        supply_amount = round(amount / 1.1)
+        transactions = []
+        for payment in payments:
+            if payment.payment_type != '직접입력':
+                continue
+            kind = self.random.choice(['card', 'transfer', 'cash'])
+            manual_transaction = ManualTransaction(
+                payment=payment, payment_type=kind, supply_amount=supply_amount, vat=amount - supply_amount,
+            )
+            if kind == 'card':
+                manual_transaction.card_type = self.random.choice(CARD_ISSUERS)
+                manual_transaction.card_number = f'{self.random.randint(1000, 9999)}-****-****-{self.random.randint(1000, 9999)}'
+                manual_transaction.approval_number = f'{self.random.randint(0, 99999999):08d}'
+            elif kind == 'transfer':
+                manual_transaction.transaction_datetime = datetime(2025, 1, 1, tzinfo=dt_timezone.utc) + timedelta(
+                    minutes=self.random.randint(0, 60 * 24 * 300))
+                manual_transaction.transaction_description = payment.attendee_korean_name or payment.attendee_last_name
+            transactions.append(manual_transaction)
+        self._bulk_create(ManualTransaction, transactions)
+        return payments
+
+    def questions(self, event, count=len(QUESTIONS)):
+        return self._bulk_create(CustomQuestion, [
+            CustomQuestion(event=event, question=QUESTIONS[i % len(QUESTIONS)], order=i) for i in range(count)
+        ])
+
+    def answers(self, attendees, questions):
+        """One answer per question per attendee, formatted like register_event() stores them"""
+        objects = []
+        for attendee in attendees:
+            for q in questions:
+                options = q.question['options']
+                if q.question['type'] == 'checkbox':
+                    answer = '\n'.join(f'- {option}: {self.random.random() < 0.5}' for option in options)
+                elif options:
+                    answer = self.random.choice(options)
+                else:
+                    answer = self.title(3)
+                objects.append(CustomAnswer(
+                    reference=q, attendee=attendee, question=q.question['question'], answer=answer,
+                ))
+        answers = self._bulk_create(CustomAnswer, objects)
+        rebuild_choices(questions)
+        return answers
+
+    def onsite_attendees(self, event, count):
+        objects = []
+        for i in range(1, count + 1):
+            first_name, last_name, korean_name, _ = self.person()
+            objects.append(OnSiteAttendee(
+                event=event, onsiteattendee_nametag_id=i,
+                name=korean_name or f'{first_name} {last_name}',
+                email=f'onsite{self.seed}-{event.id}-{i}@example.com',
+                institute=f'{self.random.choice(CITIES)[0]} University',
+                job_title=self.random.choice(JOB_TITLES),
+                is_confirmed=self.random.random() < 0.8,
+            ))
+        return self._bulk_create(OnSiteAttendee, objects)
+
+
+@transaction.atomic
+def build_large_event(seed=0, attendees=5000, abstracts=800, reviewers=50, payments=10000,
+                      institutions=100000, events=20, questions=4, onsite=0, votes_per_reviewer=10,
+                      files=False, workers=4, batch_size=2000):
+    """
+    One large event with registered attendees, abstracts, reviewer ballots,
+    payments and optionally custom questions with answers and on-site
+    attendees, plus `events` smaller published events. Returns a dict with
+    the builder, the main event, its attendees, the users and a sample of
+    institutions.
+    """
+    builder = DatasetBuilder(seed, batch_size=batch_size, workers=workers)
+    institution_rows = builder.institutions(institutions)
+    sample = institution_rows[:1000]
+    users = builder.users(attendees, sample)
+    event = builder.event(capacity=attendees * 2, registration_fee=50000)
+    question_rows = builder.questions(event, questions)
+    attendee_rows = builder.attendees(event, users, sample)
+    builder.answers(attendee_rows, question_rows)
+    abstract_rows = builder.abstracts(event, attendee_rows, abstracts, files=files)
+    builder.reviewers(event, attendee_rows, abstract_rows, reviewers, votes_per_reviewer)
+    builder.payments(event, attendee_rows, payments)
+    builder.onsite_attendees(event, onsite)
+    others = [builder.event(name=f'Synthetic Workshop {i}', registration_fee=10000 * (i % 3)) for i in range(events)]
+    # The first user is registered everywhere, for per-user history endpoints
+    for other in others:
+        builder.attendees(other, users[:1], sample)
+    # Rows were bulk-created, which bypasses the counter signals
+    reconcile_counters([event.id] + [other.id for other in others])
+    return {'builder': builder, 'event': event, 'users': users, 'attendees': attendee_rows, 'institutions': sample}
@@ -0,0 +1,75 @@
+"""
+Connection pool support for PostgreSQL (psycopg_pool, see DATABASES in
+settings). Each process has one pool per database alias; its statistics
+are exported through main.metrics:
+
+- ieum_db_pool_size / _available / _max_size: connections the pool holds,
+  how many are idle, and the configured ceiling
+- ieum_db_pool_requests_waiting: callers waiting for a connection right now
+  (saturation)
+- ieum_db_pool_wait_seconds_total / _requests_queued_total: time spent and
+  number of requests that had to wait for a connection
+- ieum_db_pool_errors_total: requests that timed out or failed
+
+Pools are created lazily on the first query, so a Celery parent process
+normally forks without one; any pool inherited by a child anyway is dropped,
+because its connections belong to the parent.
+"""
+from celery.signals import worker_process_init
+from django.db import connections
+
+from main.metrics import registry
+
+_GAUGES = {
+    'pool_size': ('ieum_db_pool_size', 'Connections held by the pool, idle or in use'),
+    'pool_available': ('ieum_db_pool_available', 'Idle connections in the pool'),
+    'pool_max': ('ieum_db_pool_max_size', 'Maximum pool size'),
+    'requests_waiting': ('ieum_db_pool_requests_waiting', 'Requests currently waiting for a connection'),
+}
+_COUNTERS = {
+    'requests_num': ('ieum_db_pool_requests_total', 'Connections requested from the pool'),
+    'requests_queued': ('ieum_db_pool_requests_queued_total', 'Connection requests that had to wait'),
+    'requests_errors': ('ieum_db_pool_errors_total', 'Connection requests that timed out or failed'),
+    'connections_num': ('ieum_db_pool_connections_opened_total', 'Connections opened to the server'),
+    'connections_lost': ('ieum_db_pool_connections_lost_total', 'Connections found broken by health checks'),
+}
+
+for _name, _help in _GAUGES.values():
+    registry.gauge(_name, _help)
+for _name, _help in _COUNTERS.values():
+    registry.counter(_name, _help)
+registry.counter('ieum_db_pool_wait_seconds_total', 'Time spent waiting for a pooled connection')
+
+
+def open_pools():
+    """{alias: pool} for the pools this process has created"""
+    pools = {}
+    for alias in connections:
+        wrapper = connections[alias]
+        pool = getattr(wrapper, '_connection_pools', {}).get(alias)
+        if pool is not None:
+            pools[alias] = pool
+    return pools
+
+
+def pool_stats():
+    """{alias: psycopg_pool stats} for this process's pools"""
+    return {alias: pool.get_stats() for alias, pool in open_pools().items()}
+
+
+@registry.collector
+def _pool_samples():
+    samples = []
+    for alias, stats in pool_stats().items():
+        labels = {'alias': alias}
+        for key, (name, _) in {**_GAUGES, **_COUNTERS}.items():
+            samples.append((name, labels, stats.get(key, 0)))
+        samples.append(('ieum_db_pool_wait_seconds_total', labels, stats.get('requests_wait_ms', 0) / 1000))
+    return samples
+
+
+@worker_process_init.connect
+def _drop_inherited_pools(**kwargs):
+    for alias in open_pools():
+        # Forget the pool without closing it: closing would end the parent's connections
+        del connections[alias]._connection_pools[alias]
@@ -0,0 +1,97 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless the request's URL route template (e.g.
+"api/event/<event_id>", as in main.metrics) is listed in
+settings.READ_REPLICA_ROUTES and settings.READ_REPLICAS names at least one
+replica. ReplicaMiddleware picks one replica per request; ReplicaRouter
+sends that request's reads to it. Writes, sessions, the shared cache and
+everything outside such a request (Celery tasks, commands) use the
+primary. Only list routes that don't write: a read-then-write on a lagging
+replica could act on stale rows.
+
+Read-your-writes: after a non-GET request, the client's session reads
+from the primary for the next READ_REPLICA_PIN_SECONDS, so replication lag
+can't make a fresh registration look missing. The pin is kept in the
+shared cache under the session key rather than in a cookie of its own: the
+SvelteKit frontend calls the API from its server and only passes the
+session cookie back to the browser.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY_APPS = {'sessions', 'django_cache'}  # a session or cache entry written a moment ago must be found
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _pin_key(session_key):
+    return f'primary-pin:{session_key}'
+
+
+def pin_to_primary(request):
+    """Send the reads of the request's session to the primary for READ_REPLICA_PIN_SECONDS"""
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        caches['shared'].set(_pin_key(session.session_key), True, settings.READ_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    # The key comes from the session cookie, so this loads no session
+    return bool(session is not None and session.session_key and caches['shared'].get(_pin_key(session.session_key)))
+
+
+def replica_for(request):
+    """The replica alias to read from for this request, or None for the primary"""
+    if not settings.READ_REPLICAS or request.method not in SAFE_METHODS:
+        return None
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.route not in settings.READ_REPLICA_ROUTES:
+        return None
+    if is_pinned(request):
+        return None
+    return random.choice(settings.READ_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+class ReplicaMiddleware:
+    """
+    Routes the reads of READ_REPLICA_ROUTES requests to a replica (decided
+    in process_view, once the route is resolved) and pins sessions that
+    write to the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.set(None)
+        if request.method not in SAFE_METHODS and settings.READ_REPLICAS:
+            pin_to_primary(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _read_alias.set(replica_for(request))
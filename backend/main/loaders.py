@@ -0,0 +1,149 @@
+"""
+Per-request batch loading for schema resolvers.
+
+Resolvers such as UserSchema.resolve_orcid run once per serialized object,
+so a list endpoint that nests them issues one query per row. Instead,
+resolvers read from a named DataLoader:
+
+    @register_loader('email_verified')
+    def load_email_verified(user_ids):
+        ...  # one query, returns {user_id: value}
+
+    class UserSchema(Schema):
+        loader_keys: ClassVar[dict] = {'email_verified': lambda user: user.id}
+
+        @staticmethod
+        def resolve_email_verified(user, context) -> bool:
+            return load(context, 'email_verified', user.id, False)
+
+Before a response is serialized, the view hands its objects to
+prime_loaders(), which walks the response schema, queues the keys of every
+object that will be serialized and prefetches nested relations, plus any
+relations a schema lists in `prefetch` for resolvers and model properties
+that read them directly. The first resolver call then loads all queued keys
+in a single query per loader. Loaders and their caches live on the request,
+so nothing leaks between requests. Keys that were never primed still work;
+they are just loaded on their own.
+"""
+import typing
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Manager, Model, QuerySet, prefetch_related_objects
+from ninja import Schema
+
+_batch_functions = {}
+
+
+def register_loader(name):
+    """
+    Register a batch function under a loader name.
+    The function takes a list of keys and returns a dict of {key: value};
+    keys missing from the dict load as None.
+    """
+    def decorator(batch_fn):
+        _batch_functions[name] = batch_fn
+        return batch_fn
+    return decorator
+
+
+class DataLoader:
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self.cache = {}
+        self.pending = set()
+
+    def prime(self, keys):
+        """Queue keys to be loaded with the next batch"""
+        for key in keys:
+            if key is not None and key not in self.cache:
+                self.pending.add(key)
+
+    def dispatch(self):
+        """Load every queued key with one call to the batch function"""
+        if not self.pending:
+            return
+        keys = list(self.pending)
+        self.pending.clear()
+        results = self.batch_fn(keys)
+        for key in keys:
+            self.cache[key] = results.get(key)
+
+    def load(self, key, default=None):
+        if key not in self.cache:
+            self.pending.add(key)
+            self.dispatch()
+        value = self.cache[key]
+        return default if value is None else value
+
+
+def get_loader(request, name):
+    """Return the request's DataLoader for a registered name"""
+    if request is None:
+        # Serialized outside a request (e.g. a direct model_validate call): no shared cache
+        return DataLoader(_batch_functions[name])
+    loaders = request.__dict__.setdefault('_dataloaders', {})
+    if name not in loaders:
+        loaders[name] = DataLoader(_batch_functions[name])
+    return loaders[name]
+
+
+def load(context, name, key, default=None):
+    """Load one value from a resolver, using the request in the resolver context"""
+    request = context.get('request') if context else None
+    return get_loader(request, name).load(key, default)
+
+
+def _nested_schema(annotation):
+    """The Schema class inside an annotation like X, Optional[X] or List[X]"""
+    if isinstance(annotation, type) and issubclass(annotation, Schema):
+        return annotation
+    for arg in typing.get_args(annotation):
+        nested = _nested_schema(arg)
+        if nested is not None:
+            return nested
+    return None
+
+
+def prime_loaders(request, schema, objects):
+    """
+    Queue loader keys for all objects that `schema` will serialize, including
+    nested schemas. Nested model relations are fetched with
+    prefetch_related_objects() so that walking them costs one query per
+    relation. Returns the objects as a list, ready to be returned by the view.
+    """
+    if isinstance(objects, (QuerySet, Manager)):
+        objects = list(objects.all())
+    elif isinstance(objects, Model):
+        objects = [objects]
+    else:
+        objects = [o for o in objects if o is not None]
+    if not objects:
+        return objects
+
+    for name, key in getattr(schema, 'loader_keys', {}).items():
+        get_loader(request, name).prime(key(obj) for obj in objects)
+    # Relations read by resolvers or model properties rather than by nested schemas
+    prefetch = getattr(schema, 'prefetch', ())
+    if prefetch:
+        prefetch_related_objects(objects, *prefetch)
+
+    model = type(objects[0])
+    for field_name, field in schema.model_fields.items():
+        nested = _nested_schema(field.annotation)
+        if nested is None or field_name in schema._ninja_resolvers:
+            continue
+        try:
+            if not model._meta.get_field(field_name).is_relation:
+                continue
+        except (AttributeError, FieldDoesNotExist):
+            continue
+        prefetch_related_objects(objects, field_name)
+        children = []
+        for obj in objects:
+            value = getattr(obj, field_name)
+            if isinstance(value, Manager):
+                children.extend(value.all())
+            elif value is not None:
+                children.append(value)
+        prime_loaders(request, nested, children)
+    return objects
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import PaymentHistory
+from main.payments import get_toss_payment_by_order, extract_receipt_url, save_receipt_url
+
+
+def fetch_receipt_url(order_id):
+    """Fetch the receipt URL for one order. Returns (receipt_url, error)."""
+    try:
+        response = get_toss_payment_by_order(order_id)
+    except requests.RequestException as e:
+        return '', str(e)
+    if not response.ok:
+        return '', f'HTTP {response.status_code}'
+    return extract_receipt_url(response.json()), None
+
+
+class Command(BaseCommand):
+    help = 'Fills missing card receipt URLs on Toss payments from the Toss API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Maximum number of concurrent Toss API requests (default: 4)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Only process this many payments (default: all)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Fetch receipts but do not save them',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.TOSS_SECRET_KEY:
+            raise CommandError('TOSS_SECRET_KEY is not configured.')
+
+        concurrency = max(1, options['concurrency'])
+        payments = PaymentHistory.objects.filter(
+            payment_type='카드',
+            receipt_url='',
+            toss_order_id__isnull=False,
+        ).exclude(toss_order_id='').order_by('id')
+        if options['limit']:
+            payments = payments[:options['limit']]
+        payments = list(payments.only('id', 'toss_order_id'))
+
+        self.stdout.write(f'Payments missing a receipt: {len(payments)}')
+        if not payments:
+            return
+
+        filled = 0
+        failed = 0
+        # Only the HTTP calls run in worker threads; database writes stay on this thread.
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(fetch_receipt_url, p.toss_order_id): p for p in payments}
+            for future in as_completed(futures):
+                payment = futures[future]
+                receipt_url, error = future.result()
+                if not receipt_url:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  Failed: {payment.toss_order_id}: {error or "no receipt URL"}'
+                    ))
+                    continue
+                if not options['dry_run']:
+                    save_receipt_url(payment, receipt_url)
+                filled += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\nDry run complete. Would fill {filled} receipts ({failed} failed).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\nBackfill complete. Filled {filled} receipts ({failed} failed).'))
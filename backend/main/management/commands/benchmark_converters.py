@@ -0,0 +1,115 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.converters import docx_to_html, odt_to_html
+from main.datagen import converter_corpus
+from main.utils import legacy_docx_to_html, legacy_odt_to_html
+
+DEFAULT_CORPUS = {
+    'seed': 0,
+    'documents': 10,
+    'paragraphs': 100,
+    'runs': 20,
+}
+CONVERTERS = {
+    # extension: (legacy, streaming)
+    '.docx': (legacy_docx_to_html, docx_to_html),
+    '.odt': (legacy_odt_to_html, odt_to_html),
+}
+
+
+def _time(convert, paths, repeat):
+    """Median milliseconds to convert all of `paths`, and the last outputs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [convert(path) for path in paths]
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), outputs
+
+
+def run_benchmark(corpus, repeat=1):
+    """
+    Time the legacy and streaming converters on `corpus` ([(extension,
+    content)], see converter_corpus()) and compare their output:
+    {extension: {'documents', 'kib', 'legacy_ms', 'streaming_ms', 'speedup', 'mismatches'}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {extension: [] for extension in CONVERTERS}
+        for index, (extension, content) in enumerate(corpus):
+            path = os.path.join(directory, f'{index}{extension}')
+            with open(path, 'wb') as f:
+                f.write(content)
+            paths[extension].append(path)
+
+        for extension, (legacy, streaming) in CONVERTERS.items():
+            if not paths[extension]:
+                continue
+            # Warm-up, so that imports are not timed
+            legacy(paths[extension][0])
+            streaming(paths[extension][0])
+            legacy_ms, expected = _time(legacy, paths[extension], repeat)
+            streaming_ms, actual = _time(streaming, paths[extension], repeat)
+            results[extension] = {
+                'documents': len(paths[extension]),
+                'kib': round(sum(os.path.getsize(path) for path in paths[extension]) / 1024),
+                'legacy_ms': round(legacy_ms, 2),
+                'streaming_ms': round(streaming_ms, 2),
+                'speedup': round(legacy_ms / streaming_ms, 1) if streaming_ms else None,
+                'mismatches': [
+                    os.path.basename(path) for path, old, new in zip(paths[extension], expected, actual) if old != new
+                ],
+            }
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the streaming DOCX/ODT converters in main.converters against the legacy ones on a '
+        'synthetic corpus, and checks that both produce the same HTML'
+    )
+
+    def add_arguments(self, parser):
+        for key, default in DEFAULT_CORPUS.items():
+            parser.add_argument(
+                f'--{key}',
+                type=int,
+                default=default,
+                help=f'Corpus {key} (default: {default})',
+            )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Timed passes over the corpus per converter (default: 1)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the raw results as JSON to this file',
+        )
+
+    def handle(self, *args, **options):
+        corpus_options = {key: options[key] for key in DEFAULT_CORPUS}
+        self.stdout.write(f'Building corpus {", ".join(f"{k}={v}" for k, v in corpus_options.items())}...')
+        results = run_benchmark(converter_corpus(**corpus_options), repeat=max(1, options['repeat']))
+
+        self.stdout.write(f'\n{"Format":<8}{"documents":>11}{"KiB":>8}{"legacy ms":>12}{"streaming ms":>14}{"speedup":>9}')
+        for extension, r in results.items():
+            self.stdout.write(
+                f'{extension:<8}{r["documents"]:>11}{r["kib"]:>8}{r["legacy_ms"]:>12}{r["streaming_ms"]:>14}'
+                f'{r["speedup"]:>8}x'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'corpus': corpus_options, 'results': results}, f, indent=2)
+
+        mismatches = [f'{extension}: {", ".join(r["mismatches"])}' for extension, r in results.items() if r['mismatches']]
+        if mismatches:
+            raise CommandError('The converters produced different HTML for:\n  ' + '\n  '.join(mismatches))
+        self.stdout.write(self.style.SUCCESS('\nBoth converters produced the same HTML.'))
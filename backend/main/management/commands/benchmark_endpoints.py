@@ -0,0 +1,258 @@
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from backend.celery import app as celery_app
+from main.datagen import answer_questions, build_large_event
+from main.models import User
+
+BUDGETS_FILE = Path(__file__).resolve().parents[2] / 'benchmark_budgets.json'
+
+DEFAULT_SCALE = {
+    'seed': 0,
+    'attendees': 5000,
+    'abstracts': 800,
+    'reviewers': 50,
+    'payments': 10000,
+    'institutions': 100000,
+    'questions': 4,
+}
+
+
+@contextmanager
+def throwaway_database(**overrides):
+    """
+    Run against freshly created test databases, with Celery tasks executed
+    eagerly and email kept in memory. Everything is dropped on exit.
+    """
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases(aliases={DEFAULT_DB_ALIAS})
+    eager = celery_app.conf.task_always_eager
+    celery_app.conf.task_always_eager = True
+    try:
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            NPLUSONE_MODE='off',
+            PROFILING_SAMPLE_RATE=0,
+            TRACE_FILE=None,
+            **overrides,
+        ):
+            yield
+    finally:
+        celery_app.conf.task_always_eager = eager
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+class Benchmark:
+    """Seeds a large event and times the heaviest endpoints against it"""
+
+    def __init__(self, scale, repeat=5):
+        self.scale = scale
+        self.repeat = repeat
+
+    def setup(self):
+        data = build_large_event(**self.scale)
+        self.event = data['event']
+        self.history_user = data['users'][0]
+        self.institution = data['institutions'][0]
+        self.staff = User.objects.create_user(
+            username='benchmark-staff@example.com', email='benchmark-staff@example.com', is_staff=True,
+        )
+        # register_event needs a user who has not registered yet for every call
+        self.new_users = data['builder'].users(self.repeat + 2, prefix='registrant')
+        return data
+
+    def client(self, user=None):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def requests(self):
+        """(name, prepare) pairs; prepare() returns a callable making one request"""
+        event_id = self.event.id
+        staff = self.client(self.staff)
+        history = self.client(self.history_user)
+        anonymous = self.client()
+        new_users = iter(self.new_users)
+        answers = answer_questions({'id': q.id, 'question': q.question} for q in self.event.custom_questions.all())
+
+        def register():
+            client = self.client(next(new_users))
+            body = {
+                'first_name': 'Bench', 'last_name': 'Mark', 'nationality': 1,
+                'institute': self.institution.id, 'job_title': 'Researcher', **answers,
+            }
+            return lambda: client.post(f'/api/event/{event_id}/register', body, content_type='application/json')
+
+        return [
+            ('get_events', lambda: lambda: anonymous.get('/api/events', {'limit': 20})),
+            ('get_event_attendees', lambda: lambda: staff.get(f'/api/event/{event_id}/attendees')),
+            ('get_abstracts', lambda: lambda: staff.get(f'/api/event/{event_id}/abstracts')),
+            ('get_event_payments', lambda: lambda: staff.get(f'/api/event/{event_id}/payments')),
+            ('get_registration_history', lambda: lambda: history.get('/api/me/registration-history')),
+            ('register_event', register),
+        ]
+
+    def measure(self, name, prepare):
+        # Warm-up call, so that one-off costs (imports, template compilation) are not timed
+        self.check(name, prepare()())
+        timings = []
+        for _ in range(self.repeat):
+            call = prepare()
+            start = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - start) * 1000)
+            self.check(name, response)
+
+        # Queries and memory are measured on a separate call, as tracing slows it down
+        call = prepare()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = call()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.check(name, response)
+        return {
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': len(queries),
+            'peak_kib': round(peak / 1024),
+            'response_kib': round(len(response.content) / 1024),
+        }
+
+    def check(self, name, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{name} returned HTTP {response.status_code}: {response.content[:200]!r}')
+
+    def run(self):
+        self.setup()
+        return {name: self.measure(name, prepare) for name, prepare in self.requests()}
+
+
+def compare(results, budgets, scale):
+    """
+    Budget violations as messages. Query counts do not depend on the data
+    size and are always checked; time and memory only when the run used the
+    scale the budgets were recorded at.
+    """
+    same_scale = budgets.get('scale') == scale
+    violations = []
+    for name, result in results.items():
+        budget = budgets.get('endpoints', {}).get(name)
+        if budget is None:
+            continue
+        checks = [('queries', 'queries')]
+        if same_scale:
+            checks += [('median_ms', 'ms'), ('peak_kib', 'KiB')]
+        for key, unit in checks:
+            if key in budget and result[key] > budget[key]:
+                violations.append(f'{name}: {key} {result[key]} {unit} exceeds budget of {budget[key]} {unit}')
+    return violations
+
+
+def make_budgets(results, scale, headroom):
+    return {
+        'scale': scale,
+        'endpoints': {
+            name: {
+                'queries': result['queries'],
+                'median_ms': round(result['median_ms'] * headroom),
+                'peak_kib': round(result['peak_kib'] * headroom),
+            }
+            for name, result in results.items()
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the heaviest API endpoints against a synthetic large event in a throwaway '
+        'test database, and compares time, query count and peak memory with the budget file'
+    )
+
+    def add_arguments(self, parser):
+        for key, default in DEFAULT_SCALE.items():
+            parser.add_argument(
+                f'--{key}',
+                type=int,
+                default=default,
+                help=f'Dataset {key} (default: {default})',
+            )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed calls per endpoint (default: 5)',
+        )
+        parser.add_argument(
+            '--budgets',
+            default=str(BUDGETS_FILE),
+            help='Budget file (default: main/benchmark_budgets.json)',
+        )
+        parser.add_argument(
+            '--update-budgets',
+            action='store_true',
+            help='Write the results, plus headroom, to the budget file instead of checking them',
+        )
+        parser.add_argument(
+            '--headroom',
+            type=float,
+            default=1.5,
+            help='Multiplier applied to time and memory when updating budgets (default: 1.5)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the raw results as JSON to this file',
+        )
+
+    def handle(self, *args, **options):
+        scale = {key: options[key] for key in DEFAULT_SCALE}
+        benchmark = Benchmark(scale, repeat=max(1, options['repeat']))
+
+        self.stdout.write(f'Seeding {", ".join(f"{k}={v}" for k, v in scale.items())}...')
+        with throwaway_database():
+            results = benchmark.run()
+
+        self.stdout.write(f'\n{"Endpoint":<26}{"median ms":>11}{"max ms":>10}{"queries":>9}{"peak KiB":>10}{"body KiB":>10}')
+        for name, r in results.items():
+            self.stdout.write(
+                f'{name:<26}{r["median_ms"]:>11}{r["max_ms"]:>10}{r["queries"]:>9}{r["peak_kib"]:>10}{r["response_kib"]:>10}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'scale': scale, 'results': results}, f, indent=2)
+
+        budgets_path = Path(options['budgets'])
+        if options['update_budgets']:
+            with open(budgets_path, 'w') as f:
+                json.dump(make_budgets(results, scale, options['headroom']), f, indent=2)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'\nBudgets written to {budgets_path}.'))
+            return
+
+        if not budgets_path.exists():
+            raise CommandError(f'Budget file {budgets_path} not found; run with --update-budgets to create it.')
+        with open(budgets_path) as f:
+            budgets = json.load(f)
+        if budgets.get('scale') != scale:
+            self.stdout.write(self.style.WARNING(
+                '\nThe budgets were recorded at a different scale; only query counts are checked.'
+            ))
+        violations = compare(results, budgets, scale)
+        if violations:
+            raise CommandError('Performance budget exceeded:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('\nAll endpoints are within budget.'))
@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.datagen import build_large_event
+from main.models import (
+    User, Institution, Event, Attendee, OnSiteAttendee, Abstract, Vote, CustomQuestion, CustomAnswer,
+    AnswerChoice, PaymentHistory, ManualTransaction,
+)
+
+COUNTED_MODELS = [
+    Institution, User, Event, CustomQuestion, Attendee, CustomAnswer, AnswerChoice, Abstract, Vote,
+    OnSiteAttendee, PaymentHistory, ManualTransaction,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a deterministic synthetic dataset: institutions, users with Korean and English names, '
+        'a large event with custom questions and answers, abstracts with DOCX/ODT files, reviewer votes, '
+        'on-site attendees and payments with manual transactions, plus smaller events'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--institutions', type=int, default=100000, help='Institutions (default: 100000)')
+        parser.add_argument('--attendees', type=int, default=5000,
+                            help='Users registered for the large event (default: 5000)')
+        parser.add_argument('--questions', type=int, default=4,
+                            help='Custom questions, each answered by every attendee (default: 4)')
+        parser.add_argument('--abstracts', type=int, default=800, help='Abstracts (default: 800)')
+        parser.add_argument('--reviewers', type=int, default=50, help='Reviewers (default: 50)')
+        parser.add_argument('--votes-per-reviewer', type=int, default=10,
+                            help='Abstracts each reviewer votes for (default: 10)')
+        parser.add_argument('--onsite', type=int, default=500, help='On-site attendees (default: 500)')
+        parser.add_argument('--payments', type=int, default=10000, help='Payments (default: 10000)')
+        parser.add_argument('--events', type=int, default=20, help='Additional small events (default: 20)')
+        parser.add_argument(
+            '--no-files',
+            action='store_true',
+            help='Do not write abstract documents to media storage',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Threads building abstract documents (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows per bulk insert (default: 2000)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Allow generating data when DEBUG is off',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off; this may be a production database. Use --force to continue.')
+        if options['attendees'] < 1:
+            raise CommandError('--attendees must be at least 1.')
+
+        before = {model: model.objects.count() for model in COUNTED_MODELS}
+        start = time.perf_counter()
+        data = build_large_event(
+            seed=options['seed'],
+            attendees=options['attendees'],
+            abstracts=options['abstracts'],
+            reviewers=options['reviewers'],
+            payments=options['payments'],
+            institutions=options['institutions'],
+            events=options['events'],
+            questions=options['questions'],
+            onsite=options['onsite'],
+            votes_per_reviewer=options['votes_per_reviewer'],
+            files=not options['no_files'],
+            workers=max(1, options['workers']),
+            batch_size=max(1, options['batch_size']),
+        )
+        duration = time.perf_counter() - start
+
+        total = 0
+        for model in COUNTED_MODELS:
+            created = model.objects.count() - before[model]
+            total += created
+            self.stdout.write(f'  {model._meta.verbose_name_plural:<40}{created:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'\nCreated {total} rows in {duration:.1f} s. Large event: #{data["event"].id} {data["event"].name}'
+        ))
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Libraries that only some requests or tasks need; they should load on first use
+LAZY_MODULES = ['docx', 'PIL']
+
+# Entry points of the processes we run: code, extra environment, modules it must not load.
+# The API (main.apis, main.schema) is imported with the URLconf on the first request,
+# and Celery workers never need it.
+TARGETS = {
+    'asgi': ('import backend.asgi', {}, LAZY_MODULES + ['main.apis', 'main.schema']),
+    'urls': ('import backend.asgi, backend.urls', {}, LAZY_MODULES),
+    'celery': (
+        'from backend.celery import app\napp.loader.import_default_modules()',
+        {},
+        LAZY_MODULES + ['main.apis', 'main.schema'],
+    ),
+}
+
+# Import-time budgets (ms) for process startup, enforced by the test suite.
+# About twice the time measured on a development machine, to absorb noise.
+IMPORT_TIME_BUDGETS_MS = {'asgi': 2000, 'celery': 2000}
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure_imports(code, env=None):
+    """
+    Run `code` in a fresh interpreter with -X importtime. Returns
+    (rows, modules): rows are (module, self_us, cumulative_us, depth) in
+    import order, modules the names in sys.modules afterwards.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings', **(env or {})}
+    script = f'{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Import failed:\n{result.stderr[-2000:]}')
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def total_import_time(rows):
+    """Microseconds spent importing, from the top-level imports"""
+    return sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+
+
+class Command(BaseCommand):
+    help = 'Reports import time of the web and Celery entry points and which heavy modules they load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets',
+            nargs='*',
+            help=f'Entry points to audit: {", ".join(TARGETS)} (default: all)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of slowest modules to list (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        targets = options['targets'] or list(TARGETS)
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Unknown target(s): {", ".join(sorted(unknown))}')
+
+        for target in targets:
+            code, env, lazy = TARGETS[target]
+            rows, modules = measure_imports(code, env)
+            budget = IMPORT_TIME_BUDGETS_MS.get(target)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{target}: {total_import_time(rows) / 1000:.0f} ms'
+                + (f' (budget {budget} ms)' if budget else '') + f', {len(modules)} modules'
+            ))
+            self.stdout.write(f'  {"cumulative ms":>14}{"self ms":>10}  module')
+            for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: -row[2])[:options['top']]:
+                self.stdout.write(f'  {cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}')
+            loaded = [name for name in lazy if name in modules]
+            if loaded:
+                self.stdout.write(self.style.WARNING(f'  Loaded at startup but should load lazily: {", ".join(loaded)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'  Not loaded at startup: {", ".join(lazy)}'))
@@ -0,0 +1,395 @@
+import json
+import math
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import Client
+
+from main.datagen import DatasetBuilder, answer_questions
+from main.db_pool import pool_stats
+from main.management.commands.benchmark_endpoints import throwaway_database
+from main.models import Attendee, PaymentHistory
+
+STEPS = ['csrftoken', 'event', 'questions', 'registered', 'register', 'payment_confirm']
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed number of worker threads, like a sized app server"""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers):
+        super().__init__(address, QuietWSGIRequestHandler)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self.lock:
+                self.in_flight -= 1
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class FakeTossHandler(BaseHTTPRequestHandler):
+    """Answers POST /payments/confirm like the Toss API, after an optional delay"""
+
+    delay = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.delay)
+        if self.path != '/payments/confirm':
+            self.respond(404, {'code': 'NOT_FOUND', 'message': 'Not found'})
+            return
+        self.respond(200, {
+            'paymentKey': body.get('paymentKey'),
+            'orderId': body.get('orderId'),
+            'totalAmount': body.get('amount'),
+            'method': '카드',
+            'status': 'DONE',
+            'receipt': {'url': f'https://dashboard.tosspayments.com/receipt/{body.get("paymentKey")}'},
+        })
+
+    def respond(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class DatabaseConnectionSampler(threading.Thread):
+    """Samples the number of server connections to the database (PostgreSQL only)"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stopped.wait(self.interval):
+                    cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+                    # Not counting this connection and the main thread's
+                    self.peak = max(self.peak, cursor.fetchone()[0] - 2)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Rush:
+    """N users registering for one event at the same moment"""
+
+    def __init__(self, base_url, event, users, institution_id, concurrency):
+        self.base_url = base_url
+        self.event = event
+        self.users = users
+        self.institution_id = institution_id
+        self.concurrency = concurrency
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def record(self, step, start, response=None, error=None):
+        latency = (time.perf_counter() - start) * 1000
+        if error is not None:
+            outcome = type(error).__name__
+        elif response.status_code < 400:
+            outcome = None
+        else:
+            try:
+                code = response.json().get('code', '')
+            except ValueError:
+                code = ''
+            outcome = f'HTTP {response.status_code} {code}'.strip()
+        with self.lock:
+            self.latencies[step].append(latency)
+            if outcome:
+                self.outcomes[(step, outcome)] += 1
+        return outcome is None
+
+    def request(self, session, step, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, timeout=60, **kwargs)
+        except requests.RequestException as e:
+            self.record(step, start, error=e)
+            return None
+        return response if self.record(step, start, response) else None
+
+    def user_flow(self, index, session_key):
+        event_id = self.event.id
+        with requests.Session() as session:
+            session.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+            response = self.request(session, 'csrftoken', 'GET', '/api/csrftoken')
+            if response is None:
+                return
+            session.headers['X-CSRFToken'] = response.json()['csrftoken']
+            if self.request(session, 'event', 'GET', f'/api/event/{event_id}') is None:
+                return
+            response = self.request(session, 'questions', 'GET', f'/api/event/{event_id}/questions')
+            if response is None:
+                return
+            answers = answer_questions(response.json())
+            if self.request(session, 'registered', 'GET', f'/api/event/{event_id}/registered') is None:
+                return
+            body = {
+                'first_name': 'Rush', 'last_name': str(index), 'nationality': 1,
+                'institute': self.institution_id, 'job_title': 'Researcher', **answers,
+            }
+            if self.request(session, 'register', 'POST', f'/api/event/{event_id}/register', json=body) is None:
+                return
+            if self.event.registration_fee:
+                order_id = f'rush-{index}-{uuid.uuid4().hex[:12]}'
+                response = self.request(session, 'payment_confirm', 'POST', '/api/payment/confirm', json={
+                    'paymentKey': f'fake-{order_id}', 'orderId': order_id,
+                    'amount': self.event.registration_fee, 'eventId': event_id,
+                })
+                if response is None:
+                    return
+        with self.lock:
+            self.completed += 1
+
+    def run(self):
+        # Sessions are created up front so that logging in is not part of the rush
+        session_keys = []
+        for user in self.users:
+            client = Client()
+            client.force_login(user)
+            session_keys.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for index, session_key in enumerate(session_keys):
+                executor.submit(self.user_flow, index, session_key)
+        self.duration = time.perf_counter() - start
+
+
+def run_rush(event, users, institution_id, workers, concurrency):
+    """
+    Serve the app on `workers` threads and run a rush of `users` against it.
+    Returns (rush, server, sampler, opened): the sampler is None unless the
+    database is PostgreSQL, `opened` counts new connections per alias.
+    """
+    opened = Counter()
+
+    def count_connection(sender, connection, **kwargs):
+        opened[connection.alias] += 1
+    connection_created.connect(count_connection, weak=False)
+
+    server = PooledWSGIServer(('127.0.0.1', 0), workers)
+    server.set_app(get_wsgi_application())
+    base_url = start_server(server)
+    sampler = DatabaseConnectionSampler() if connection.vendor == 'postgresql' else None
+    if sampler is not None:
+        sampler.start()
+
+    rush = Rush(base_url, event, users, institution_id, concurrency)
+    try:
+        rush.run()
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        server.shutdown()
+        server.server_close()
+        connection_created.disconnect(count_connection)
+    return rush, server, sampler, opened
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulates a registration rush: N concurrent users fetch the CSRF token, the event, its questions '
+        'and registration status, register and confirm payment against a fake Toss server. Runs a local '
+        'server with a fixed number of worker threads on a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Number of users registering (default: 200)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Users running the flow at the same time (default: 50)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Server worker threads (default: 8)',
+        )
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            default=100,
+            help='Event capacity; 0 for unlimited (default: 100)',
+        )
+        parser.add_argument(
+            '--fee',
+            type=int,
+            default=50000,
+            help='Registration fee; 0 skips the payment step (default: 50000)',
+        )
+        parser.add_argument(
+            '--toss-delay',
+            type=float,
+            default=0.2,
+            help='Seconds the fake Toss server takes to confirm a payment (default: 0.2)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Dataset seed (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        FakeTossHandler.delay = options['toss_delay']
+        toss = ThreadingHTTPServer(('127.0.0.1', 0), FakeTossHandler)
+        toss_url = start_server(toss)
+        try:
+            with throwaway_database(TOSS_API_URL=toss_url, TOSS_SECRET_KEY='test_sk_simulation'):
+                self.simulate(options)
+        finally:
+            toss.shutdown()
+            toss.server_close()
+
+    def simulate(self, options):
+        builder = DatasetBuilder(options['seed'])
+        institutions = builder.institutions(100)
+        users = builder.users(max(1, options['users']), institutions)
+        event = builder.event(
+            name='Registration Rush Symposium', capacity=options['capacity'],
+            registration_fee=options['fee'], accepts_abstract=False,
+        )
+        builder.questions(event)
+
+        self.stdout.write(
+            f'{len(users)} users, concurrency {max(1, options["concurrency"])}, {options["workers"]} server workers, '
+            f'capacity {options["capacity"] or "unlimited"}, fee {options["fee"]}'
+        )
+        rush, server, sampler, opened = run_rush(
+            event, users, institutions[0].id, max(1, options['workers']), max(1, options['concurrency']),
+        )
+        self.report(rush, event, server, sampler, opened)
+
+    def report(self, rush, event, server, sampler, opened):
+        total_requests = sum(len(v) for v in rush.latencies.values())
+        self.stdout.write(
+            f'\nWall time {rush.duration:.2f} s: {rush.completed / rush.duration:.1f} completed flows/s, '
+            f'{total_requests / rush.duration:.1f} requests/s'
+        )
+        self.stdout.write(f'\n{"Step":<18}{"requests":>9}{"errors":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+        errors_by_step = Counter()
+        for (step, _), count in rush.outcomes.items():
+            errors_by_step[step] += count
+        for step in STEPS:
+            values = sorted(rush.latencies.get(step, []))
+            if not values:
+                continue
+            self.stdout.write(
+                f'{step:<18}{len(values):>9}{errors_by_step[step]:>8}'
+                f'{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}{percentile(values, 99):>9.1f}'
+            )
+        all_values = sorted(v for values in rush.latencies.values() for v in values)
+        self.stdout.write(
+            f'{"all":<18}{len(all_values):>9}{sum(errors_by_step.values()):>8}'
+            f'{percentile(all_values, 50):>9.1f}{percentile(all_values, 95):>9.1f}{percentile(all_values, 99):>9.1f}'
+        )
+
+        if rush.outcomes:
+            self.stdout.write('\nErrors:')
+            for (step, outcome), count in sorted(rush.outcomes.items(), key=lambda item: -item[1]):
+                self.stdout.write(f'  {step:<18}{outcome:<40}{count:>6}')
+
+        attendees = Attendee.objects.filter(event=event)
+        registered = attendees.count()
+        overshoot = max(0, registered - event.capacity) if event.capacity else 0
+        collisions = attendees.values('attendee_nametag_id').annotate(n=Count('id')).filter(n__gt=1)
+        colliding = sum(row['n'] for row in collisions)
+        duplicates = attendees.values('user_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        payments = PaymentHistory.objects.filter(event=event, status='completed').count()
+
+        self.stdout.write('\nConsistency:')
+        capacity = event.capacity or 'unlimited'
+        self.write_check(f'Registrations: {registered} (capacity {capacity}), overshoot', overshoot)
+        self.write_check('Attendees sharing a nametag ID', colliding)
+        self.write_check('Users registered more than once', duplicates)
+        if event.registration_fee:
+            self.stdout.write(f'  Completed payments: {payments}')
+
+        self.stdout.write('\nDatabase connections:')
+        self.stdout.write(f'  Opened: {sum(opened.values())} ({", ".join(f"{k}: {v}" for k, v in opened.items())})')
+        self.stdout.write(f'  Peak requests in flight (one connection each): {server.peak_in_flight}')
+        if sampler is not None:
+            self.stdout.write(f'  Peak server connections (pg_stat_activity): {sampler.peak}')
+        for alias, stats in pool_stats().items():
+            self.stdout.write(
+                f'  Pool {alias}: {stats.get("pool_size", 0)}/{stats.get("pool_max", 0)} connections, '
+                f'{stats.get("requests_queued", 0)} of {stats.get("requests_num", 0)} requests waited '
+                f'{stats.get("requests_wait_ms", 0)} ms in total, {stats.get("requests_errors", 0)} errors'
+            )
+
+    def write_check(self, label, value):
+        style = self.style.SUCCESS if value == 0 else self.style.ERROR
+        self.stdout.write(style(f'  {label}: {value}'))
@@ -0,0 +1,278 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+HTTP requests are recorded by main.middleware.MetricsMiddleware, Celery
+tasks by the signal handlers at the bottom of this module. Each process
+(uvicorn, celery worker) keeps its own registry and periodically writes a
+snapshot to settings.METRICS_DIR, named after its host and PID as the
+directory may be shared between containers; the staff-only /api/metrics
+endpoint merges all snapshots, so worker metrics show up next to web
+metrics. Live processes rewrite their snapshot at least every
+SNAPSHOT_HEARTBEAT seconds, so snapshots older than STALE_SNAPSHOT_AGE
+belong to processes that are gone and are deleted.
+
+Values that are read rather than recorded (e.g. connection pool stats)
+come from collectors registered with registry.collector(); they are
+sampled when a snapshot is taken and summed across processes.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+SNAPSHOT_INTERVAL = 5  # seconds between snapshot writes per process
+SNAPSHOT_HEARTBEAT = 30  # seconds between snapshot writes of an idle process
+STALE_SNAPSHOT_AGE = 3 * SNAPSHOT_HEARTBEAT  # seconds after which a snapshot's process is considered gone
+
+
+def snapshot_filename():
+    return f'{socket.gethostname()}-{os.getpid()}.json'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}  # name -> (type, help, buckets)
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.collectors = []  # callables returning [(name, labels, value), ...]
+        self.last_snapshot = float('-inf')
+        self.snapshot_pending = False
+        self.heartbeat = None
+
+    def counter(self, name, help):
+        self.metrics[name] = ('counter', help, None)
+
+    def histogram(self, name, help, buckets):
+        self.metrics[name] = ('histogram', help, buckets)
+
+    def gauge(self, name, help):
+        self.metrics[name] = ('gauge', help, None)
+
+    def collector(self, collect_fn):
+        self.collectors.append(collect_fn)
+        return collect_fn
+
+    def collect_samples(self):
+        samples = []
+        for collect_fn in self.collectors:
+            try:
+                samples.extend(
+                    [name, sorted(labels.items()), value] for name, labels, value in collect_fn()
+                )
+            except Exception:
+                # A broken collector must not break request handling or the metrics endpoint
+                continue
+        return samples
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = self.metrics[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            data = self.histograms.get(key)
+            if data is None:
+                data = self.histograms[key] = [0] * (len(buckets) + 2)
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def dump(self):
+        samples = self.collect_samples()
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(data)] for (name, labels), data in self.histograms.items()],
+                'samples': samples,
+            }
+
+    def maybe_snapshot(self):
+        """
+        Write this process's metrics to METRICS_DIR, at most every SNAPSHOT_INTERVAL
+        seconds. A throttled write is deferred so the last observations are not lost.
+        """
+        if not settings.METRICS_DIR:
+            return
+        with self.lock:
+            if self.snapshot_pending:
+                return
+            wait = SNAPSHOT_INTERVAL - (time.monotonic() - self.last_snapshot)
+            if wait > 0:
+                self.snapshot_pending = True
+                timer = threading.Timer(wait, self.snapshot)
+                timer.daemon = True
+                timer.start()
+                return
+        self.snapshot()
+
+    def snapshot(self):
+        directory = settings.METRICS_DIR
+        self.last_snapshot = time.monotonic()
+        self.snapshot_pending = False
+        if not directory:
+            return
+        self.start_heartbeat()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, snapshot_filename())
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.dump(), f)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass
+
+    def start_heartbeat(self):
+        """Keep rewriting the snapshot while the process is idle, so it does not look gone"""
+        with self.lock:
+            # Threads do not survive a fork, so a forked worker starts its own
+            if self.heartbeat is not None and self.heartbeat.is_alive():
+                return
+            self.heartbeat = threading.Thread(target=self._beat, daemon=True)
+            self.heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(SNAPSHOT_HEARTBEAT)
+            if time.monotonic() - self.last_snapshot >= SNAPSHOT_HEARTBEAT:
+                self.snapshot()
+
+
+registry = Registry()
+
+registry.counter('ieum_http_requests_total', 'HTTP requests by route template and status code')
+registry.histogram('ieum_http_request_duration_seconds', 'HTTP request latency', LATENCY_BUCKETS)
+registry.histogram('ieum_http_db_queries', 'SQL queries per HTTP request', QUERY_BUCKETS)
+registry.histogram('ieum_http_db_duration_seconds', 'SQL time per HTTP request', LATENCY_BUCKETS)
+registry.histogram('ieum_http_response_size_bytes', 'HTTP response body size', SIZE_BUCKETS)
+registry.counter('ieum_celery_tasks_total', 'Celery tasks run by task name and final state')
+registry.histogram('ieum_celery_task_duration_seconds', 'Celery task run time', TASK_BUCKETS)
+registry.histogram('ieum_celery_task_queue_wait_seconds', 'Time between publishing a Celery task and its start', TASK_BUCKETS)
+
+
+def record_request(method, route, status, duration, queries, db_time, size):
+    labels = {'method': method, 'route': route}
+    registry.inc('ieum_http_requests_total', {**labels, 'status': str(status)})
+    registry.observe('ieum_http_request_duration_seconds', labels, duration)
+    registry.observe('ieum_http_db_queries', labels, queries)
+    registry.observe('ieum_http_db_duration_seconds', labels, db_time)
+    if size is not None:
+        registry.observe('ieum_http_response_size_bytes', labels, size)
+    registry.maybe_snapshot()
+
+
+def _merge(target, dump):
+    for name, labels, value in dump['counters']:
+        key = (name, tuple(tuple(label) for label in labels))
+        target['counters'][key] = target['counters'].get(key, 0) + value
+    for name, labels, data in dump['histograms']:
+        key = (name, tuple(tuple(label) for label in labels))
+        current = target['histograms'].get(key)
+        target['histograms'][key] = data if current is None else [a + b for a, b in zip(current, data)]
+    for name, labels, value in dump.get('samples', ()):
+        key = (name, tuple(tuple(label) for label in labels))
+        target['samples'][key] = target['samples'].get(key, 0) + value
+
+
+def collect():
+    """Metrics of this process merged with the snapshots of all other processes"""
+    merged = {'counters': {}, 'histograms': {}, 'samples': {}}
+    _merge(merged, registry.dump())
+    directory = settings.METRICS_DIR
+    own = snapshot_filename()
+    if directory and os.path.isdir(directory):
+        now = time.time()
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                if now - os.path.getmtime(path) > STALE_SNAPSHOT_AGE:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    _merge(merged, json.load(f))
+            except (OSError, ValueError):
+                continue
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)"""
+    merged = collect()
+    lines = []
+    for name, (kind, help, buckets) in registry.metrics.items():
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind in ('counter', 'gauge'):
+            values = {**merged['counters'], **merged['samples']}
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        for (metric, labels), data in sorted(merged['histograms'].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, data):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {data[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {data[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {data[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Celery task metrics
+
+_task_starts = {}
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def _task_started(task_id=None, task=None, **kwargs):
+    _task_starts[task_id] = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at:
+        registry.observe('ieum_celery_task_queue_wait_seconds', {'task': task.name}, max(0, time.time() - published_at))
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_starts.pop(task_id, None)
+    if started is None:
+        return
+    labels = {'task': task.name}
+    registry.observe('ieum_celery_task_duration_seconds', labels, time.perf_counter() - started)
+    registry.inc('ieum_celery_tasks_total', {**labels, 'state': state or 'UNKNOWN'})
+    registry.maybe_snapshot()
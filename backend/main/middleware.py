@@ -0,0 +1,97 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from main.metrics import record_request
+from main.nplusone import NPlusOneDetector, NPlusOneError, logger as nplusone_logger
+from main.profiling import RequestProfiler, logger as profiling_logger, requested_kind, should_sample
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and time, response size and status code
+    for each request, labelled by the URL route template (e.g.
+    "api/event/<int:event_id>/stats") so that metrics stay low-cardinality.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = {'queries': 0, 'db_time': 0.0}
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['queries'] += 1
+                stats['db_time'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match and match.route else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        record_request(request.method, route, response.status_code, duration, stats['queries'], stats['db_time'], size)
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Flags requests that repeat one query shape from one call site more than
+    NPLUSONE_THRESHOLD times. NPLUSONE_MODE is 'log' (warn), 'raise' (fail,
+    used in tests) or 'off' (the default without DEBUG).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.NPLUSONE_MODE
+        if mode == 'off':
+            return self.get_response(request)
+
+        with NPlusOneDetector() as detector:
+            response = self.get_response(request)
+        if detector.violations():
+            report = detector.report(f'{request.method} {request.path}')
+            if mode == 'raise':
+                raise NPlusOneError(report)
+            nplusone_logger.warning(report)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles /api/ requests on demand (staff, X-Profile header or _profile
+    query parameter) or at random (PROFILING_SAMPLE_RATE). The profile ID is
+    returned in the X-Profile-Id response header; a profile that cannot be
+    saved is logged and the response is returned without it. Must run after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/') or request.path.startswith('/api/admin/profiles'):
+            return self.get_response(request)
+        kind = requested_kind(request) or ('sample' if should_sample() else None)
+        if kind is None:
+            return self.get_response(request)
+
+        with RequestProfiler(kind) as profiler:
+            response = self.get_response(request)
+        try:
+            response['X-Profile-Id'] = profiler.save(request, response)
+        except Exception:
+            profiling_logger.exception('Could not save the profile of %s %s', request.method, request.path)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0061_alter_customquestion_options_customquestion_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='receipt_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+    ]
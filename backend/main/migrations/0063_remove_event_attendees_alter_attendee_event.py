@@ -0,0 +1,77 @@
+# Generated by Django 5.1 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max
+
+
+def move_attendees_to_linked_events(apps, schema_editor):
+    """
+    Attendee.event becomes the only link between attendees and events, so
+    make it agree with the Event.attendees join table, which is what the
+    app read until now. Moved attendees get the next free nametag ID of
+    their event. An attendee linked to several events can't be resolved
+    automatically and aborts the migration. Attendees missing from the join
+    table keep the event they were created for.
+    """
+    db_alias = schema_editor.connection.alias
+    Attendee = apps.get_model('main', 'Attendee')
+    EventAttendee = apps.get_model('main', 'Event').attendees.through
+
+    ambiguous = list(
+        EventAttendee.objects.using(db_alias).values('attendee_id')
+        .annotate(events=Count('event_id', distinct=True)).filter(events__gt=1)
+        .values_list('attendee_id', flat=True)[:20]
+    )
+    if ambiguous:
+        raise RuntimeError(
+            'These attendees are linked to more than one event in the Event.attendees join table: '
+            f'{", ".join(map(str, ambiguous))}. Remove the wrong links and run the migration again.'
+        )
+
+    moves = EventAttendee.objects.using(db_alias).exclude(event_id=F('attendee__event_id'))
+    next_nametag_ids = {}
+    for attendee_id, event_id in moves.values_list('attendee_id', 'event_id').order_by('event_id', 'attendee_id').iterator():
+        if event_id not in next_nametag_ids:
+            next_nametag_ids[event_id] = (
+                Attendee.objects.using(db_alias).filter(event_id=event_id).aggregate(n=Max('attendee_nametag_id'))['n'] or 0
+            ) + 1
+        Attendee.objects.using(db_alias).filter(id=attendee_id).update(
+            event_id=event_id, attendee_nametag_id=next_nametag_ids[event_id],
+        )
+        next_nametag_ids[event_id] += 1
+
+
+def backfill_join_table(apps, schema_editor):
+    """Reverse: rebuild Event.attendees from Attendee.event"""
+    db_alias = schema_editor.connection.alias
+    Attendee = apps.get_model('main', 'Attendee')
+    EventAttendee = apps.get_model('main', 'Event').attendees.through
+    EventAttendee.objects.using(db_alias).bulk_create(
+        [
+            EventAttendee(event_id=event_id, attendee_id=attendee_id)
+            for attendee_id, event_id in Attendee.objects.using(db_alias).values_list('id', 'event_id').iterator()
+        ],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0062_paymenthistory_receipt_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_attendees_to_linked_events, backfill_join_table),
+        migrations.RemoveField(
+            model_name='event',
+            name='attendees',
+        ),
+        migrations.AlterField(
+            model_name='attendee',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendees', to='main.event'),
+        ),
+    ]
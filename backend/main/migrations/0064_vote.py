@@ -0,0 +1,85 @@
+# Generated by Django 5.1 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def copy_ballots_to_votes(apps, schema_editor):
+    """One Vote (score 1) per abstract on a reviewer's ballot, then the tallies"""
+    db_alias = schema_editor.connection.alias
+    Abstract = apps.get_model('main', 'Abstract')
+    AbstractVote = apps.get_model('main', 'AbstractVote')
+    Vote = apps.get_model('main', 'Vote')
+    Vote.objects.using(db_alias).bulk_create(
+        [
+            Vote(reviewer_id=reviewer_id, abstract_id=abstract_id, score=1)
+            for reviewer_id, abstract_id in AbstractVote.voted_abstracts.through.objects.using(db_alias)
+            .values_list('abstractvote__reviewer_id', 'abstract_id').distinct().iterator()
+        ],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+    tallies = Vote.objects.using(db_alias).values('abstract_id').annotate(n=Count('id')).values_list('abstract_id', 'n')
+    for abstract_id, count in tallies:
+        Abstract.objects.using(db_alias).filter(id=abstract_id).update(vote_count=count, vote_score=count)
+
+
+def copy_votes_to_ballots(apps, schema_editor):
+    """Reverse: one AbstractVote per reviewer, holding the abstracts they voted for"""
+    db_alias = schema_editor.connection.alias
+    Event = apps.get_model('main', 'Event')
+    AbstractVote = apps.get_model('main', 'AbstractVote')
+    Vote = apps.get_model('main', 'Vote')
+    reviewer_ids = set(Event.reviewers.through.objects.using(db_alias).values_list('attendee_id', flat=True))
+    reviewer_ids |= set(Vote.objects.using(db_alias).values_list('reviewer_id', flat=True))
+    ballots = {
+        ballot.reviewer_id: ballot
+        for ballot in AbstractVote.objects.using(db_alias).bulk_create(
+            [AbstractVote(reviewer_id=reviewer_id) for reviewer_id in reviewer_ids], batch_size=2000,
+        )
+    }
+    AbstractVote.voted_abstracts.through.objects.using(db_alias).bulk_create(
+        [
+            AbstractVote.voted_abstracts.through(abstractvote_id=ballots[reviewer_id].id, abstract_id=abstract_id)
+            for reviewer_id, abstract_id in Vote.objects.using(db_alias).values_list('reviewer_id', 'abstract_id')
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0063_remove_event_attendees_alter_attendee_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abstract',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='abstract',
+            name='vote_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Vote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('abstract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='main.abstract')),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='main.attendee')),
+            ],
+            options={
+                'unique_together': {('reviewer', 'abstract')},
+            },
+        ),
+        migrations.RunPython(copy_ballots_to_votes, copy_votes_to_ballots),
+        migrations.DeleteModel(
+            name='AbstractVote',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-19 16:29
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    """Keep the latest answer where an attendee answered the same question more than once"""
+    db_alias = schema_editor.connection.alias
+    CustomAnswer = apps.get_model('main', 'CustomAnswer')
+    duplicates = (
+        CustomAnswer.objects.using(db_alias).filter(reference__isnull=False, attendee__isnull=False)
+        .values('attendee_id', 'reference_id').annotate(n=Count('id'), keep=Max('id')).filter(n__gt=1)
+    )
+    for row in duplicates:
+        CustomAnswer.objects.using(db_alias).filter(
+            attendee_id=row['attendee_id'], reference_id=row['reference_id'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0064_vote'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='customanswer',
+            unique_together={('attendee', 'reference')},
+        ),
+    ]
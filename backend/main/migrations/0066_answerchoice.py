@@ -0,0 +1,57 @@
+# Generated by Django 5.1 on 2026-10-19 16:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_choices(apps, schema_editor):
+    """Store the options picked in existing select and checkbox answers as AnswerChoice rows"""
+    db_alias = schema_editor.connection.alias
+    CustomQuestion = apps.get_model('main', 'CustomQuestion')
+    CustomAnswer = apps.get_model('main', 'CustomAnswer')
+    AnswerChoice = apps.get_model('main', 'AnswerChoice')
+
+    questions = {
+        q.id: q.question for q in CustomQuestion.objects.using(db_alias).all()
+        if q.question.get('type') in ('select', 'checkbox')
+    }
+    choices = []
+    answers = CustomAnswer.objects.using(db_alias).filter(reference_id__in=questions)
+    for answer_id, question_id, answer in answers.values_list('id', 'reference_id', 'answer').iterator(chunk_size=2000):
+        question = questions[question_id]
+        options = dict.fromkeys(question.get('options') or [])  # unique per answer, as in AnswerChoice
+        if question['type'] == 'select':
+            picked = [answer] if answer in options else []
+        else:
+            # Same format as main.answers.selected_options(): '- option: value' lines
+            checked = set()
+            for line in answer.splitlines():
+                option, _, value = line.removeprefix('- ').rpartition(': ')
+                if value.strip().lower() in ('true', 'on', '1'):
+                    checked.add(option)
+            picked = [option for option in options if option in checked]
+        choices.extend(AnswerChoice(answer_id=answer_id, question_id=question_id, option=option) for option in picked)
+    AnswerChoice.objects.using(db_alias).bulk_create(choices, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0065_customanswer_unique_per_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerChoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('option', models.TextField()),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choices', to='main.customanswer')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choices', to='main.customquestion')),
+            ],
+            options={
+                'unique_together': {('answer', 'option')},
+            },
+        ),
+        migrations.RunPython(backfill_choices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1 on 2026-10-19 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    """Count every existing event's dashboard numbers (main.counters.count_events at this point in time)"""
+    db_alias = schema_editor.connection.alias
+    Event = apps.get_model('main', 'Event')
+    EventCounters = apps.get_model('main', 'EventCounters')
+    Attendee = apps.get_model('main', 'Attendee')
+    OnSiteAttendee = apps.get_model('main', 'OnSiteAttendee')
+    Abstract = apps.get_model('main', 'Abstract')
+
+    counts = {event_id: {} for event_id in Event.objects.using(db_alias).values_list('id', flat=True)}
+    querysets = [
+        Attendee.objects.using(db_alias).values('event_id').annotate(
+            registered=Count('id'), attended=Count('id', filter=Q(is_attended=True)),
+        ),
+        Attendee.objects.using(db_alias).filter(payments__status='completed').values('event_id').annotate(
+            paid=Count('id', distinct=True),
+        ),
+        OnSiteAttendee.objects.using(db_alias).values('event_id').annotate(
+            onsite=Count('id'), onsite_confirmed=Count('id', filter=Q(is_confirmed=True)),
+        ),
+        Abstract.objects.using(db_alias).values('event_id').annotate(
+            speaker_abstracts=Count('id', filter=Q(type='speaker')),
+            poster_abstracts=Count('id', filter=Q(type='poster')),
+            short_talk_requests=Count('id', filter=Q(type='poster', wants_short_talk=True)),
+        ),
+    ]
+    for queryset in querysets:
+        for row in queryset.order_by():
+            counts[row.pop('event_id')].update(row)
+    EventCounters.objects.using(db_alias).bulk_create(
+        [EventCounters(event_id=event_id, **values) for event_id, values in counts.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0066_answerchoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCounters',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='main.event')),
+                ('registered', models.IntegerField(default=0)),
+                ('paid', models.IntegerField(default=0)),
+                ('attended', models.IntegerField(default=0)),
+                ('onsite', models.IntegerField(default=0)),
+                ('onsite_confirmed', models.IntegerField(default=0)),
+                ('speaker_abstracts', models.IntegerField(default=0)),
+                ('poster_abstracts', models.IntegerField(default=0)),
+                ('short_talk_requests', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1 on 2026-10-19 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0067_eventcounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('attendee', 'Attendee'), ('onsite', 'On-site attendee')], max_length=20)),
+                ('record_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendee',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventcounters',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='onsiteattendee',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='attendee',
+            index=models.Index(fields=['event', 'change_seq'], name='main_attend_event_i_1209ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onsiteattendee',
+            index=models.Index(fields=['event', 'change_seq'], name='main_onsite_event_i_0a8447_idx'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='event',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to='main.event'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['event', 'change_seq'], name='main_syncto_event_i_3cb2d4_idx'),
+        ),
+    ]
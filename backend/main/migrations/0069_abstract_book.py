@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0068_checkin_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbstractRendering',
+            fields=[
+                ('abstract', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rendering', serialize=False, to='main.abstract')),
+                ('source', models.CharField(max_length=1100)),
+                ('html', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AbstractBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('html', 'HTML'), ('docx', 'DOCX')], default='html', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('converted', models.PositiveIntegerField(default=0)),
+                ('reused', models.PositiveIntegerField(default=0)),
+                ('file_path', models.CharField(blank=True, max_length=1000)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='abstract_books', to='main.event')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
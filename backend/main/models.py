@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
 
 def default_main_languages():
     return ['en']
@@ -54,12 +54,56 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+def _stamp_change(instance, save_kwargs):
+    """
+    Mark an attendee or on-site attendee being saved as changed. Check-in
+    sync numbers the change later (see main.checkin.number_changes), so
+    saving takes no lock on the event's counters row.
+    """
+    instance.change_seq = 0
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = {*save_kwargs['update_fields'], 'change_seq'}
+
+NAMETAG_ATTEMPTS = 5
+
+def _save_numbered(instance, nametag_field, save, args, kwargs):
+    """
+    Save an attendee or on-site attendee with `save`, first numbering its
+    nametag after the event's highest one if it has none. Numbering first
+    locks the event's counters row, which main.counters updates in the same
+    transaction anyway, so concurrent registrations read the highest number
+    one after another. Each attempt runs in a savepoint: without a counters
+    row two registrations can take the same number, and the unique
+    constraint then fails this one, which retries with the next.
+    """
+    model = type(instance)
+    using = kwargs.get('using') or router.db_for_write(model, instance=instance)
+    numbered = not getattr(instance, nametag_field)
+    for attempt in range(1, NAMETAG_ATTEMPTS + 1):
+        try:
+            with transaction.atomic(using=using):
+                if numbered:
+                    EventCounters.objects.using(using).select_for_update().filter(
+                        event_id=instance.event_id
+                    ).exists()
+                    max_id = model.objects.using(using).filter(event_id=instance.event_id).aggregate(
+                        models.Max(nametag_field)
+                    )[f'{nametag_field}__max'] or 0
+                    setattr(instance, nametag_field, max_id + 1)
+                _stamp_change(instance, kwargs)
+                save(*args, **kwargs)
+            return
+        except IntegrityError:
+            if not numbered or attempt == NAMETAG_ATTEMPTS:
+                raise
+
 class Attendee(models.Model):
     """
     Attendee model
     """
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    event = models.ForeignKey('Event', on_delete=models.CASCADE)
+    event = models.ForeignKey('Event', on_delete=models.CASCADE, related_name='attendees')
     attendee_nametag_id = models.PositiveIntegerField(default=0)
     first_name = models.CharField(max_length=1000)
     middle_initial = models.CharField(max_length=1, blank=True)
@@ -76,17 +120,16 @@ class Attendee(models.Model):
     user_deleted_at = models.DateTimeField(null=True, blank=True)  # When the associated user was deleted
     user_email = models.EmailField(blank=True)  # Preserved email after user deletion
     is_attended = models.BooleanField(default=False)
+    change_seq = models.BigIntegerField(default=0)  # Event change sequence number of the last change, 0 until sync numbers it
 
     class Meta:
         unique_together = [['event', 'attendee_nametag_id']]
+        indexes = [
+            models.Index(fields=['event', 'change_seq']),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.attendee_nametag_id:
-            max_id = Attendee.objects.filter(event=self.event).aggregate(
-                models.Max('attendee_nametag_id')
-            )['attendee_nametag_id__max'] or 0
-            self.attendee_nametag_id = max_id + 1
-        super().save(*args, **kwargs)
+        _save_numbered(self, 'attendee_nametag_id', super().save, args, kwargs)
 
     @property
     def name(self):
@@ -103,17 +146,16 @@ class OnSiteAttendee(models.Model):
     institute = models.CharField(max_length=1000)
     job_title = models.CharField(max_length=1000, blank=True)
     is_confirmed = models.BooleanField(default=False)
+    change_seq = models.BigIntegerField(default=0)  # Event change sequence number of the last change, 0 until sync numbers it
 
     class Meta:
         unique_together = [['event', 'onsiteattendee_nametag_id']]
+        indexes = [
+            models.Index(fields=['event', 'change_seq']),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.onsiteattendee_nametag_id:
-            max_id = OnSiteAttendee.objects.filter(event=self.event).aggregate(
-                models.Max('onsiteattendee_nametag_id')
-            )['onsiteattendee_nametag_id__max'] or 0
-            self.onsiteattendee_nametag_id = max_id + 1
-        super().save(*args, **kwargs)
+        _save_numbered(self, 'onsiteattendee_nametag_id', super().save, args, kwargs)
 
     @property
     def korean_name(self):
@@ -180,7 +222,6 @@ class Event(models.Model):
     email_template_certificate = models.ForeignKey('EmailTemplate', on_delete=models.SET_NULL, blank=True, null=True, related_name='email_template_certificate')
     invitation_code = models.CharField(max_length=100, blank=True)  # Empty = public event, non-empty = invitation only
     onsite_code = models.CharField(max_length=6, blank=True)  # Auto-generated code for onsite registration URL
-    attendees = models.ManyToManyField('Attendee', related_name='events', blank=True)
     reviewers = models.ManyToManyField('Attendee', related_name='reviewed_events', blank=True)
     admins = models.ManyToManyField('User', related_name='admins', blank=True)
     published = models.BooleanField(default=False)
@@ -265,12 +306,18 @@ class Speaker(models.Model):
         ('poster', 'Poster'),
     ])
 
-class AbstractVote(models.Model):
+class Vote(models.Model):
     """
-    AbstractVote model
+    A reviewer's vote for an abstract. Abstract.vote_count and vote_score
+    are running tallies of these rows, kept up to date by main.voting.
     """
-    reviewer = models.ForeignKey('Attendee', on_delete=models.CASCADE)
-    voted_abstracts = models.ManyToManyField('Abstract', related_name='votes')
+    reviewer = models.ForeignKey('Attendee', on_delete=models.CASCADE, related_name='votes')
+    abstract = models.ForeignKey('Abstract', on_delete=models.CASCADE, related_name='votes')
+    score = models.PositiveSmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['reviewer', 'abstract']]
 
 class Abstract(models.Model):
     """
@@ -287,6 +334,8 @@ class Abstract(models.Model):
     file_path = models.CharField(max_length=1000)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='poster')
     wants_short_talk = models.BooleanField(default=False)  # Only applicable for poster type
+    vote_count = models.PositiveIntegerField(default=0)  # Number of votes
+    vote_score = models.PositiveIntegerField(default=0)  # Sum of vote scores
     def delete(self):
         try:
             import os, shutil
@@ -296,6 +345,45 @@ class Abstract(models.Model):
             pass
         super(Abstract, self).delete()
 
+class AbstractRendering(models.Model):
+    """
+    HTML converted from an abstract's file, kept by main.abstract_book so
+    that an unchanged file is not converted again
+    """
+    abstract = models.OneToOneField(Abstract, on_delete=models.CASCADE, primary_key=True, related_name='rendering')
+    source = models.CharField(max_length=1100)  # File path, size and modification time the HTML was converted from
+    html = models.TextField()
+
+class AbstractBook(models.Model):
+    """
+    An event's abstracts compiled into one document by
+    main.tasks.compile_abstract_book
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    FORMAT_CHOICES = [
+        ('html', 'HTML'),
+        ('docx', 'DOCX'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='abstract_books')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='html')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)  # Abstracts in the book
+    converted = models.PositiveIntegerField(default=0)  # Abstracts ready so far, reused ones included
+    reused = models.PositiveIntegerField(default=0)  # Abstracts taken from AbstractRendering
+    file_path = models.CharField(max_length=1000, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
 class CustomQuestion(models.Model):
     """
     CustomQuestion model
@@ -319,6 +407,80 @@ class CustomAnswer(models.Model):
     question = models.TextField(blank=True)
     answer = models.TextField(blank=True)
 
+    class Meta:
+        # One answer per question; detached answers (reference NULL) are not constrained
+        unique_together = [['attendee', 'reference']]
+
+class AnswerChoice(models.Model):
+    """
+    An option picked in a select or checkbox answer, kept in sync with
+    CustomAnswer.answer by main.answers so options can be counted in the DB
+    """
+    answer = models.ForeignKey(CustomAnswer, on_delete=models.CASCADE, related_name='choices')
+    question = models.ForeignKey(CustomQuestion, on_delete=models.CASCADE, related_name='choices')
+    option = models.TextField()
+
+    class Meta:
+        unique_together = [['answer', 'option']]
+
+class EventCounters(models.Model):
+    """
+    Per-event dashboard counts, adjusted by main.counters as attendees,
+    payments, on-site attendees and abstracts change, and reconciled
+    periodically against the rows they count
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    registered = models.IntegerField(default=0)
+    paid = models.IntegerField(default=0)  # Attendees with at least one completed payment
+    attended = models.IntegerField(default=0)
+    onsite = models.IntegerField(default=0)
+    onsite_confirmed = models.IntegerField(default=0)
+    speaker_abstracts = models.IntegerField(default=0)
+    poster_abstracts = models.IntegerField(default=0)
+    short_talk_requests = models.IntegerField(default=0)  # Poster abstracts that want a short talk
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    change_seq = models.BigIntegerField(default=0)  # Last change sequence number issued for the event (check-in sync)
+
+    @classmethod
+    def next_change_seq(cls, event_id, using=None):
+        """
+        Issue the event's next change sequence number, or 0 if the event has
+        no counters row. The row stays locked until the transaction ends, so
+        numbers become visible in the order they were issued.
+        """
+        connection = connections[using or router.db_for_write(cls)]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            # A single statement; PostgreSQL and SQLite 3.35+ support UPDATE ... RETURNING
+            cursor.execute(
+                f'UPDATE {quote(cls._meta.db_table)} SET {quote("change_seq")} = {quote("change_seq")} + 1 '
+                f'WHERE {quote("event_id")} = %s RETURNING {quote("change_seq")}',
+                [event_id],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+class SyncTombstone(models.Model):
+    """
+    A deleted attendee or on-site attendee, so that check-in sync clients
+    drop it from their copy
+    """
+    KIND_CHOICES = [
+        ('attendee', 'Attendee'),
+        ('onsite', 'On-site attendee'),
+    ]
+    # No database constraint: while an event is deleted, its attendees' tombstones can be written after
+    # the event's own rows were collected for deletion
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, db_constraint=False, related_name='sync_tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    record_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'change_seq']),
+        ]
+
 class EmailTemplate(models.Model):
     """
     EmailTemplates model
@@ -339,6 +501,17 @@ class EmailVerificationKey(models.Model):
             models.Index(fields=['email', 'verification_key']),
         ]
 
+class PaymentHistoryQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() sends no post_save, which is what invalidates the cached payment reports
+        from main.reports import invalidate_payment_reports
+
+        rows = super().update(**kwargs)
+        if rows:
+            invalidate_payment_reports()
+        return rows
+
+
 class PaymentHistory(models.Model):
     """
     Payment history for event registrations
@@ -358,6 +531,7 @@ class PaymentHistory(models.Model):
     # Toss Payments fields
     toss_payment_key = models.CharField(max_length=200, blank=True, null=True)
     toss_order_id = models.CharField(max_length=64, blank=True, null=True)  # Our generated order ID
+    receipt_url = models.URLField(max_length=500, blank=True)  # Toss card receipt URL (fixed once the payment is complete)
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Copied attendee information for receipts (preserved even if attendee is deleted)
@@ -381,6 +555,8 @@ class PaymentHistory(models.Model):
     event_organizers_en = models.CharField(max_length=1000, blank=True)
     event_organizers_ko = models.CharField(max_length=1000, blank=True)
 
+    objects = PaymentHistoryQuerySet.as_manager()
+
     @property
     def attendee_name(self):
         """Get the attendee's full name from copied fields"""
@@ -0,0 +1,104 @@
+"""
+N+1 query detection.
+
+Every SQL statement is fingerprinted by its normalized shape (literals and
+IN-lists collapsed) together with the project code line that issued it,
+such as a schema resolver or a loop in a view. When one fingerprint repeats
+more than settings.NPLUSONE_THRESHOLD times within a request, it is
+reported: NPlusOneMiddleware logs a warning (NPLUSONE_MODE='log', the
+default under DEBUG) or raises NPlusOneError (NPLUSONE_MODE='raise', used by
+the test suite). With 'off', the default without DEBUG, it installs nothing.
+
+In tests, the detector can also wrap arbitrary code:
+
+    with assert_no_nplusone():
+        self.client.get('/api/admin/users')
+"""
+import logging
+import os
+import re
+import sys
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\'[^\']*\'|-?\d+(?:\.\d+)?)\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+# Instrumentation that wraps query execution (see execute_wrapper) or the request, never the call site
+_OWN_FILES = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('nplusone.py', 'middleware.py', 'tracing.py', 'profiling.py', 'db_router.py')
+}
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """SQL with literals and IN-lists replaced, so per-row variants share one shape"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _call_site():
+    """file:line (function) of the innermost project frame that issued the query"""
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and 'site-packages' not in filename and filename not in _OWN_FILES:
+            return f'{os.path.relpath(filename, base_dir)}:{frame.f_lineno} ({frame.f_code.co_name})'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class NPlusOneDetector:
+    def __init__(self, threshold=None):
+        self.threshold = settings.NPLUSONE_THRESHOLD if threshold is None else threshold
+        self.counts = {}
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (normalize_sql(sql), _call_site())
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return execute(sql, params, many, context)
+
+    def violations(self):
+        """[(count, call_site, normalized_sql)] for shapes repeated above the threshold"""
+        return sorted(
+            ((count, site, sql) for (sql, site), count in self.counts.items() if count > self.threshold),
+            reverse=True,
+        )
+
+    def report(self, where=''):
+        lines = [f'Possible N+1 queries{f" in {where}" if where else ""}:']
+        for count, site, sql in self.violations():
+            lines.append(f'  {count}x at {site}: {sql}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_no_nplusone(threshold=None):
+    """Fail if the wrapped code repeats a query shape from one call site above the threshold"""
+    with NPlusOneDetector(threshold) as detector:
+        yield detector
+    if detector.violations():
+        raise NPlusOneError(detector.report())
@@ -0,0 +1,48 @@
+"""
+Toss Payments API helpers shared by the API views and management commands.
+"""
+import base64
+import logging
+
+import requests
+from django.conf import settings
+
+from main.models import PaymentHistory
+
+logger = logging.getLogger(__name__)
+
+
+def toss_headers():
+    """Authorization header for Toss: Basic base64(secretKey:)"""
+    auth_string = base64.b64encode(f"{settings.TOSS_SECRET_KEY}:".encode()).decode()
+    return {
+        "Authorization": f"Basic {auth_string}",
+        "Content-Type": "application/json",
+    }
+
+
+def get_toss_payment_by_order(order_id, timeout=30):
+    """
+    Look up a Toss payment by our order ID.
+    Returns the requests.Response; raises requests.RequestException on connection errors.
+    """
+    return requests.get(
+        f"{settings.TOSS_API_URL}/payments/orders/{order_id}",
+        headers=toss_headers(),
+        timeout=timeout,
+    )
+
+
+def extract_receipt_url(toss_payment):
+    """Receipt URL from a Toss payment object ('' if there is none)"""
+    return (toss_payment.get("receipt") or {}).get("url", "") or ""
+
+
+def save_receipt_url(payment, receipt_url):
+    """
+    Persist a receipt URL without a full save() - the receipt does not change
+    anything the payment reports depend on, so this bypasses the manager's
+    update(), which would drop the cached reports.
+    """
+    payment.receipt_url = receipt_url
+    PaymentHistory._base_manager.filter(pk=payment.pk).update(receipt_url=receipt_url)
@@ -0,0 +1,60 @@
+"""
+Request-scoped event loading and event role checks.
+
+Event-scoped endpoints used to fetch the same Event several times per
+request (once in the permission decorator, again in the view) and checked
+roles by materializing the whole admins/reviewers list. The helpers here
+load each event once per request and answer role checks with a single
+exists() query, memoized on the request.
+"""
+from main.models import Event
+
+EVENT_ROLES = ('admin', 'reviewer', 'staff', 'staff_or_reviewer')
+
+
+def get_request_event(request, event_id):
+    """
+    Return the Event with the given ID, loading it at most once per request.
+    The last loaded event is also attached as request.event.
+    Raises Event.DoesNotExist like Event.objects.get().
+    """
+    events = request.__dict__.setdefault('_events', {})
+    event = events.get(event_id)
+    if event is None:
+        event = Event.objects.get(id=event_id)
+        events[event_id] = event
+    request.event = event
+    return event
+
+
+def has_event_role(request, event_id, role):
+    """
+    Check whether the request user has a role on an event.
+
+    - admin: listed in Event.admins
+    - reviewer: registered for the event and listed in Event.reviewers
+    - staff: global staff or event admin
+    - staff_or_reviewer: staff, event admin or reviewer
+
+    Results are memoized per request.
+    """
+    if role not in EVENT_ROLES:
+        raise ValueError(f"Unknown event role: {role}")
+    user = request.user
+    if not user.is_authenticated:
+        return False
+
+    roles = request.__dict__.setdefault('_event_roles', {})
+    key = (event_id, role)
+    if key not in roles:
+        if role == 'admin':
+            roles[key] = Event.admins.through.objects.filter(event_id=event_id, user_id=user.id).exists()
+        elif role == 'reviewer':
+            roles[key] = Event.reviewers.through.objects.filter(
+                event_id=event_id, attendee__event_id=event_id, attendee__user_id=user.id,
+            ).exists()
+        elif role == 'staff':
+            roles[key] = user.is_staff or has_event_role(request, event_id, 'admin')
+        else:
+            roles[key] = has_event_role(request, event_id, 'staff') or has_event_role(request, event_id, 'reviewer')
+    return roles[key]
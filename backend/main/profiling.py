@@ -0,0 +1,206 @@
+"""
+Opt-in request profiling.
+
+A staff user profiles any /api/ request by adding the `X-Profile` header or
+the `_profile` query parameter with the value `cprofile` or `sample` (any
+other true value means `cprofile`). Independently, PROFILING_SAMPLE_RATE
+profiles that fraction of all /api/ requests with the low-overhead sampling
+profiler.
+
+Each profile is stored in PROFILING_DIR as:
+- <id>.json: request metadata and the SQL timeline (start offset, duration, SQL)
+- <id>.pstats: cProfile stats, loadable with pstats/snakeviz
+- <id>.collapsed: collapsed stacks ("a;b;c count"), for flamegraph.pl/speedscope
+
+Only the newest PROFILING_MAX_PROFILES profiles are kept.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KINDS = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+# cProfile uses interpreter-wide monitoring hooks, so only one can run at a time
+_cprofile_lock = threading.Lock()
+
+
+def requested_kind(request):
+    """Profiler kind requested by a staff user, or None"""
+    value = request.headers.get('X-Profile') or request.GET.get('_profile')
+    if not value or value.lower() in ('0', 'false', 'no', 'off'):
+        return None
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return None
+    value = value.lower()
+    return value if value in PROFILE_KINDS else 'cprofile'
+
+
+def should_sample():
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profiles one request: a cProfile or stack sampler plus a SQL timeline"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.sql = []
+        self._stack = ExitStack()
+        self._profiler = None
+        self._sampler = None
+
+    def _record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.sql.append({
+                'alias': context['connection'].alias,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round((end - start) * 1000, 3),
+                'sql': sql,
+            })
+
+    def __enter__(self):
+        if self.kind == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+            self.kind = 'sample'
+        self.started = time.perf_counter()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record_query))
+        if self.kind == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cprofile_lock.release()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self.started
+        self._stack.close()
+
+    def save(self, request, response):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        profile_id = timezone.now().strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:8]
+        base = os.path.join(directory, profile_id)
+        files = []
+        if self._profiler is not None:
+            self._profiler.dump_stats(base + '.pstats')
+            files.append('pstats')
+        if self._sampler is not None:
+            with open(base + '.collapsed', 'w') as f:
+                f.write(self._sampler.collapsed())
+            files.append('collapsed')
+        metadata = {
+            'id': profile_id,
+            'kind': self.kind,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.get_username() if request.user.is_authenticated else '',
+            'status': response.status_code,
+            'created_at': timezone.now().isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'query_count': len(self.sql),
+            'query_time_ms': round(sum(q['duration_ms'] for q in self.sql), 3),
+            'files': files,
+            'sql': self.sql,
+        }
+        with open(base + '.json', 'w') as f:
+            json.dump(metadata, f)
+        prune_profiles()
+        return profile_id
+
+
+def _profile_ids():
+    directory = settings.PROFILING_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted((f[:-5] for f in os.listdir(directory) if f.endswith('.json')), reverse=True)
+
+
+def prune_profiles():
+    for profile_id in _profile_ids()[settings.PROFILING_MAX_PROFILES:]:
+        for extension in ('.json', '.pstats', '.collapsed'):
+            try:
+                os.remove(os.path.join(settings.PROFILING_DIR, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(profile_id, extension):
+    """Path of a stored profile file, or None if it does not exist"""
+    if not profile_id.replace('-', '').isalnum():
+        return None
+    path = os.path.join(settings.PROFILING_DIR, profile_id + extension)
+    return path if os.path.isfile(path) else None
+
+
+def load_profile(profile_id):
+    path = profile_path(profile_id, '.json')
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_profiles(limit=50):
+    """Metadata of the newest profiles, without their SQL timelines"""
+    profiles = []
+    for profile_id in _profile_ids()[:limit]:
+        metadata = load_profile(profile_id)
+        if metadata is not None:
+            metadata.pop('sql', None)
+            profiles.append(metadata)
+    return profiles
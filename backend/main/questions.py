@@ -0,0 +1,72 @@
+"""
+Custom registration questions.
+
+The question editor submits the whole question list at once. Instead of
+saving question by question, apply_question_set() diffs it against the
+stored questions and writes the difference in one transaction with a
+constant number of queries, however many answers the questions have.
+"""
+from django.db import transaction
+from django.db.models import Case, TextField, Value, When
+
+from main.answers import invalidate_answer_analytics, rebuild_choices
+from main.models import CustomAnswer, CustomQuestion
+
+
+class QuestionSetError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def apply_question_set(event, questions):
+    """
+    Make the event's questions match `questions`, the editor's list in
+    display order: {'id': ..., 'question': {...}}, with id -1 for new
+    questions. Stored questions missing from the list are deleted; their
+    answers are kept, detached. When a question's text changes, the text
+    copied into its answers is updated too, and when its type or options
+    change, the options counted for its answers are rebuilt. Raises
+    QuestionSetError.
+    """
+    existing = {question.id: question for question in event.custom_questions.all()}
+    submitted = [item['id'] for item in questions if item.get('id', -1) != -1]
+    if len(set(submitted)) != len(submitted):
+        raise QuestionSetError('duplicate_question', 'A question is listed more than once.')
+    if not existing.keys() >= set(submitted):
+        raise QuestionSetError('not_found', 'Question not found.')
+
+    created, changed, renamed, reoptioned = [], [], {}, []
+    for order, item in enumerate(questions):
+        if item.get('id', -1) == -1:
+            created.append(CustomQuestion(event=event, question=item['question'], order=order))
+            continue
+        question = existing[item['id']]
+        if question.question == item['question'] and question.order == order:
+            continue
+        if question.question.get('question') != item['question'].get('question'):
+            renamed[question.id] = item['question'].get('question', '')
+        if any(question.question.get(key) != item['question'].get(key) for key in ('type', 'options')):
+            reoptioned.append(question)
+        question.question = item['question']
+        question.order = order
+        changed.append(question)
+    removed = existing.keys() - set(submitted)
+
+    with transaction.atomic():
+        if removed:
+            CustomQuestion.objects.filter(id__in=removed).delete()
+        if created:
+            CustomQuestion.objects.bulk_create(created)
+        if changed:
+            CustomQuestion.objects.bulk_update(changed, ['question', 'order'])
+        if renamed:
+            CustomAnswer.objects.filter(reference_id__in=renamed).update(question=Case(
+                *[When(reference_id=question_id, then=Value(text)) for question_id, text in renamed.items()],
+                output_field=TextField(),
+            ))
+        if reoptioned:
+            rebuild_choices(reoptioned)
+        transaction.on_commit(lambda: invalidate_answer_analytics(event.id))
+    return {'created': len(created), 'updated': len(changed), 'deleted': len(removed)}
@@ -0,0 +1,322 @@
+"""
+Payment reporting - DB-side aggregates and accounting ledger export.
+
+Summaries are computed with aggregate queries instead of walking every
+PaymentHistory row in Python, and are cached until a payment changes
+(see main.signals, and PaymentHistory's queryset for update(), which call
+invalidate_payment_reports()). Other bulk writes to payments, such as raw
+SQL, must call it themselves. They live in
+the "shared" cache, so that a payment recorded by a Celery worker or
+another web process invalidates them everywhere.
+"""
+import csv
+import hashlib
+import re
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.http import FileResponse, StreamingHttpResponse
+
+from main.models import BusinessSettings, PaymentHistory
+
+REPORT_CACHE = 'shared'
+REPORT_CACHE_VERSION_KEY = 'payment_report:version'
+REPORT_CACHE_TIMEOUT = 60 * 60  # 1 hour, invalidated earlier when payments change
+
+LEDGER_COLUMNS = [
+    ('id', 'ID'),
+    ('number', 'Order Number'),
+    ('created_at', 'Date'),
+    ('event_id', 'Event ID'),
+    ('event_name', 'Event'),
+    ('status', 'Status'),
+    ('payment_type', 'Payment Type'),
+    ('manual_payment_type', 'Manual Payment Type'),
+    ('amount', 'Amount'),
+    ('supply_amount', 'Supply Amount'),
+    ('vat', 'VAT'),
+    ('attendee_name', 'Attendee'),
+    ('attendee_korean_name', 'Attendee (Korean)'),
+    ('attendee_email', 'Email'),
+    ('attendee_institute', 'Institute'),
+    ('card_type', 'Card Type'),
+    ('card_number', 'Card Number'),
+    ('approval_number', 'Approval Number'),
+    ('installment', 'Installment'),
+    ('transaction_datetime', 'Transaction Date'),
+    ('transaction_description', 'Transaction Description'),
+    ('note', 'Note'),
+]
+
+_LEDGER_VALUES = [
+    'id', 'toss_order_id', 'created_at', 'event_id', 'event_name', 'status', 'payment_type', 'amount', 'note',
+    'attendee_first_name', 'attendee_middle_initial', 'attendee_last_name', 'attendee_korean_name',
+    'attendee_email', 'attendee_institute',
+    'manual_transaction__payment_type', 'manual_transaction__supply_amount', 'manual_transaction__vat',
+    'manual_transaction__card_type', 'manual_transaction__card_number', 'manual_transaction__approval_number',
+    'manual_transaction__installment', 'manual_transaction__transaction_datetime',
+    'manual_transaction__transaction_description',
+]
+
+
+def _report_timezone():
+    """Timezone used for month buckets and ledger dates (from BusinessSettings)"""
+    try:
+        return ZoneInfo(BusinessSettings.get_instance().timezone)
+    except Exception:
+        return ZoneInfo('Asia/Seoul')
+
+
+def filter_payments(event_ids=None, start_date=None, end_date=None):
+    """
+    Base queryset for reports. Dates are inclusive and interpreted in the
+    business timezone.
+    """
+    payments = PaymentHistory.objects.all()
+    if event_ids:
+        payments = payments.filter(event_id__in=event_ids)
+    tz = _report_timezone()
+    if start_date:
+        payments = payments.filter(created_at__gte=_start_of_day(start_date, tz))
+    if end_date:
+        payments = payments.filter(created_at__lt=_start_of_day(end_date, tz, days=1))
+    return payments
+
+
+def _start_of_day(day, tz, days=0):
+    return datetime.combine(day + timedelta(days=days), time.min, tzinfo=tz)
+
+
+def _amount_sum(field='amount', **filters):
+    return Coalesce(Sum(field, filter=Q(**filters) if filters else None), 0)
+
+
+def payment_summary(event_ids=None, start_date=None, end_date=None):
+    """
+    Aggregate payments in the database.
+
+    Returns totals overall, by status, by payment type and by month, plus
+    supply amount / VAT sums from ManualTransaction. Amounts per type and
+    month only include completed payments.
+    """
+    payments = filter_payments(event_ids, start_date, end_date)
+    completed = payments.filter(status='completed')
+    tz = _report_timezone()
+
+    totals = payments.aggregate(
+        count=Count('id'),
+        completed_count=Count('id', filter=Q(status='completed')),
+        completed_amount=_amount_sum(status='completed'),
+        cancelled_amount=_amount_sum(status='cancelled'),
+        supply_amount=_amount_sum('manual_transaction__supply_amount', status='completed'),
+        vat=_amount_sum('manual_transaction__vat', status='completed'),
+    )
+
+    by_status = [
+        {'key': row['status'], 'count': row['count'], 'amount': row['amount']}
+        for row in payments.values('status').annotate(count=Count('id'), amount=_amount_sum()).order_by('status')
+    ]
+    by_payment_type = [
+        {'key': row['payment_type'] or '', 'count': row['count'], 'amount': row['amount']}
+        for row in completed.values('payment_type').annotate(count=Count('id'), amount=_amount_sum()).order_by('payment_type')
+    ]
+    by_manual_payment_type = [
+        {
+            'key': row['manual_transaction__payment_type'],
+            'count': row['count'],
+            'amount': row['amount'],
+            'supply_amount': row['supply_amount'],
+            'vat': row['vat'],
+        }
+        for row in completed.filter(manual_transaction__isnull=False)
+        .values('manual_transaction__payment_type')
+        .annotate(
+            count=Count('id'),
+            amount=_amount_sum(),
+            supply_amount=_amount_sum('manual_transaction__supply_amount'),
+            vat=_amount_sum('manual_transaction__vat'),
+        )
+        .order_by('manual_transaction__payment_type')
+    ]
+    by_month = [
+        {'key': row['month'].strftime('%Y-%m'), 'count': row['count'], 'amount': row['amount']}
+        for row in completed.annotate(month=TruncMonth('created_at', tzinfo=tz))
+        .values('month').annotate(count=Count('id'), amount=_amount_sum()).order_by('month')
+    ]
+
+    return {
+        'count': totals['count'],
+        'completed_count': totals['completed_count'],
+        'completed_amount': totals['completed_amount'],
+        'cancelled_amount': totals['cancelled_amount'],
+        'supply_amount': totals['supply_amount'],
+        'vat': totals['vat'],
+        'by_status': by_status,
+        'by_payment_type': by_payment_type,
+        'by_manual_payment_type': by_manual_payment_type,
+        'by_month': by_month,
+    }
+
+
+def _report_version():
+    return caches[REPORT_CACHE].get_or_set(REPORT_CACHE_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def invalidate_payment_reports():
+    """Drop every cached payment summary (called whenever a payment changes)."""
+    caches[REPORT_CACHE].set(REPORT_CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_payment_summary(event_ids=None, start_date=None, end_date=None):
+    """Cached wrapper around payment_summary()."""
+    params = f"{sorted(event_ids or [])}:{start_date}:{end_date}"
+    cache_key = f"payment_report:{_report_version()}:{hashlib.sha1(params.encode()).hexdigest()}"
+    cache = caches[REPORT_CACHE]
+    summary = cache.get(cache_key)
+    if summary is None:
+        summary = payment_summary(event_ids, start_date, end_date)
+        cache.set(cache_key, summary, REPORT_CACHE_TIMEOUT)
+    return summary
+
+
+def iter_ledger_rows(payments):
+    """
+    Yield ledger rows (lists ordered like LEDGER_COLUMNS) for a PaymentHistory
+    queryset, streaming from the database in chunks.
+    """
+    tz = _report_timezone()
+    rows = payments.order_by('created_at', 'id').values(*_LEDGER_VALUES)
+    for p in rows.iterator(chunk_size=2000):
+        middle = f" {p['attendee_middle_initial']}" if p['attendee_middle_initial'] else ""
+        name = f"{p['attendee_first_name']}{middle} {p['attendee_last_name']}".strip()
+        transaction_datetime = p['manual_transaction__transaction_datetime']
+        yield [
+            p['id'],
+            p['toss_order_id'] or str(p['id']),
+            p['created_at'].astimezone(tz).strftime('%Y-%m-%d %H:%M:%S'),
+            p['event_id'] or '',
+            p['event_name'],
+            p['status'],
+            p['payment_type'],
+            p['manual_transaction__payment_type'] or '',
+            p['amount'],
+            p['manual_transaction__supply_amount'] or 0,
+            p['manual_transaction__vat'] or 0,
+            name or p['attendee_korean_name'],
+            p['attendee_korean_name'],
+            p['attendee_email'],
+            p['attendee_institute'],
+            p['manual_transaction__card_type'] or '',
+            p['manual_transaction__card_number'] or '',
+            p['manual_transaction__approval_number'] or '',
+            p['manual_transaction__installment'] or '',
+            transaction_datetime.astimezone(tz).strftime('%Y-%m-%d %H:%M:%S') if transaction_datetime else '',
+            p['manual_transaction__transaction_description'] or '',
+            p['note'],
+        ]
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming"""
+    def write(self, value):
+        return value
+
+
+def ledger_csv_response(payments, filename='payments.csv'):
+    """Stream the ledger as CSV (UTF-8 with BOM so spreadsheets detect Korean text)."""
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield '\ufeff'
+        yield writer.writerow([title for _, title in LEDGER_COLUMNS])
+        for row in iter_ledger_rows(payments):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Payments" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, int) and not isinstance(value, bool):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def write_xlsx(rows, header, fileobj):
+    """
+    Write a single-sheet XLSX workbook. The worksheet XML is streamed into
+    the zip entry row by row, so memory use does not grow with row count.
+    """
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode('utf-8'))
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+
+def ledger_xlsx_response(payments, filename='payments.xlsx'):
+    """Build the ledger as XLSX in a spooled temporary file and send it."""
+    fileobj = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    write_xlsx(iter_ledger_rows(payments), [title for _, title in LEDGER_COLUMNS], fileobj)
+    fileobj.seek(0)
+    return FileResponse(
+        fileobj,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
@@ -1,11 +1,39 @@
 
 from ninja import Schema
 
-from typing import List, Union, Optional
-from datetime import date
+from typing import ClassVar, Dict, List, Union, Optional
+from datetime import date, datetime
+
+from main.models import User, Attendee, Abstract, AbstractBook, OnSiteAttendee, Institution
+from main.loaders import register_loader, load
+
+
+@register_loader('social_accounts')
+def load_social_accounts(user_ids):
+    """{user_id: {provider: first linked account}}"""
+    from allauth.socialaccount.models import SocialAccount
+    accounts = {}
+    for account in SocialAccount.objects.filter(user_id__in=user_ids, provider__in=['orcid', 'google']).order_by('id'):
+        accounts.setdefault(account.user_id, {}).setdefault(account.provider, account)
+    return accounts
+
+@register_loader('email_verified')
+def load_email_verified(user_ids):
+    """{user_id: verified flag of the primary email}"""
+    from allauth.account.models import EmailAddress
+    return dict(
+        EmailAddress.objects.filter(user_id__in=user_ids, primary=True).values_list('user_id', 'verified')
+    )
+
+ABSTRACT_BODY_ERROR = "An error occured while trying to convert the file to HTML. Please contact the administrator."
+
+@register_loader('abstract_body')
+def load_abstract_bodies(keys):
+    """{(abstract id, file path): HTML of the abstract file, reusing stored renderings}"""
+    from main.abstract_book import abstract_bodies
+    bodies = abstract_bodies(keys)
+    return {key: bodies[key[0]] for key in keys}
 
-from main.models import User, Attendee, Abstract, OnSiteAttendee, Institution
-from main.utils import docx_to_html, odt_to_html
 
 class LoginSchema(Schema):
     email: str
@@ -58,6 +86,12 @@ class UserSchema(Schema):
     date_joined: str
     email_verified: bool
 
+    loader_keys: ClassVar[dict] = {
+        'social_accounts': lambda user: user.id,
+        'email_verified': lambda user: user.id,
+    }
+    prefetch: ClassVar[list] = ['institute']
+
     @staticmethod
     def resolve_institute(user: User) -> Optional[int]:
         if user.institute:
@@ -77,21 +111,21 @@ class UserSchema(Schema):
         return ""
 
     @staticmethod
-    def resolve_orcid(user: User) -> str:
-        linked_accounts = user.socialaccount_set.filter(provider='orcid')
-        if linked_accounts.count() > 0:
-            return linked_accounts[0].uid
+    def resolve_orcid(user: User, context) -> str:
+        account = load(context, 'social_accounts', user.id, {}).get('orcid')
+        if account:
+            return account.uid
         return ""
 
     @staticmethod
-    def resolve_google(user: User) -> str:
-        linked_accounts = user.socialaccount_set.filter(provider='google')
-        if linked_accounts.count() > 0:
+    def resolve_google(user: User, context) -> str:
+        account = load(context, 'social_accounts', user.id, {}).get('google')
+        if account:
             # Return the Gmail address from extra_data if available
-            extra_data = linked_accounts[0].extra_data
+            extra_data = account.extra_data
             if extra_data and 'email' in extra_data:
                 return extra_data['email']
-            return linked_accounts[0].uid
+            return account.uid
         return ""
 
     @staticmethod
@@ -107,12 +141,8 @@ class UserSchema(Schema):
         return user.date_joined.isoformat()
 
     @staticmethod
-    def resolve_email_verified(user: User) -> bool:
-        from allauth.account.models import EmailAddress
-        email_address = EmailAddress.objects.filter(user=user, primary=True).first()
-        if email_address:
-            return email_address.verified
-        return False
+    def resolve_email_verified(user: User, context) -> bool:
+        return load(context, 'email_verified', user.id, False)
 
 
 class PublicUserSchema(Schema):
@@ -188,6 +218,9 @@ class EventSchema(Schema):
     published: bool
     is_invitation_only: bool
 
+    # organizers, organizers_en and organizers_ko all read organizer_set
+    prefetch: ClassVar[list] = ['organizer_set']
+
     @staticmethod
     def resolve_is_invitation_only(obj):
         return bool(obj.invitation_code)
@@ -248,6 +281,9 @@ class EventAdminSchema(Schema):
     nametag_paper_height: float
     nametag_orientation: str
 
+    # organizers, organizers_en and organizers_ko all read organizer_set
+    prefetch: ClassVar[list] = ['organizer_set']
+
     @staticmethod
     def resolve_organizers(obj):
         return obj.organizer_set.all()
@@ -260,6 +296,17 @@ class QuestionSchema(Schema):
     id: int
     question: dict
 
+class OptionCountSchema(Schema):
+    option: str
+    count: int
+
+class QuestionAnalyticsSchema(Schema):
+    id: int
+    type: str
+    question: str
+    responses: int
+    options: List[OptionCountSchema]
+
 class AnswerSchema(Schema):
     id: int
     reference: Optional[QuestionSchema] = None
@@ -268,7 +315,68 @@ class AnswerSchema(Schema):
 
 class StatsSchema(Schema):
     registered: int
+    paid: int
+    pending: int  # Registered but not paid, for events with a registration fee
+    attended: int
+    onsite: int
+    onsite_confirmed: int
     abstracts: int
+    speaker_abstracts: int
+    poster_abstracts: int
+    short_talk_requests: int
+    reconciled_at: Optional[datetime] = None
+
+class CheckInItemSchema(Schema):
+    nametag_id: Optional[int] = None  # Attendee nametag number
+    onsite_nametag_id: Optional[int] = None  # On-site attendee nametag number
+    token: Optional[str] = None  # Scanned from the nametag QR code
+
+class CheckInSchema(Schema):
+    items: List[CheckInItemSchema]
+    attended: bool = True  # False to undo check-ins
+
+class CheckInResultSchema(Schema):
+    kind: Optional[str] = None  # 'attendee' or 'onsite'
+    nametag_id: Optional[int] = None
+    name: str
+    status: str
+
+class CheckInResponseSchema(Schema):
+    results: List[CheckInResultSchema]
+    counters: StatsSchema
+
+class QueuedCheckInSchema(CheckInItemSchema):
+    attended: bool = True
+
+class CheckInUploadSchema(Schema):
+    cursor: int  # Sync cursor the desk had when the check-ins were queued
+    items: List[QueuedCheckInSchema]
+
+class SyncPersonSchema(Schema):
+    id: int
+    nametag_id: int
+    name: str
+    korean_name: str = ''
+    institute: str
+    checked_in: bool
+
+class CheckInSyncSchema(Schema):
+    cursor: int
+    full: bool  # True when this replaces the desk's whole copy
+    attendees: List[SyncPersonSchema]
+    onsite: List[SyncPersonSchema]
+    deleted_attendees: List[int]
+    deleted_onsite: List[int]
+
+class CheckInUploadResponseSchema(Schema):
+    results: List[CheckInResultSchema]
+    counters: StatsSchema
+    changes: CheckInSyncSchema
+
+class CheckInTokenSchema(Schema):
+    kind: str
+    nametag_id: int
+    token: str
 
 class AttendeeSchema(Schema):
     id: int
@@ -318,7 +426,7 @@ class AbstractShortSchema(Schema):
     link: str
     @staticmethod
     def resolve_votes(abstract: Abstract) -> int:
-        return abstract.votes.count()
+        return abstract.vote_count
     @staticmethod
     def resolve_link(abstract: Abstract) -> str:
         from django.conf import settings
@@ -327,6 +435,7 @@ class AbstractShortSchema(Schema):
         return full_path
     
 class AbstractSchema(Schema):
+    loader_keys: ClassVar[dict] = {'abstract_body': lambda abstract: (abstract.id, abstract.file_path)}
     id: int
     attendee: AttendeeSchema
     title: str
@@ -337,19 +446,10 @@ class AbstractSchema(Schema):
     link: str
     @staticmethod
     def resolve_votes(abstract: Abstract) -> int:
-        return abstract.votes.count()
+        return abstract.vote_count
     @staticmethod
-    def resolve_body(abstract: Abstract) -> str:
-        from django.conf import settings
-        import os
-        full_path = os.path.join(settings.MEDIA_ROOT, abstract.file_path)
-        try:
-            if full_path.endswith(".docx"):
-                return docx_to_html(full_path)
-            elif full_path.endswith(".odt"):
-                return odt_to_html(full_path)
-        except:
-            return "An error occured while trying to convert the file to HTML. Please contact the administrator."
+    def resolve_body(abstract: Abstract, context) -> str:
+        return load(context, 'abstract_body', (abstract.id, abstract.file_path), ABSTRACT_BODY_ERROR)
     @staticmethod
     def resolve_link(abstract: Abstract) -> str:
         from django.conf import settings
@@ -357,8 +457,31 @@ class AbstractSchema(Schema):
         full_path = os.path.join(settings.HEADLESS_URL_ROOT, settings.MEDIA_URL, abstract.file_path)
         return full_path
     
+class AbstractBookRequestSchema(Schema):
+    format: str = 'html'  # 'html' or 'docx'
+
+class AbstractBookSchema(Schema):
+    id: int
+    format: str
+    status: str
+    total: int
+    converted: int
+    reused: int
+    link: str
+    error: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    @staticmethod
+    def resolve_link(book: AbstractBook) -> str:
+        from django.conf import settings
+        import os
+        if not book.file_path:
+            return ''
+        return os.path.join(settings.HEADLESS_URL_ROOT, settings.MEDIA_URL, book.file_path)
+
 class AbstractUserSchema(Schema):
     """Schema for user's own abstract - excludes votes"""
+    loader_keys: ClassVar[dict] = {'abstract_body': lambda abstract: (abstract.id, abstract.file_path)}
     id: int
     attendee: AttendeeSchema
     title: str
@@ -367,17 +490,8 @@ class AbstractUserSchema(Schema):
     wants_short_talk: bool
     link: str
     @staticmethod
-    def resolve_body(abstract: Abstract) -> str:
-        from django.conf import settings
-        import os
-        full_path = os.path.join(settings.MEDIA_ROOT, abstract.file_path)
-        try:
-            if full_path.endswith(".docx"):
-                return docx_to_html(full_path)
-            elif full_path.endswith(".odt"):
-                return odt_to_html(full_path)
-        except:
-            return "An error occured while trying to convert the file to HTML. Please contact the administrator."
+    def resolve_body(abstract: Abstract, context) -> str:
+        return load(context, 'abstract_body', (abstract.id, abstract.file_path), ABSTRACT_BODY_ERROR)
     @staticmethod
     def resolve_link(abstract: Abstract) -> str:
         from django.conf import settings
@@ -385,10 +499,49 @@ class AbstractUserSchema(Schema):
         full_path = os.path.join(settings.HEADLESS_URL_ROOT, settings.MEDIA_URL, abstract.file_path)
         return full_path
 
-class AbstractVoteSchema(Schema):
-    id: int
+class VoteSchema(Schema):
+    abstract_id: int
+    score: int
+    voted_at: datetime
+    @staticmethod
+    def resolve_voted_at(vote) -> datetime:
+        return vote.created_at
+
+class CompactBallotSchema(Schema):
+    version: str
+    votes: List[VoteSchema]
+
+class BallotSchema(Schema):
     reviewer: AttendeeSchema
     voted_abstracts: List[AbstractShortSchema]
+    votes: List[VoteSchema]
+
+class BallotSubmitSchema(Schema):
+    voted_abstracts: List[int]
+    scores: Dict[int, int] = {}  # abstract ID -> score; votes not listed score 1
+
+class AbstractRankingSchema(Schema):
+    rank: int
+    id: int
+    title: str
+    type: str
+    wants_short_talk: bool
+    votes: int
+    score: int
+    presenter: str
+    institute: str
+    @staticmethod
+    def resolve_votes(abstract: Abstract) -> int:
+        return abstract.vote_count
+    @staticmethod
+    def resolve_score(abstract: Abstract) -> int:
+        return abstract.vote_score
+    @staticmethod
+    def resolve_presenter(abstract: Abstract) -> str:
+        return abstract.attendee.name if abstract.attendee else ''
+    @staticmethod
+    def resolve_institute(abstract: Abstract) -> str:
+        return abstract.attendee.institute if abstract.attendee else ''
 
 class OnSiteAttendeeSchema(Schema):
     id: int
@@ -600,4 +753,51 @@ class TermsOfServiceAdminSchema(Schema):
 class TermsOfServiceUpdateSchema(Schema):
     """Schema for updating terms of service"""
     content_en: str
-    content_ko: str
\ No newline at end of file
+    content_ko: str
+
+class PaymentSummaryBucketSchema(Schema):
+    """One row of a grouped payment aggregate (by status, payment type or month)"""
+    key: str
+    count: int
+    amount: int
+    supply_amount: int = 0
+    vat: int = 0
+
+
+class PaymentSummarySchema(Schema):
+    """Server-side payment aggregates for accounting"""
+    count: int
+    completed_count: int
+    completed_amount: int
+    cancelled_amount: int
+    supply_amount: int
+    vat: int
+    by_status: List[PaymentSummaryBucketSchema]
+    by_payment_type: List[PaymentSummaryBucketSchema]
+    by_manual_payment_type: List[PaymentSummaryBucketSchema]
+    by_month: List[PaymentSummaryBucketSchema]
+
+
+class ProfileSummarySchema(Schema):
+    id: str
+    kind: str
+    method: str
+    path: str
+    user: str
+    status: int
+    created_at: str
+    duration_ms: float
+    query_count: int
+    query_time_ms: float
+    files: List[str]
+
+
+class ProfileQuerySchema(Schema):
+    alias: str
+    start_ms: float
+    duration_ms: float
+    sql: str
+
+
+class ProfileSchema(ProfileSummarySchema):
+    sql: List[ProfileQuerySchema]
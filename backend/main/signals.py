@@ -1,7 +1,15 @@
 from allauth.account.signals import email_changed
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 
+from main import counters, voting
+from main.answers import invalidate_answer_analytics
+from main.models import (
+    Abstract, Attendee, Event, EventCounters, OnSiteAttendee, PaymentHistory, ManualTransaction, SyncTombstone,
+)
+from main.reports import invalidate_payment_reports
+
 
 @receiver(user_logged_in)
 def reset_deletion_warning_on_login(sender, user, request, **kwargs):
@@ -22,3 +30,95 @@ def sync_username_on_email_change(sender, request, user, from_email_address, to_
     """
     user.username = to_email_address.email
     user.save(update_fields=['username'])
+
+
+@receiver([post_save, post_delete], sender=PaymentHistory)
+@receiver([post_save, post_delete], sender=ManualTransaction)
+@receiver(post_delete, sender=Event)
+def invalidate_payment_reports_on_change(sender, **kwargs):
+    """
+    Cached payment summaries are stale as soon as a payment or its manual
+    transaction details change. Deleting an event detaches its payments
+    with a bulk update, which sends no post_save; so does
+    PaymentHistory.objects.update(), which invalidates them itself.
+    """
+    invalidate_payment_reports()
+
+
+@receiver(post_delete, sender=Attendee)
+def invalidate_answer_analytics_on_attendee_delete(sender, instance, **kwargs):
+    """
+    Deleting an attendee deletes their answers, which changes the counts in
+    the event's answer analytics.
+    """
+    invalidate_answer_analytics(instance.event_id)
+
+
+@receiver(pre_delete, sender=Attendee)
+def release_votes_on_attendee_delete(sender, instance, **kwargs):
+    """
+    Deleting a reviewer deletes their votes by cascade, bypassing
+    main.voting, so take the votes out of the abstracts' tallies first.
+    """
+    voting.release_votes(instance)
+
+
+@receiver(post_save, sender=Event)
+def create_event_counters(sender, instance, created, using, raw=False, **kwargs):
+    if created and not raw:
+        EventCounters.objects.using(using).create(event=instance)
+
+
+# EventCounters follow saves and deletes of the models they count (see main.counters)
+
+@receiver(post_init, sender=Attendee)
+@receiver(post_init, sender=OnSiteAttendee)
+@receiver(post_init, sender=Abstract)
+@receiver(post_init, sender=PaymentHistory)
+def remember_counted_state(sender, instance, **kwargs):
+    counters.remember(instance)
+
+
+@receiver(pre_save, sender=Attendee)
+@receiver(pre_save, sender=OnSiteAttendee)
+@receiver(pre_save, sender=Abstract)
+@receiver(pre_save, sender=PaymentHistory)
+def load_counted_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.before_save(instance)
+
+
+@receiver(post_save, sender=Attendee)
+@receiver(post_save, sender=OnSiteAttendee)
+@receiver(post_save, sender=Abstract)
+@receiver(post_save, sender=PaymentHistory)
+def count_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.saved(instance, created)
+
+
+@receiver(pre_delete, sender=Attendee)
+def prepare_count_delete(sender, instance, **kwargs):
+    counters.before_delete(instance)
+
+
+@receiver(post_delete, sender=Attendee)
+@receiver(post_delete, sender=OnSiteAttendee)
+@receiver(post_delete, sender=Abstract)
+@receiver(post_delete, sender=PaymentHistory)
+def count_delete(sender, instance, **kwargs):
+    counters.deleted(instance)
+
+
+@receiver(post_delete, sender=Attendee)
+@receiver(post_delete, sender=OnSiteAttendee)
+def record_sync_tombstone(sender, instance, using, **kwargs):
+    """Check-in sync clients learn about deletions from tombstones (see main.checkin)"""
+    change_seq = EventCounters.next_change_seq(instance.event_id, using=using)
+    if change_seq:
+        SyncTombstone.objects.using(using).create(
+            event_id=instance.event_id,
+            kind='attendee' if sender is Attendee else 'onsite',
+            record_id=instance.pk,
+            change_seq=change_seq,
+        )
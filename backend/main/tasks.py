@@ -8,21 +8,24 @@ from django.core.mail import EmailMessage
 from django.conf import settings
 from django.utils import timezone
 
+from main.tracing import span
+
 logger = logging.getLogger(__name__)
 
 @shared_task
 def send_mail(subject, body, to):
-    print(f"Sending email to {to}...")
+    logger.info("Sending email to %s", to, extra={"to": to})
     try:
-        django_send_mail(subject, body, settings.EMAIL_FROM, [to], fail_silently=False)
-        print(f"Mail sent to {to}!")
-    except Exception as e:
-        print(f"Error sending email to {to}: {e}")
+        with span("smtp.send", to=to):
+            django_send_mail(subject, body, settings.EMAIL_FROM, [to], fail_silently=False)
+        logger.info("Mail sent to %s", to, extra={"to": to})
+    except Exception:
+        logger.exception("Error sending email to %s", to, extra={"to": to})
 
 @shared_task
 def send_mail_with_attachment(subject, body, to, attachment_name, attachment_base64, attachment_mimetype='application/pdf'):
     """Send an email with a file attachment."""
-    print(f"Sending email with attachment to {to}...")
+    logger.info("Sending email with attachment to %s", to, extra={"to": to, "attachment": attachment_name})
     try:
         email = EmailMessage(
             subject=subject,
@@ -32,10 +35,11 @@ def send_mail_with_attachment(subject, body, to, attachment_name, attachment_bas
         )
         attachment_data = base64.b64decode(attachment_base64)
         email.attach(attachment_name, attachment_data, attachment_mimetype)
-        email.send(fail_silently=False)
-        print(f"Mail with attachment sent to {to}!")
-    except Exception as e:
-        print(f"Error sending email with attachment to {to}: {e}")
+        with span("smtp.send", to=to, attachment=attachment_name):
+            email.send(fail_silently=False)
+        logger.info("Mail with attachment sent to %s", to, extra={"to": to, "attachment": attachment_name})
+    except Exception:
+        logger.exception("Error sending email with attachment to %s", to, extra={"to": to, "attachment": attachment_name})
 
 
 @shared_task
@@ -155,6 +159,26 @@ def cleanup_old_data():
     }
 
 
+@shared_task
+def reconcile_event_counters():
+    """
+    Recount every event's dashboard counters, repairing drift from changes
+    that bypassed main.counters (bulk writes, manual database edits).
+    """
+    from main.counters import reconcile_counters
+
+    drifted = reconcile_counters()
+    return {'drifted_events': len(drifted)}
+
+
+@shared_task
+def compile_abstract_book(book_id):
+    """Compile an AbstractBook (see main.abstract_book); progress is recorded on the book"""
+    from main.abstract_book import compile_book
+
+    compile_book(book_id)
+
+
 @shared_task
 def cleanup_media_files(min_age_hours=24):
     """
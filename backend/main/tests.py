@@ -1,3 +1,1921 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import logging
+import os
+import pstats
+import socket
+import tempfile
+import time
+import unittest
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from celery.signals import before_task_publish, task_postrun, task_prerun
+
+from main.models import (
+    User, Event, Attendee, Abstract, Vote, Institution, Organizer, CustomQuestion, CustomAnswer, AnswerChoice,
+    EventCounters, OnSiteAttendee, PaymentHistory, ManualTransaction, AbstractBook, AbstractRendering,
+)
+from main.datagen import (
+    DatasetBuilder, answer_questions, build_docx, build_odt, build_large_event, converter_corpus, docx_package,
+    odt_package,
+)
+from main.management.commands.benchmark_converters import run_benchmark as run_converter_benchmark
+from main.management.commands.benchmark_endpoints import BUDGETS_FILE, Benchmark, compare, make_budgets
+from main.management.commands.import_audit import IMPORT_TIME_BUDGETS_MS, TARGETS, measure_imports, total_import_time
+from main.management.commands.simulate_registration_rush import percentile, run_rush
+from main.metrics import QUERY_BUCKETS, STALE_SNAPSHOT_AGE, Registry, registry, render, snapshot_filename
+from main.db_pool import pool_stats
+from main.db_router import ReplicaRouter, _read_alias
+from main.nplusone import NPlusOneError, assert_no_nplusone, normalize_sql
+from main.permissions import has_event_role
+from main.profiling import load_profile
+from main.converters import docx_to_html, odt_to_html
+from main.utils import legacy_docx_to_html, legacy_odt_to_html, validate_abstract_file
+from main.voting import recount_tallies, submit_ballot
+from main.counters import _correct, reconcile_counters
+from main.checkin import MAX_BATCH as MAX_CHECKIN_BATCH, check_in, checkin_token
+from main.answers import get_answer_analytics, registration_answers, upsert_answers
+from main.abstract_book import CONVERSION_ERROR, compile_book, convert_files
+from main.tasks import send_mail
+from main.tracing import JsonFormatter, TraceIdFilter, current_trace_id, span, trace
+from main.reports import LEDGER_COLUMNS, REPORT_CACHE, REPORT_CACHE_VERSION_KEY, get_payment_summary, write_xlsx
+
+
+def convert_in_worker(items):
+    """convert_files() with two processes, from a daemonic process as in a prefork Celery worker"""
+    import multiprocessing
+    assert multiprocessing.current_process().daemon
+    return sorted(convert_files(items, workers=2))
+
+
+def event_loads(queries, event_id):
+    """Number of captured queries that fetched the Event row by primary key"""
+    table = Event._meta.db_table
+    marker = f'FROM "{table}" WHERE "{table}"."id" = {event_id}'
+    return sum(1 for q in queries if marker in q['sql'])
+
+
+class EventTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name='Test Event',
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 1, 2),
+            venue='Venue',
+            capacity=10,
+            accepts_abstract=True,
+        )
+        cls.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='x')
+        cls.event.admins.add(cls.admin)
+        cls.staff = User.objects.create_user(username='staff@example.com', email='staff@example.com', password='x', is_staff=True)
+        cls.reviewer = User.objects.create_user(username='reviewer@example.com', email='reviewer@example.com', password='x')
+        cls.reviewer_attendee = Attendee.objects.create(
+            user=cls.reviewer, event=cls.event, first_name='Re', last_name='Viewer', nationality=1, institute='Inst',
+        )
+        cls.event.reviewers.add(cls.reviewer_attendee)
+        cls.outsider = User.objects.create_user(username='outsider@example.com', email='outsider@example.com', password='x')
+        cls.abstract = Abstract.objects.create(
+            attendee=cls.reviewer_attendee, event=cls.event, title='Abstract', file_path='abstracts/a.docx',
+        )
+
+
+class EventLoaderTests(EventTestCase):
+    def get_event_scoped(self, user, path):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/event/{self.event.id}{path}')
+        return response, event_loads(ctx.captured_queries, self.event.id)
+
+    def test_staff_endpoints_load_event_once(self):
+        paths = [
+            '/stats', '/attendees', '/reviewers', '/abstracts', f'/abstract/{self.abstract.id}',
+            '/eventadmins', '/organizers', '/email_templates', '/onsite', '/payments', '/payments/summary',
+            '/questions/analytics', '/checkin/tokens',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                response, loads = self.get_event_scoped(self.admin, path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(loads, 1)
+
+    def test_admin_event_loads_once(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/admin/event/{self.event.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(event_loads(ctx.captured_queries, self.event.id), 1)
+
+    def test_reviewer_endpoints_load_event_once(self):
+        for path in ['/abstracts', f'/abstract/{self.abstract.id}', '/reviewer', '/reviewer/vote']:
+            with self.subTest(path=path):
+                response, loads = self.get_event_scoped(self.reviewer, path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(loads, 1)
+
+    def test_outsider_is_denied(self):
+        for path in ['/stats', '/abstracts', f'/abstract/{self.abstract.id}', '/reviewer/vote']:
+            with self.subTest(path=path):
+                response, loads = self.get_event_scoped(self.outsider, path)
+                self.assertEqual(response.status_code, 403)
+                self.assertLessEqual(loads, 1)
+
+    def test_missing_event_is_not_found(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/event/999999/stats')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['code'], 'not_found')
+
+
+class EventRoleTests(EventTestCase):
+    def make_request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_roles(self):
+        cases = [
+            (self.staff, {'admin': False, 'reviewer': False, 'staff': True, 'staff_or_reviewer': True}),
+            (self.admin, {'admin': True, 'reviewer': False, 'staff': True, 'staff_or_reviewer': True}),
+            (self.reviewer, {'admin': False, 'reviewer': True, 'staff': False, 'staff_or_reviewer': True}),
+            (self.outsider, {'admin': False, 'reviewer': False, 'staff': False, 'staff_or_reviewer': False}),
+        ]
+        for user, expected in cases:
+            request = self.make_request(user)
+            for role, value in expected.items():
+                with self.subTest(user=user.username, role=role):
+                    self.assertEqual(has_event_role(request, self.event.id, role), value)
+
+    def test_role_checks_are_memoized(self):
+        request = self.make_request(self.reviewer)
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertTrue(has_event_role(request, self.event.id, 'staff_or_reviewer'))
+                self.assertTrue(has_event_role(request, self.event.id, 'reviewer'))
+
+    def test_reviewer_endpoint_checks_role_only(self):
+        for user, expected in [(self.reviewer, True), (self.outsider, False)]:
+            self.client.force_login(user)
+            with self.subTest(user=user.username), CaptureQueriesContext(connection) as ctx:
+                self.assertIs(self.client.get(f'/api/event/{self.event.id}/reviewer').json(), expected)
+                table = Attendee._meta.db_table
+                self.assertEqual([q for q in ctx.captured_queries if f'FROM "{table}"' in q['sql']], [])
+
+
+class DataLoaderTests(EventTestCase):
+    def count_queries(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def add_attendees(self, count):
+        from allauth.account.models import EmailAddress
+        from allauth.socialaccount.models import SocialAccount
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'user{i}@example.com', email=f'user{i}@example.com', password='x')
+            EmailAddress.objects.create(user=user, email=user.email, primary=True, verified=True)
+            SocialAccount.objects.create(user=user, provider='orcid', uid=f'0000-{i}')
+            attendee = Attendee.objects.create(
+                user=user, event=self.event, first_name='First', last_name=str(i), nationality=1, institute='Inst',
+            )
+            self.event.admins.add(user)
+            abstract = Abstract.objects.create(attendee=attendee, event=self.event, title=str(i), file_path='a.docx')
+            submit_ballot(self.event, self.reviewer_attendee, [(abstract.id, 1)])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [
+            '/api/admin/users',
+            '/api/users',
+            f'/api/event/{self.event.id}/eventadmins',
+            f'/api/event/{self.event.id}/attendees',
+            f'/api/event/{self.event.id}/abstracts',
+            f'/api/event/{self.event.id}/reviewer/vote',
+            '/api/events',
+            '/api/admin/events',
+        ]
+        user_for = lambda url: self.reviewer if url.endswith('/vote') else self.staff
+        self.add_attendees(2)
+        before = {url: self.count_queries(user_for(url), url)[0] for url in urls}
+        self.add_attendees(5)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(user_for(url), url)[0], before[url])
+
+    def test_resolved_values(self):
+        self.add_attendees(1)
+        _, users = self.count_queries(self.staff, '/api/admin/users')
+        linked = [u for u in users if u['orcid']]
+        self.assertEqual(len(linked), 1)
+        self.assertTrue(linked[0]['email_verified'])
+        _, abstracts = self.count_queries(self.staff, f'/api/event/{self.event.id}/abstracts')
+        self.assertEqual(sorted(a['votes'] for a in abstracts), [0, 1])
+
+
+class NPlusOneDetectorTests(EventTestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'x\' LIMIT 21'),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_repeated_query_is_flagged(self):
+        attendees = list(Attendee.objects.all()) * 5
+        with self.assertRaisesMessage(NPlusOneError, 'main/tests.py'):
+            with assert_no_nplusone(threshold=3):
+                for attendee in attendees:
+                    Event.objects.get(id=attendee.event_id)
+
+    def test_repeats_up_to_threshold_pass(self):
+        with assert_no_nplusone(threshold=3):
+            for event_id in [1, 2, 3]:
+                Event.objects.filter(id=event_id).exists()
+            list(Event.objects.filter(id__in=[1, 2, 3]))
+
+    def test_call_site_skips_instrumentation(self):
+        # Inside a trace, queries pass through tracing's execute wrapper before reaching the detector
+        with trace('nplusone', 'test'), self.assertRaises(NPlusOneError) as raised:
+            with assert_no_nplusone(threshold=1):
+                for event_id in [1, 2]:
+                    Event.objects.filter(id=event_id).exists()
+        self.assertIn('main/tests.py', str(raised.exception))
+        self.assertNotIn('main/tracing.py', str(raised.exception))
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=0)
+    def test_middleware_raises_in_raise_mode(self):
+        self.client.force_login(self.staff)
+        with self.assertRaises(NPlusOneError) as raised:
+            self.client.get('/api/admin/users')
+        self.assertNotIn('main/db_router.py', str(raised.exception))
+
+    @override_settings(NPLUSONE_MODE='log', NPLUSONE_THRESHOLD=0)
+    def test_middleware_logs_in_log_mode(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('main.nplusone', level='WARNING') as logs:
+            response = self.client.get('/api/admin/users')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/api/admin/users', logs.output[0])
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        f = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        f.close()
+        self.trace_file = f.name
+        self.addCleanup(os.remove, self.trace_file)
+        settings = override_settings(TRACE_FILE=self.trace_file)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def spans(self):
+        with open(self.trace_file) as f:
+            return {s['name']: s for s in map(json.loads, f)}
+
+    def test_span_nesting(self):
+        with span('outside'):
+            pass
+        with trace('trace-1', 'root', kind='test'):
+            with span('outer', step=1):
+                with span('inner'):
+                    Event.objects.exists()
+        spans = self.spans()
+        self.assertEqual(set(spans), {'root', 'outer', 'inner', 'db.query'})
+        self.assertEqual({s['trace_id'] for s in spans.values()}, {'trace-1'})
+        self.assertIsNone(spans['root']['parent_id'])
+        self.assertEqual(spans['outer']['parent_id'], spans['root']['span_id'])
+        self.assertEqual(spans['inner']['parent_id'], spans['outer']['span_id'])
+        self.assertEqual(spans['db.query']['parent_id'], spans['inner']['span_id'])
+        self.assertEqual((spans['root']['attrs'], spans['outer']['attrs']), ({'kind': 'test'}, {'step': 1}))
+        self.assertIsNone(current_trace_id())
+
+    def test_no_spans_without_trace_file(self):
+        from main.tracing import _spans_var
+        with override_settings(TRACE_FILE=None), trace('trace-1', 'root') as root:
+            self.assertEqual(current_trace_id(), 'trace-1')
+            self.assertIsNone(_spans_var.get())
+            with CaptureQueriesContext(connection) as queries:
+                Event.objects.exists()
+            root['status'] = 200
+        self.assertEqual(len(queries), 1)
+        self.assertIsNone(current_trace_id())
+        self.assertEqual(os.path.getsize(self.trace_file), 0)
+
+    def test_failed_span_records_error(self):
+        with self.assertRaises(ValueError), trace('trace-1', 'root'), span('failing'):
+            raise ValueError('boom')
+        self.assertEqual(self.spans()['failing']['attrs'], {'error': "ValueError('boom')"})
+
+    def test_request_id_header(self):
+        response = self.client.get('/api/events', HTTP_X_REQUEST_ID='request-1')
+        self.assertEqual(response['X-Request-ID'], 'request-1')
+        self.assertEqual(self.spans()['http.request']['attrs']['route'], 'api/events')
+        response = self.client.get('/api/events', HTTP_X_REQUEST_ID='not a valid id')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_trace_id_crosses_celery(self):
+        headers = {}
+        with trace('request-1', 'http.request'):
+            before_task_publish.send(sender=send_mail.name, headers=headers, body=None)
+        self.assertEqual(headers['trace_id'], 'request-1')
+
+        # A worker exposes the message headers as attributes of the task request
+        send_mail.push_request(id='task-1', **headers)
+        try:
+            task_prerun.send(sender=send_mail, task_id='task-1', task=send_mail, args=(), kwargs={})
+            self.assertEqual(current_trace_id(), 'request-1')
+            task_postrun.send(sender=send_mail, task_id='task-1', task=send_mail, args=(), kwargs={}, retval=None, state='SUCCESS')
+        finally:
+            send_mail.pop_request()
+        self.assertIsNone(current_trace_id())
+        task = self.spans()['celery.task']
+        self.assertEqual(task['trace_id'], 'request-1')
+        self.assertEqual((task['attrs']['task_id'], task['attrs']['state']), ('task-1', 'SUCCESS'))
+        self.assertIn('queue_wait_ms', task['attrs'])
+
+    def test_json_log_lines_carry_trace_id(self):
+        record = logging.LogRecord('main.test', logging.WARNING, __file__, 1, 'Hello %s', ('world',), None)
+        record.attendee_id = 7
+        with trace('trace-1', 'root'):
+            self.assertTrue(TraceIdFilter().filter(record))
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(
+            {key: data[key] for key in ('level', 'logger', 'message', 'attendee_id', 'trace_id')},
+            {'level': 'WARNING', 'logger': 'main.test', 'message': 'Hello world', 'attendee_id': 7, 'trace_id': 'trace-1'},
+        )
+        self.assertNotIn('args', data)
+
+        # Outside a trace the ID is null, and an explicit one is kept
+        record = logging.LogRecord('main.test', logging.INFO, __file__, 1, 'Hi', (), None)
+        TraceIdFilter().filter(record)
+        self.assertIsNone(json.loads(JsonFormatter().format(record))['trace_id'])
+        record.trace_id = 'given'
+        TraceIdFilter().filter(record)
+        self.assertEqual(record.trace_id, 'given')
+
+
+@override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=3)
+class ListEndpointTests(EventTestCase):
+    """Main list endpoints with enough rows that any per-row query trips the N+1 detector"""
+
+    ROWS = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        event = cls.event
+        event.registration_fee = 1000
+        event.save()
+        question = CustomQuestion.objects.create(event=event, question={'question': 'Q', 'type': 'text', 'options': []})
+        for i in range(cls.ROWS):
+            institution = Institution.objects.create(name_en=f'Institute {i}', name_ko=f'기관 {i}')
+            user = User.objects.create_user(
+                username=f'user{i}@example.com', email=f'user{i}@example.com', password='x', institute=institution,
+            )
+            attendee = Attendee.objects.create(
+                user=user, event=event, first_name='First', last_name=str(i), nationality=1, institute='Inst',
+            )
+            event.admins.add(user)
+            CustomAnswer.objects.create(reference=question, attendee=attendee, question='Q', answer=str(i))
+            Abstract.objects.create(attendee=attendee, event=event, title=str(i), file_path='a.docx')
+            Organizer.objects.create(event=event, name=f'Organizer {i}', order=i)
+            OnSiteAttendee.objects.create(event=event, name=f'Onsite {i}', email=f'onsite{i}@example.com', institute='Inst')
+            payment = PaymentHistory(attendee=attendee, event=event, amount=1000, status='completed', payment_type='카드')
+            payment.copy_attendee_info(attendee)
+            payment.copy_event_info(event)
+            payment.save()
+            Event.objects.create(
+                name=f'Event {i}', start_date=date(2026, 1, 1), end_date=date(2026, 1, 2),
+                venue='Venue', capacity=10, published=True,
+            )
+
+    def test_list_endpoints(self):
+        event_id = self.event.id
+        urls = [
+            '/api/admin/users',
+            '/api/users',
+            '/api/events',
+            '/api/admin/events',
+            '/api/admin/institutions',
+            f'/api/event/{event_id}/attendees',
+            f'/api/event/{event_id}/attendees?all=true',
+            f'/api/event/{event_id}/reviewers',
+            f'/api/event/{event_id}/abstracts',
+            f'/api/event/{event_id}/eventadmins',
+            f'/api/event/{event_id}/organizers',
+            f'/api/event/{event_id}/speakers',
+            f'/api/event/{event_id}/questions',
+            f'/api/event/{event_id}/onsite',
+            f'/api/event/{event_id}/payments',
+            f'/api/event/{event_id}/stats',
+        ]
+        self.client.force_login(self.staff)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_history_endpoints(self):
+        user = User.objects.get(username='user0@example.com')
+        for event in Event.objects.exclude(id=self.event.id):
+            attendee = Attendee.objects.create(
+                user=user, event=event, first_name='First', last_name='0', nationality=1, institute='Inst',
+            )
+            payment = PaymentHistory(attendee=attendee, event=event, amount=1000, status='completed', payment_type='카드')
+            payment.copy_attendee_info(attendee)
+            payment.copy_event_info(event)
+            payment.save()
+        self.client.force_login(user)
+        for url in ['/api/me/payment-history', '/api/me/registration-history']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class BenchmarkTests(TestCase):
+    SCALE = {'seed': 1, 'attendees': 30, 'abstracts': 10, 'reviewers': 3, 'payments': 40, 'institutions': 50}
+
+    def test_dataset_is_deterministic(self):
+        def snapshot():
+            builder = DatasetBuilder(seed=7)
+            users = builder.users(5, builder.institutions(5))
+            return [(u.first_name, u.last_name, u.korean_name, u.institute.name_en) for u in users]
+        first = snapshot()
+        Institution.objects.all().delete()
+        User.objects.all().delete()
+        self.assertEqual(first, snapshot())
+
+    def test_large_event(self):
+        data = build_large_event(events=2, **self.SCALE)
+        event = data['event']
+        self.assertEqual(event.attendees.count(), 30)
+        nametags = list(Attendee.objects.filter(event=event).values_list('attendee_nametag_id', flat=True))
+        self.assertEqual(sorted(nametags), list(range(1, 31)))
+        self.assertEqual(event.abstracts.count(), 10)
+        self.assertEqual(event.reviewers.count(), 3)
+        self.assertEqual(PaymentHistory.objects.filter(event=event).count(), 40)
+        self.assertEqual(Attendee.objects.filter(user=data['users'][0]).count(), 3)
+        self.assertEqual(CustomAnswer.objects.filter(attendee__event=event).count(), 30 * 4)
+
+    def test_dataset_extras(self):
+        builder = DatasetBuilder(seed=3)
+        event = builder.event(registration_fee=11000)
+        attendees = builder.attendees(event, builder.users(5))
+        payments = builder.payments(event, attendees, 50, manual=0.5)
+        manual = [p for p in payments if p.payment_type == '직접입력']
+        self.assertTrue(manual)
+        self.assertEqual(ManualTransaction.objects.filter(payment__event=event).count(), len(manual))
+        self.assertEqual(ManualTransaction.objects.filter(supply_amount=10000, vat=1000).count(), len(manual))
+        onsite = builder.onsite_attendees(event, 5)
+        self.assertEqual([o.onsiteattendee_nametag_id for o in onsite], [1, 2, 3, 4, 5])
+
+    def test_abstract_documents(self):
+        for build, extension, convert in [(build_docx, '.docx', docx_to_html), (build_odt, '.odt', odt_to_html)]:
+            with self.subTest(extension=extension):
+                content = build('A <Title>', 'Kim & Lee', ['First paragraph.', 'Second paragraph.'])
+                self.assertEqual(build('A <Title>', 'Kim & Lee', ['First paragraph.', 'Second paragraph.']), content)
+                self.assertEqual(validate_abstract_file('abstract' + extension, content), (True, ''))
+                with tempfile.NamedTemporaryFile(suffix=extension) as f:
+                    f.write(content)
+                    f.flush()
+                    html = convert(f.name)
+                self.assertIn('<b>A &lt;Title&gt;</b>', html)
+                self.assertIn('<i>Kim &amp; Lee</i>', html)
+                self.assertIn('Second paragraph.', html)
+
+    def run_benchmark(self):
+        from backend.celery import app as celery_app
+        celery_app.conf.task_always_eager = True
+        try:
+            return Benchmark(self.SCALE, repeat=1).run()
+        finally:
+            celery_app.conf.task_always_eager = False
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_budgets(self):
+        results = self.run_benchmark()
+        self.assertEqual(set(results), {
+            'get_events', 'get_event_attendees', 'get_abstracts', 'get_event_payments',
+            'get_registration_history', 'register_event',
+        })
+        budgets = make_budgets(results, self.SCALE, 1.5)
+        self.assertEqual(compare(results, budgets, self.SCALE), [])
+
+        results['get_abstracts']['queries'] += 1
+        results['register_event']['median_ms'] = budgets['endpoints']['register_event']['median_ms'] + 1
+        violations = compare(results, budgets, self.SCALE)
+        self.assertEqual(len(violations), 2)
+        # Time and memory are not comparable across scales, query counts are
+        self.assertEqual(len(compare(results, budgets, dict(self.SCALE, attendees=31))), 1)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_shipped_budgets(self):
+        # At this scale only the query counts of the checked-in budget file apply
+        with open(BUDGETS_FILE) as f:
+            budgets = json.load(f)
+        results = self.run_benchmark()
+        self.assertEqual(set(budgets['endpoints']), set(results))
+        self.assertEqual(compare(results, budgets, self.SCALE), [])
+
+    def test_rush_helpers(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7], 99), 7)
+        answers = answer_questions([
+            {'id': 1, 'question': {'type': 'select', 'question': 'Meal', 'options': ['Meat', 'Fish']}},
+            {'id': 2, 'question': {'type': 'checkbox', 'question': 'Days', 'options': ['Mon', 'Tue']}},
+            {'id': 3, 'question': {'type': 'text', 'question': 'Note'}},
+        ])
+        self.assertEqual(answers, {'1': 'Meat', '2_0': True, '2_1': False, '3': 'Load test answer'})
+
+
+class ImportTimeTests(TestCase):
+    def test_startup_import_budgets(self):
+        for target, budget in IMPORT_TIME_BUDGETS_MS.items():
+            code, env, lazy = TARGETS[target]
+            with self.subTest(target=target):
+                rows, modules = measure_imports(code, env)
+                self.assertEqual([name for name in lazy if name in modules], [])
+                self.assertLess(total_import_time(rows) / 1000, budget)
+
+    def test_urlconf_loads_no_document_libraries(self):
+        code, env, lazy = TARGETS['urls']
+        _, modules = measure_imports(code, env)
+        self.assertIn('main.apis', modules)
+        self.assertEqual([name for name in lazy if name in modules], [])
+
+
+class MetricsTests(TestCase):
+    REQUESTS = ('ieum_http_requests_total', (('method', 'GET'), ('route', 'api/events'), ('status', '200')))
+    QUERIES = ('ieum_http_db_queries', (('method', 'GET'), ('route', 'api/events')))
+
+    def test_middleware_records_requests(self):
+        requests = registry.counters.get(self.REQUESTS, 0)
+        queries = list(registry.histograms.get(self.QUERIES, [0] * (len(QUERY_BUCKETS) + 2)))
+        self.client.get('/api/events')
+        self.assertEqual(registry.counters[self.REQUESTS], requests + 1)
+        data = registry.histograms[self.QUERIES]
+        self.assertEqual(data[-1], queries[-1] + 1)
+        self.assertGreater(data[-2], queries[-2])
+        self.client.get('/api/no-such-endpoint')
+        self.assertTrue(any(labels == (('method', 'GET'), ('route', 'unmatched'), ('status', '404'))
+                            for name, labels in registry.counters if name == 'ieum_http_requests_total'))
+
+    def test_endpoint_merges_snapshots(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        def write_snapshot(filename, value, age=0):
+            other = Registry()
+            other.inc('ieum_http_requests_total', {'method': 'GET', 'route': 'api/other', 'status': '200'}, value)
+            path = os.path.join(directory.name, filename)
+            with open(path, 'w') as f:
+                json.dump(other.dump(), f)
+            os.utime(path, (time.time() - age, time.time() - age))
+            return path
+        write_snapshot('worker-host-7.json', 2)
+        write_snapshot('web-host-7.json', 3)  # same PID on another host
+        stale = write_snapshot('gone-host-8.json', 50, age=STALE_SNAPSHOT_AGE + 1)
+        write_snapshot(snapshot_filename(), 100)  # this process is read from memory instead
+
+        User.objects.create_user(username='staff@example.com', password='x', is_staff=True)
+        self.client.login(username='staff@example.com', password='x')
+        with override_settings(METRICS_DIR=directory.name):
+            response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ieum_http_requests_total{method="GET",route="api/other",status="200"} 5', response.content.decode())
+        self.assertFalse(os.path.exists(stale))
+
+    def test_snapshot_file_names_host_and_pid(self):
+        self.assertEqual(snapshot_filename(), f'{socket.gethostname()}-{os.getpid()}.json')
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            local = Registry()
+            local.inc('ieum_http_requests_total', {'route': 'api/test'})
+            local.snapshot()
+            with open(os.path.join(directory, snapshot_filename())) as f:
+                self.assertEqual(json.load(f)['counters'], [['ieum_http_requests_total', [['route', 'api/test']], 1]])
+            self.assertTrue(local.heartbeat.is_alive())
+
+    def test_requires_staff(self):
+        User.objects.create_user(username='user@example.com', password='x')
+        self.client.login(username='user@example.com', password='x')
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+
+class ProfilingTests(EventTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        overrides = override_settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_staff_profile_round_trip(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(f'/api/event/{self.event.id}?_profile=cprofile')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+
+        profiles = self.client.get('/api/admin/profiles').json()
+        self.assertEqual([(p['id'], p['kind'], p['files']) for p in profiles], [(profile_id, 'cprofile', ['pstats'])])
+        profile = self.client.get(f'/api/admin/profiles/{profile_id}').json()
+        self.assertEqual(profile['path'], f'/api/event/{self.event.id}?_profile=cprofile')
+        self.assertEqual(profile['user'], self.staff.username)
+        self.assertEqual(profile['query_count'], len(profile['sql']))
+        self.assertGreater(profile['query_count'], 0)
+
+        response = self.client.get(f'/api/admin/profiles/{profile_id}/download')
+        path = os.path.join(self.directory, 'download.pstats')
+        with open(path, 'wb') as f:
+            f.write(b''.join(response.streaming_content))
+        self.assertTrue(pstats.Stats(path).total_calls)
+        self.assertEqual(self.client.get(f'/api/admin/profiles/{profile_id}/download?format=collapsed').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/admin/profiles/{profile_id}/download?format=html').status_code, 400)
+        self.assertEqual(self.client.get('/api/admin/profiles/20260101000000-missing').status_code, 404)
+        self.assertEqual(self.client.get('/api/admin/profiles/..%2Fsecret/download?format=json').status_code, 404)
+
+    def test_sampling(self):
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/events'))
+        with override_settings(PROFILING_SAMPLE_RATE=1):
+            response = self.client.get('/api/events')
+        profile = load_profile(response['X-Profile-Id'])
+        self.assertEqual((profile['kind'], profile['user'], profile['files']), ('sample', '', ['collapsed']))
+
+    def test_only_staff_can_request_a_profile(self):
+        self.client.force_login(self.outsider)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/events', HTTP_X_PROFILE='sample'))
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/events', HTTP_X_PROFILE='off'))
+        self.assertIn('X-Profile-Id', self.client.get('/api/events', HTTP_X_PROFILE='sample'))
+
+    def test_profile_endpoints_require_staff(self):
+        self.client.force_login(self.staff)
+        profile_id = self.client.get('/api/events?_profile=sample')['X-Profile-Id']
+        urls = ('/api/admin/profiles', f'/api/admin/profiles/{profile_id}', f'/api/admin/profiles/{profile_id}/download')
+        for user, status in ((None, 401), (self.outsider, 403), (self.admin, 403)):
+            self.client.logout()
+            if user is not None:
+                self.client.force_login(user)
+            for url in urls:
+                with self.subTest(user=user, url=url):
+                    self.assertEqual(self.client.get(url).status_code, status)
+
+    def test_unsaved_profile_keeps_the_response(self):
+        blocker = os.path.join(self.directory, 'file')
+        open(blocker, 'w').close()
+        self.client.force_login(self.staff)
+        with override_settings(PROFILING_DIR=os.path.join(blocker, 'profiles')), \
+                self.assertLogs('main.profiling', 'ERROR') as logs:
+            response = self.client.get('/api/events?_profile=cprofile')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertIn('Could not save the profile of GET /api/events', logs.output[0])
+
+
+class ConnectionPoolTests(TestCase):
+    def test_collector_samples_render_as_gauges(self):
+        local = Registry()
+        local.gauge('test_gauge', 'Test gauge')
+        local.collector(lambda: [('test_gauge', {'alias': 'default'}, 3)])
+        local.collector(lambda: 1 / 0)
+        self.assertEqual(local.dump()['samples'], [['test_gauge', [('alias', 'default')], 3]])
+
+        def pool_samples():
+            return [('ieum_db_pool_size', {'alias': 'default'}, 4)]
+        registry.collector(pool_samples)
+        try:
+            output = render()
+        finally:
+            registry.collectors.remove(pool_samples)
+        self.assertIn('# TYPE ieum_db_pool_size gauge', output)
+        self.assertIn('ieum_db_pool_size{alias="default"} 4', output)
+
+    def test_no_pool_without_postgres(self):
+        if connection.vendor != 'postgresql':
+            self.assertEqual(pool_stats(), {})
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Connection pooling needs PostgreSQL')
+class ConnectionPoolLoadTests(TransactionTestCase):
+    def test_connections_stay_flat_under_load(self):
+        """Two rushes in a row: the server never holds more connections than the pool allows"""
+        builder = DatasetBuilder(seed=3)
+        institutions = builder.institutions(5)
+        users = builder.users(80, institutions)
+        event = builder.event(name='Pool', capacity=0, registration_fee=0, accepts_abstract=False)
+        max_size = connection.settings_dict['OPTIONS']['pool']['max_size']
+        peaks = []
+        for batch in (users[:40], users[40:]):
+            rush, server, sampler, _ = run_rush(event, batch, institutions[0].id, workers=8, concurrency=20)
+            self.assertEqual(rush.outcomes, {})
+            peaks.append(sampler.peak)
+        stats = pool_stats()['default']
+        self.assertLessEqual(max(peaks), max_size)
+        self.assertLessEqual(stats['pool_size'], max_size)
+        # The second rush reuses the pooled connections instead of opening new ones
+        self.assertLessEqual(stats['connections_num'], max_size)
+
+
+@override_settings(READ_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Two SQLite databases stand in for the primary and a replica; rows differ so reads show where they went"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        event = {
+            'start_date': date(2026, 1, 1), 'end_date': date(2026, 1, 2), 'venue': 'Venue', 'capacity': 10,
+            'published': True,
+        }
+        self.event = Event.objects.create(name='Primary', **event)
+        Event.objects.using('replica').create(id=self.event.id, name='Replica', **event)
+
+    def test_configured_routes_read_from_replica(self):
+        self.assertEqual(self.client.get(f'/api/event/{self.event.id}').json()['name'], 'Replica')
+        self.assertEqual(self.client.get('/api/events').json()['events'][0]['name'], 'Replica')
+        with override_settings(READ_REPLICAS=[]):
+            self.assertEqual(self.client.get(f'/api/event/{self.event.id}').json()['name'], 'Primary')
+        with override_settings(READ_REPLICA_ROUTES=[]):
+            self.assertEqual(self.client.get(f'/api/event/{self.event.id}').json()['name'], 'Primary')
+
+    def test_writes_pin_session_to_primary(self):
+        user = User.objects.create_user(username='user@example.com', email='user@example.com', password='x')
+        self.client.force_login(user)
+        response = self.client.post(
+            '/api/institutions', {'name_en': 'New Institute', 'name_ko': '새 연구소'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Institution.objects.filter(name_en='New Institute').exists())
+        self.assertFalse(Institution.objects.using('replica').exists())
+        self.assertEqual(self.client.get(f'/api/event/{self.event.id}').json()['name'], 'Primary')
+        self.assertEqual(self.client.get('/api/institutions').json()[0]['name_en'], 'New Institute')
+
+        # The frontend's server passes on only the session cookie, which is enough
+        frontend = Client()
+        frontend.cookies[settings.SESSION_COOKIE_NAME] = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertEqual(frontend.get(f'/api/event/{self.event.id}').json()['name'], 'Primary')
+        self.assertEqual(Client().get(f'/api/event/{self.event.id}').json()['name'], 'Replica')
+
+        caches['shared'].clear()  # As when the pin expires
+        self.assertEqual(self.client.get(f'/api/event/{self.event.id}').json()['name'], 'Replica')
+
+    def test_router_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Event))
+        self.assertEqual(router.db_for_write(Event), 'default')
+        token = _read_alias.set('replica')
+        try:
+            self.assertEqual(router.db_for_read(Event), 'replica')
+            self.assertIsNone(router.db_for_read(Session))
+            self.assertIsNone(router.db_for_read(caches['shared'].cache_model_class))
+        finally:
+            _read_alias.reset(token)
+
+
+class AttendeeEventTests(EventTestCase):
+    def test_event_attendees_follow_foreign_key(self):
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        attendee = Attendee.objects.create(event=other, first_name='A', last_name='B', nationality=1, institute='Inst')
+        self.assertEqual(list(other.attendees.all()), [attendee])
+        self.assertEqual(list(self.event.attendees.all()), [self.reviewer_attendee])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.event.attendees.count(), 1)
+        self.assertNotIn('JOIN', ctx.captured_queries[0]['sql'])
+
+    def test_nametag_collision_is_retried(self):
+        from django.db.models import QuerySet
+        # As if a concurrent registration had read the same highest nametag number
+        taken = self.reviewer_attendee.attendee_nametag_id
+        stale = iter([{'attendee_nametag_id__max': taken - 1}])
+        aggregate = QuerySet.aggregate
+
+        def first_stale(queryset, *args, **kwargs):
+            return next(stale, None) or aggregate(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'aggregate', first_stale):
+            attendee = Attendee.objects.create(event=self.event, first_name='A', last_name='B', nationality=1, institute='Inst')
+        self.assertEqual(attendee.attendee_nametag_id, taken + 1)
+
+    def test_failed_save_keeps_the_callers_transaction(self):
+        from django.db import IntegrityError, transaction
+        with transaction.atomic():
+            with self.assertRaises(IntegrityError):
+                Attendee.objects.create(
+                    event=self.event, attendee_nametag_id=self.reviewer_attendee.attendee_nametag_id,
+                    first_name='A', last_name='B', nationality=1, institute='Inst',
+                )
+            self.assertEqual(self.event.attendees.count(), 1)
+
+
+class VotingTests(EventTestCase):
+    def setUp(self):
+        self.event.max_votes = 2
+        self.event.save()
+        self.abstracts = [self.abstract] + [
+            Abstract.objects.create(attendee=self.reviewer_attendee, event=self.event, title=str(i), file_path='a.docx')
+            for i in range(3)
+        ]
+
+    def vote(self, user, voted_abstracts, scores=None):
+        self.client.force_login(user)
+        return self.client.post(
+            f'/api/event/{self.event.id}/reviewer/vote',
+            {'voted_abstracts': voted_abstracts, 'scores': scores or {}},
+            content_type='application/json',
+        )
+
+    def tallies(self):
+        return list(Abstract.objects.filter(event=self.event).order_by('id').values_list('vote_count', 'vote_score'))
+
+    def test_ballot_replaces_votes_and_updates_tallies(self):
+        a, b, c, _ = [abstract.id for abstract in self.abstracts]
+        self.assertEqual(self.vote(self.reviewer, [a, b], {str(b): 3}).status_code, 200)
+        self.assertEqual(self.tallies(), [(1, 1), (1, 3), (0, 0), (0, 0)])
+        self.assertEqual(self.vote(self.reviewer, [b, c]).status_code, 200)
+        self.assertEqual(self.tallies(), [(0, 0), (1, 1), (1, 1), (0, 0)])
+        ballot = self.client.get(f'/api/event/{self.event.id}/reviewer/vote').json()
+        self.assertEqual([v['abstract_id'] for v in ballot['votes']], [b, c])
+        self.assertEqual([abstract['votes'] for abstract in ballot['voted_abstracts']], [1, 1])
+        Abstract.objects.update(vote_count=7, vote_score=7)
+        recount_tallies(self.event)
+        self.assertEqual(self.tallies(), [(0, 0), (1, 1), (1, 1), (0, 0)])
+
+    def test_deleting_a_reviewer_releases_their_votes(self):
+        a, b = self.abstracts[0].id, self.abstracts[1].id
+        user = User.objects.create_user(username='second@example.com', email='second@example.com', password='x')
+        second = Attendee.objects.create(user=user, event=self.event, first_name='Se', last_name='Cond', nationality=1, institute='I')
+        self.event.reviewers.add(second)
+        self.vote(self.reviewer, [a, b], {str(b): 3})
+        self.vote(user, [b], {str(b): 2})
+        self.assertEqual(self.tallies()[:2], [(1, 1), (2, 5)])
+        # Deleted without withdraw_votes(), so the votes go by cascade
+        Attendee.objects.filter(id=second.id).delete()
+        self.assertEqual(self.tallies()[:2], [(1, 1), (1, 3)])
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_compact_ballot_supports_conditional_requests(self):
+        a, b = self.abstracts[0].id, self.abstracts[1].id
+        url = f'/api/event/{self.event.id}/reviewer/ballot'
+        self.vote(self.reviewer, [b, a])
+        response = self.client.get(url)
+        ballot = response.json()
+        self.assertEqual([(v['abstract_id'], v['score']) for v in ballot['votes']], [(a, 1), (b, 1)])
+        self.assertEqual(response['ETag'], f'"{ballot["version"]}"')
+        with self.assertNumQueries(5):  # session, user, event, reviewer role, votes
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.vote(self.reviewer, [a], {str(a): 2})
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.json()['version'], ballot['version'])
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_reviewer_abstracts_come_in_one_request(self):
+        self.client.force_login(self.reviewer)
+        url = f'/api/event/{self.event.id}/reviewer/abstracts'
+        with assert_no_nplusone(threshold=1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        abstracts = response.json()
+        self.assertEqual(sorted(a['id'] for a in abstracts), sorted(a.id for a in self.abstracts))
+        self.assertTrue(all(a['body'] and a['attendee']['name'] == 'Re Viewer' for a in abstracts))
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_invalid_ballots_are_rejected(self):
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        foreign = Abstract.objects.create(event=other, title='Foreign', file_path='a.docx')
+        ids = [abstract.id for abstract in self.abstracts]
+        for voted, scores, code in [
+            (ids[:3], {}, 'too_many_votes'),
+            ([ids[0], ids[0]], {}, 'duplicate_vote'),
+            ([ids[0]], {str(ids[0]): 9}, 'invalid_score'),
+            ([foreign.id], {}, 'invalid_abstract'),
+        ]:
+            with self.subTest(code=code):
+                response = self.vote(self.reviewer, voted, scores)
+                self.assertEqual((response.status_code, response.json()['code']), (400, code))
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(self.vote(self.outsider, ids[:1]).status_code, 403)
+
+    def test_removing_reviewer_withdraws_votes(self):
+        submit_ballot(self.event, self.reviewer_attendee, [(self.abstracts[0].id, 2)])
+        self.client.force_login(self.admin)
+        self.client.post(f'/api/event/{self.event.id}/reviewer/{self.reviewer_attendee.id}/delete')
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(self.tallies(), [(0, 0)] * 4)
+
+    def test_ranking(self):
+        a, b, c, d = [abstract.id for abstract in self.abstracts]
+        voters = []
+        for i in range(2):
+            user = User.objects.create_user(username=f'voter{i}@example.com', email=f'voter{i}@example.com', password='x')
+            voters.append(Attendee.objects.create(
+                user=user, event=self.event, first_name='V', last_name=str(i), nationality=1, institute='Inst',
+            ))
+        submit_ballot(self.event, voters[0], [(b, 2), (c, 1)])
+        submit_ballot(self.event, voters[1], [(c, 1), (d, 2)])
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            ranking = self.client.get(f'/api/event/{self.event.id}/abstracts/ranking').json()
+        self.assertEqual(
+            [(row['id'], row['rank'], row['votes'], row['score']) for row in ranking],
+            [(c, 1, 2, 2), (b, 2, 1, 2), (d, 2, 1, 2), (a, 4, 0, 0)],
+        )
+        self.assertEqual(ranking[0]['presenter'], 'Re Viewer')
+        self.assertEqual(sum('"main_abstract"' in q['sql'] for q in ctx.captured_queries), 1)
+        self.client.force_login(self.reviewer)
+        self.assertEqual(self.client.get(f'/api/event/{self.event.id}/abstracts/ranking').status_code, 403)
+
+
+class QuestionEditorTests(EventTestCase):
+    def setUp(self):
+        self.questions = [
+            CustomQuestion.objects.create(event=self.event, question={'type': 'text', 'question': f'Q{i}'}, order=i)
+            for i in range(3)
+        ]
+
+    def add_answers(self, count):
+        for i in range(count):
+            attendee = Attendee.objects.create(
+                event=self.event, first_name='A', last_name=str(i), nationality=1, institute='Inst',
+            )
+            CustomAnswer.objects.bulk_create([
+                CustomAnswer(reference=q, attendee=attendee, question=q.question['question'], answer='x')
+                for q in self.questions
+            ])
+
+    def edit(self):
+        q0, q1, q2 = self.questions
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/event/{self.event.id}/questions', {'questions': [
+                {'id': q1.id, 'question': {'type': 'text', 'question': 'Renamed'}},
+                {'id': -1, 'question': {'type': 'text', 'question': 'New'}},
+                {'id': q0.id, 'question': q0.question},
+            ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_edit_applies_diff(self):
+        self.add_answers(2)
+        self.edit()
+        q0, q1, q2 = self.questions
+        self.assertEqual(
+            list(self.event.custom_questions.values_list('question__question', 'order')),
+            [('Renamed', 0), ('New', 1), ('Q0', 2)],
+        )
+        self.assertEqual(set(CustomAnswer.objects.filter(reference=q1).values_list('question', flat=True)), {'Renamed'})
+        self.assertEqual(set(CustomAnswer.objects.filter(reference=q0).values_list('question', flat=True)), {'Q0'})
+        # Answers to a deleted question are kept, detached
+        self.assertEqual(CustomAnswer.objects.filter(reference__isnull=True, question='Q2').count(), 2)
+
+    def test_query_count_does_not_grow_with_answers(self):
+        self.add_answers(2)
+        few = self.edit()
+        self.setUp()
+        self.add_answers(30)
+        self.assertEqual(self.edit(), few)
+
+    def test_foreign_question_is_rejected(self):
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        foreign = CustomQuestion.objects.create(event=other, question={'type': 'text', 'question': 'F'})
+        self.client.force_login(self.admin)
+        response = self.client.post(f'/api/event/{self.event.id}/questions', {'questions': [
+            {'id': foreign.id, 'question': {'type': 'text', 'question': 'Hijacked'}},
+        ]}, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['code']), (400, 'not_found'))
+        self.assertEqual(self.event.custom_questions.count(), 3)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.question['question'], 'F')
+
+
+class AnswerUpsertTests(EventTestCase):
+    def setUp(self):
+        self.questions = [
+            CustomQuestion.objects.create(event=self.event, question={'type': 'text', 'question': f'Q{i}'}, order=i)
+            for i in range(3)
+        ]
+        self.attendee = self.reviewer_attendee
+
+    def post_answers(self, answers):
+        self.client.force_login(self.admin)
+        return self.client.post(
+            f'/api/event/{self.event.id}/attendee/{self.attendee.id}/answers', {'answers': answers},
+            content_type='application/json',
+        )
+
+    def test_staff_edit_preserves_row_identity(self):
+        q0, q1, q2 = self.questions
+        upsert_answers(self.attendee, registration_answers(self.questions, {str(q.id): 'old' for q in self.questions}))
+        ids = dict(self.attendee.custom_answers.values_list('reference_id', 'id'))
+        response = self.post_answers([
+                {'reference_id': q0.id, 'answer': 'new'},
+                {'reference_id': q1.id, 'answer': 'old'},
+                {'reference_id': None, 'question': 'Note', 'answer': 'free text'},
+            ])
+        self.assertEqual(response.status_code, 200)
+        rows = {a.reference_id: a for a in self.attendee.custom_answers.all()}
+        self.assertEqual(rows[q0.id].id, ids[q0.id])
+        self.assertEqual(rows[q0.id].answer, 'new')
+        self.assertEqual(rows[q1.id].id, ids[q1.id])
+        self.assertNotIn(q2.id, rows)
+        self.assertEqual((rows[None].question, rows[None].answer), ('Note', 'free text'))
+
+    def test_query_count_does_not_grow_with_answers(self):
+        upsert_answers(self.attendee, [{'reference_id': None, 'question': 'Note 0', 'answer': 'y'}])
+        # validation, upsert, detached lookup and insert, replace (lookup, choices, answers), and the
+        # savepoint and its release inside the test's transaction
+        for questions in (self.questions[:1], self.questions):
+            with self.subTest(answers=len(questions)), self.assertNumQueries(9):
+                upsert_answers(self.attendee, [
+                    *registration_answers(questions, {str(q.id): 'x' for q in questions}),
+                    {'reference_id': None, 'question': f'Note {len(questions)}', 'answer': 'y'},
+                ], replace=True)
+
+    def test_invalid_references_are_rejected(self):
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        foreign = CustomQuestion.objects.create(event=other, question={'type': 'text', 'question': 'F'})
+        q0 = self.questions[0]
+        for answers, code in [
+            ([{'reference_id': q0.id, 'answer': 'a'}, {'reference_id': q0.id, 'answer': 'b'}], 'duplicated_references'),
+            ([{'reference_id': foreign.id, 'answer': 'a'}], 'invalid_reference'),
+        ]:
+            with self.subTest(code=code):
+                response = self.post_answers(answers)
+                self.assertEqual((response.status_code, response.json()['code']), (400, code))
+        self.assertFalse(CustomAnswer.objects.exists())
+
+    def test_registration_answers(self):
+        checkbox = CustomQuestion.objects.create(
+            event=self.event, question={'type': 'checkbox', 'question': 'Days', 'options': ['Mon', 'Tue']},
+        )
+        answers = registration_answers([self.questions[0], checkbox], {
+            str(self.questions[0].id): 'Text', f'{checkbox.id}_0': True, f'{checkbox.id}_1': False,
+        })
+        self.assertEqual(answers, [
+            {'reference_id': self.questions[0].id, 'answer': 'Text'},
+            {'reference_id': checkbox.id, 'answer': '- Mon: True\n- Tue: False'},
+        ])
+
+
+class AnswerAnalyticsTests(EventTestCase):
+    def setUp(self):
+        self.menu = CustomQuestion.objects.create(
+            event=self.event, question={'type': 'select', 'question': 'Menu', 'options': ['Meat', 'Vegetarian']},
+        )
+        self.days = CustomQuestion.objects.create(
+            event=self.event, question={'type': 'checkbox', 'question': 'Days', 'options': ['Mon', 'Tue']},
+        )
+        self.note = CustomQuestion.objects.create(event=self.event, question={'type': 'text', 'question': 'Note'})
+        self.attendees = [self.reviewer_attendee] + [
+            Attendee.objects.create(event=self.event, first_name=f'A{i}', last_name='B', nationality=1, institute='I')
+            for i in range(2)
+        ]
+        questions = [self.menu, self.days, self.note]
+        for attendee, menu, mon, tue in zip(self.attendees, ['Meat', 'Vegetarian', 'Vegetarian'], [True, 'true', False], [True, False, 'false']):
+            upsert_answers(attendee, registration_answers(questions, {
+                str(self.menu.id): menu, f'{self.days.id}_0': mon, f'{self.days.id}_1': tue, str(self.note.id): 'x',
+            }), questions=questions)
+
+    def get_analytics(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/api/event/{self.event.id}/questions/analytics')
+        self.assertEqual(response.status_code, 200)
+        return {q['question']: (q['responses'], {o['option']: o['count'] for o in q['options']}) for q in response.json()}
+
+    def test_counts_options_of_select_and_checkbox_questions(self):
+        self.assertEqual(self.get_analytics(), {
+            'Menu': (3, {'Meat': 1, 'Vegetarian': 2}),
+            'Days': (3, {'Mon': 2, 'Tue': 1}),
+        })
+
+    def test_cached_counts_follow_answer_changes(self):
+        self.get_analytics()
+        with self.assertNumQueries(1):  # the shared cache entry
+            get_answer_analytics(self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_answers(self.attendees[0], [
+                {'reference_id': self.menu.id, 'answer': 'Vegetarian'},
+                {'reference_id': self.days.id, 'answer': '- Mon: False\n- Tue: False'},
+            ])
+        self.assertEqual(self.get_analytics(), {
+            'Menu': (3, {'Meat': 0, 'Vegetarian': 3}),
+            'Days': (3, {'Mon': 1, 'Tue': 0}),
+        })
+        self.attendees[1].delete()
+        self.assertEqual(self.get_analytics()['Menu'], (2, {'Meat': 0, 'Vegetarian': 2}))
+
+    def test_changed_options_are_recounted(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/event/{self.event.id}/questions', {'questions': [
+                {'id': self.menu.id, 'question': {'type': 'checkbox', 'question': 'Menu', 'options': ['Meat', 'Vegetarian']}},
+                {'id': self.days.id, 'question': self.days.question},
+            ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # Select answers are not in checkbox format, so nothing is picked any more
+        self.assertEqual(self.get_analytics()['Menu'], (3, {'Meat': 0, 'Vegetarian': 0}))
+        self.assertEqual(AnswerChoice.objects.filter(question=self.days).count(), 3)
+
+    def test_repeated_options_are_counted_once(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(f'/api/event/{self.event.id}/questions', {'questions': [
+            {'id': self.menu.id, 'question': {**self.menu.question, 'options': ['Meat', 'Vegetarian', 'Meat']}},
+            {'id': self.days.id, 'question': {**self.days.question, 'options': ['Mon', 'Tue', 'Mon']}},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        upsert_answers(self.attendees[2], [{'reference_id': self.days.id, 'answer': '- Mon: True\n- Tue: False\n- Mon: True'}])
+        self.assertEqual(self.get_analytics(), {
+            'Menu': (3, {'Meat': 1, 'Vegetarian': 2}),
+            'Days': (3, {'Mon': 3, 'Tue': 1}),
+        })
+
+    def test_requires_event_staff(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(f'/api/event/{self.event.id}/questions/analytics')
+        self.assertEqual(response.status_code, 403)
+
+
+def toss_response(status=200, **data):
+    response = mock.Mock(ok=status < 400, status_code=status)
+    response.json.return_value = data
+    return response
+
+
+@override_settings(TOSS_SECRET_KEY='test_sk')
+class CardReceiptTests(EventTestCase):
+    def setUp(self):
+        self.payment = PaymentHistory.objects.create(
+            event=self.event, attendee=self.reviewer_attendee, amount=10000, payment_type='카드', toss_order_id='order-1',
+        )
+        self.client.force_login(self.reviewer)
+        self.url = '/api/payment/order-1/card-receipt'
+
+    def test_stored_receipt_skips_toss(self):
+        PaymentHistory.objects.filter(id=self.payment.id).update(receipt_url='https://receipt.example.com/1')
+        with mock.patch('main.payments.requests.get') as toss:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json(), {'code': 'success', 'receipt_url': 'https://receipt.example.com/1'})
+        toss.assert_not_called()
+
+    def test_missing_receipt_is_fetched_once(self):
+        with mock.patch('main.payments.requests.get', return_value=toss_response(receipt={'url': 'https://receipt.example.com/1'})) as toss:
+            for _ in range(2):
+                response = self.client.get(self.url)
+                self.assertEqual(response.json(), {'code': 'success', 'receipt_url': 'https://receipt.example.com/1'})
+        toss.assert_called_once()
+        self.assertEqual(toss.call_args.args, (f'{settings.TOSS_API_URL}/payments/orders/order-1',))
+        self.assertEqual(toss.call_args.kwargs['headers']['Authorization'], f'Basic {base64.b64encode(b"test_sk:").decode()}')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.receipt_url, 'https://receipt.example.com/1')
+
+    def test_toss_failures(self):
+        for result, status, code in [
+            (requests.ConnectionError('down'), 500, 'api_error'),
+            (toss_response(404, code='NOT_FOUND_PAYMENT', message='Not found'), 400, 'NOT_FOUND_PAYMENT'),
+            (toss_response(receipt=None), 404, 'no_receipt'),
+        ]:
+            with self.subTest(code=code), mock.patch('main.payments.requests.get', side_effect=[result]):
+                response = self.client.get(self.url)
+                self.assertEqual((response.status_code, response.json()['code']), (status, code))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.receipt_url, '')
+        with override_settings(TOSS_SECRET_KEY=''):
+            self.assertEqual(self.client.get(self.url).json()['code'], 'config_error')
+
+    def test_only_own_card_payments(self):
+        PaymentHistory.objects.filter(id=self.payment.id).update(payment_type='계좌이체')
+        self.assertEqual(self.client.get(self.url).json()['code'], 'not_card')
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(TOSS_SECRET_KEY='test_sk')
+class BackfillCardReceiptsTests(EventTestCase):
+    def setUp(self):
+        def payment(order_id, **fields):
+            return PaymentHistory.objects.create(
+                event=self.event, amount=10000, payment_type=fields.pop('payment_type', '카드'), toss_order_id=order_id, **fields,
+            )
+        self.missing = [payment(f'order-{i}') for i in range(5)]
+        self.others = [
+            payment('order-stored', receipt_url='https://receipt.example.com/stored'),
+            payment('order-transfer', payment_type='계좌이체'),
+            payment(None),
+            payment(''),
+        ]
+
+    def toss(self, url, **kwargs):
+        order_id = url.rsplit('/', 1)[1]
+        if order_id == 'order-3':
+            return toss_response(404, code='NOT_FOUND_PAYMENT')
+        if order_id == 'order-4':
+            raise requests.Timeout('timed out')
+        return toss_response(receipt={'url': f'https://receipt.example.com/{order_id}'})
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        with mock.patch('main.payments.requests.get', side_effect=self.toss) as toss:
+            call_command('backfill_card_receipts', *args, stdout=out)
+        requested = sorted(call.args[0].rsplit('/', 1)[1] for call in toss.call_args_list)
+        receipts = dict(PaymentHistory.objects.exclude(receipt_url='').values_list('toss_order_id', 'receipt_url'))
+        return requested, receipts, out.getvalue()
+
+    def test_fills_missing_receipts(self):
+        requested, receipts, out = self.backfill('--concurrency', '2')
+        self.assertEqual(requested, [f'order-{i}' for i in range(5)])
+        self.assertEqual(receipts, {
+            'order-stored': 'https://receipt.example.com/stored',
+            **{f'order-{i}': f'https://receipt.example.com/order-{i}' for i in range(3)},
+        })
+        self.assertIn('Filled 3 receipts (2 failed)', out)
+        self.assertIn('order-3: HTTP 404', out)
+        self.assertIn('order-4: timed out', out)
+        # Only what is still missing is requested again
+        self.assertEqual(self.backfill()[0], ['order-3', 'order-4'])
+
+    def test_limit_takes_the_oldest_payments(self):
+        requested, receipts, _ = self.backfill('--limit', '2')
+        self.assertEqual(requested, ['order-0', 'order-1'])
+        self.assertEqual(len(receipts), 3)
+
+    def test_dry_run_saves_nothing(self):
+        requested, receipts, out = self.backfill('--dry-run')
+        self.assertEqual(len(requested), 5)
+        self.assertEqual(receipts, {'order-stored': 'https://receipt.example.com/stored'})
+        self.assertIn('Would fill 3 receipts (2 failed)', out)
+
+    def test_requires_secret_key(self):
+        with override_settings(TOSS_SECRET_KEY=''), self.assertRaisesMessage(CommandError, 'TOSS_SECRET_KEY'):
+            call_command('backfill_card_receipts', stdout=io.StringIO())
+
+
+class PaymentReportTests(EventTestCase):
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.card = self.payment(10000, datetime(2026, 1, 5, 3, tzinfo=dt_timezone.utc), payment_type='카드', toss_order_id='order-1')
+        # 2026-02-01 01:00 in the business timezone (Asia/Seoul)
+        self.manual = self.payment(22000, datetime(2026, 1, 31, 16, tzinfo=dt_timezone.utc), payment_type='직접입력', note='Paid at the desk')
+        ManualTransaction.objects.create(
+            payment=self.manual, payment_type='card', supply_amount=20000, vat=2000, card_type='신한카드', approval_number='123',
+        )
+        self.cancelled = self.payment(5000, datetime(2026, 2, 3, tzinfo=dt_timezone.utc), status='cancelled', payment_type='카드')
+
+    def payment(self, amount, created_at, **fields):
+        payment = PaymentHistory.objects.create(
+            event=self.event, attendee=self.reviewer_attendee, amount=amount, event_name=self.event.name,
+            attendee_first_name='Re', attendee_last_name='Viewer', attendee_email='reviewer@example.com', **fields,
+        )
+        PaymentHistory.objects.filter(id=payment.id).update(created_at=created_at)
+        return payment
+
+    def test_summary_aggregates(self):
+        response = self.client.get(f'/api/event/{self.event.id}/payments/summary')
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(
+            {key: summary[key] for key in ('count', 'completed_count', 'completed_amount', 'cancelled_amount', 'supply_amount', 'vat')},
+            {'count': 3, 'completed_count': 2, 'completed_amount': 32000, 'cancelled_amount': 5000, 'supply_amount': 20000, 'vat': 2000},
+        )
+        buckets = lambda name: [(b['key'], b['count'], b['amount']) for b in summary[name]]
+        self.assertEqual(buckets('by_status'), [('cancelled', 1, 5000), ('completed', 2, 32000)])
+        self.assertEqual(buckets('by_payment_type'), [('직접입력', 1, 22000), ('카드', 1, 10000)])
+        self.assertEqual(buckets('by_month'), [('2026-01', 1, 10000), ('2026-02', 1, 22000)])
+        self.assertEqual(summary['by_manual_payment_type'], [
+            {'key': 'card', 'count': 1, 'amount': 22000, 'supply_amount': 20000, 'vat': 2000},
+        ])
+
+        # Dates are whole days in the business timezone
+        summary = self.client.get(f'/api/event/{self.event.id}/payments/summary', {'start_date': '2026-02-01'}).json()
+        self.assertEqual((summary['count'], summary['completed_amount']), (2, 22000))
+        summary = self.client.get(f'/api/event/{self.event.id}/payments/summary', {'end_date': '2026-01-31'}).json()
+        self.assertEqual((summary['count'], summary['completed_amount']), (1, 10000))
+
+    def test_cached_summary_follows_payment_changes(self):
+        self.assertEqual(get_payment_summary([self.event.id])['completed_amount'], 32000)
+        with self.assertNumQueries(2):  # version and summary from the shared cache
+            get_payment_summary([self.event.id])
+
+        self.payment(1000, datetime(2026, 2, 5, tzinfo=dt_timezone.utc))
+        self.assertEqual(get_payment_summary([self.event.id])['completed_amount'], 33000)
+        self.manual.manual_transaction.vat = 2200
+        self.manual.manual_transaction.save()
+        self.assertEqual(get_payment_summary([self.event.id])['vat'], 2200)
+
+        # Bulk updates send no post_save; the queryset invalidates the summaries itself
+        PaymentHistory.objects.filter(id=self.cancelled.id).update(status='completed')
+        self.assertEqual(get_payment_summary([self.event.id])['completed_amount'], 38000)
+
+        # The version lives in the database, so a change made by another process (its own cache
+        # connection) invalidates this one's summaries too
+        from django.db.models import QuerySet
+        QuerySet(PaymentHistory).filter(id=self.card.id).update(amount=11000)
+        self.assertEqual(get_payment_summary([self.event.id])['completed_amount'], 38000)
+        caches.create_connection(REPORT_CACHE).set(REPORT_CACHE_VERSION_KEY, 'other-process', None)
+        self.assertEqual(get_payment_summary([self.event.id])['completed_amount'], 39000)
+
+        # A receipt URL changes nothing the reports show, so it keeps them
+        from main.payments import save_receipt_url
+        save_receipt_url(self.card, 'https://receipt.example.com/card')
+        self.assertEqual(caches[REPORT_CACHE].get(REPORT_CACHE_VERSION_KEY), 'other-process')
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.receipt_url, 'https://receipt.example.com/card')
+
+        # Deleting the event detaches its payments with a bulk update
+        self.assertEqual(get_payment_summary([self.event.id])['count'], 4)
+        self.event.delete()
+        self.assertEqual(get_payment_summary([self.event.id])['count'], 0)
+
+    def test_csv_export(self):
+        response = self.client.get(f'/api/event/{self.event.id}/payments/export', {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="payments_event_{self.event.id}.csv"')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        header, *rows = csv.reader(io.StringIO(content[1:]))
+        self.assertEqual(header, [title for _, title in LEDGER_COLUMNS])
+        rows = [dict(zip((key for key, _ in LEDGER_COLUMNS), row)) for row in rows]
+        self.assertEqual([row['id'] for row in rows], [str(p.id) for p in (self.card, self.manual, self.cancelled)])
+        self.assertEqual(rows[0]['number'], 'order-1')
+        self.assertEqual(rows[1]['number'], str(self.manual.id))
+        self.assertEqual(rows[1]['created_at'], '2026-02-01 01:00:00')
+        self.assertEqual(
+            [rows[1][key] for key in ('manual_payment_type', 'supply_amount', 'vat', 'card_type', 'attendee_name', 'note')],
+            ['card', '20000', '2000', '신한카드', 'Re Viewer', 'Paid at the desk'],
+        )
+
+    def test_xlsx_writer(self):
+        fileobj = io.BytesIO()
+        write_xlsx(iter([[1, 'a < b & c'], [2, 'control\x01character']]), ['ID', 'Text'], fileobj)
+        with zipfile.ZipFile(fileobj) as zf:
+            self.assertEqual(zf.namelist(), [
+                '[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels', 'xl/worksheets/sheet1.xml',
+            ])
+            sheet = ET.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        ns = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = [
+            [(cell.get('t'), ''.join(cell.itertext())) for cell in row.findall('s:c', ns)]
+            for row in sheet.findall('s:sheetData/s:row', ns)
+        ]
+        self.assertEqual(rows, [
+            [('inlineStr', 'ID'), ('inlineStr', 'Text')],
+            [('n', '1'), ('inlineStr', 'a < b & c')],
+            [('n', '2'), ('inlineStr', 'controlcharacter')],
+        ])
+
+    def test_xlsx_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/admin/payments/export', {'format': 'xlsx', 'event_ids': str(self.event.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="payments.xlsx"', response['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+            sheet = ET.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        self.assertEqual(len(sheet.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}row')), 4)
+
+    def test_unknown_format_is_rejected(self):
+        self.client.force_login(self.staff)
+        for path in (f'/api/event/{self.event.id}/payments/export', '/api/admin/payments/export'):
+            with self.subTest(path=path):
+                response = self.client.get(path, {'format': 'pdf'})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['code'], 'invalid_format')
+
+
+class EventCountersTests(EventTestCase):
+    def counters(self):
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(5):  # session, user, event, admin check, counters
+            response = self.client.get(f'/api/event/{self.event.id}/stats')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_changes(self):
+        self.event.registration_fee = 10000
+        self.event.save()
+        attendee = Attendee.objects.create(event=self.event, first_name='A', last_name='B', nationality=1, institute='I')
+        payment = PaymentHistory.objects.create(attendee=attendee, event=self.event, amount=10000, status='completed')
+        PaymentHistory.objects.create(attendee=attendee, event=self.event, amount=10000, status='completed')
+        self.client.force_login(self.admin)
+        self.client.post(
+            f'/api/event/{self.event.id}/attendee/{attendee.id}/update', {'is_attended': True},
+            content_type='application/json',
+        )
+        OnSiteAttendee.objects.create(event=self.event, name='On Site', institute='I', is_confirmed=True)
+        abstract = Abstract.objects.create(attendee=attendee, event=self.event, title='T', file_path='x', wants_short_talk=True)
+        stats = self.counters()
+        self.assertEqual(
+            {key: stats[key] for key in ('registered', 'paid', 'pending', 'attended', 'onsite', 'onsite_confirmed')},
+            {'registered': 2, 'paid': 1, 'pending': 1, 'attended': 1, 'onsite': 1, 'onsite_confirmed': 1},
+        )
+        self.assertEqual(
+            {key: stats[key] for key in ('abstracts', 'speaker_abstracts', 'poster_abstracts', 'short_talk_requests')},
+            {'abstracts': 2, 'speaker_abstracts': 0, 'poster_abstracts': 2, 'short_talk_requests': 1},
+        )
+
+        abstract.type = 'speaker'
+        abstract.save()
+        payment.status = 'cancelled'
+        payment.save()
+        self.assertEqual(
+            [self.counters()[key] for key in ('paid', 'speaker_abstracts', 'poster_abstracts', 'short_talk_requests')],
+            [1, 1, 1, 0],
+        )
+        # Deleting the attendee cascades to their abstract and detaches their payments
+        Attendee.objects.filter(id=attendee.id).delete()
+        stats = self.counters()
+        self.assertEqual(
+            [stats[key] for key in ('registered', 'paid', 'attended', 'abstracts')], [1, 0, 0, 1],
+        )
+        self.assertEqual(reconcile_counters([self.event.id]), [])
+
+    def test_saves_of_deferred_instances_keep_counts(self):
+        attendee = Attendee.objects.create(
+            event=self.event, first_name='A', last_name='B', nationality=1, institute='I', is_attended=True,
+        )
+        PaymentHistory.objects.create(attendee=attendee, event=self.event, amount=10000, status='completed')
+        expected = {'registered': 2, 'paid': 1, 'attended': 1}
+
+        deferred = Attendee.objects.only('id', 'institute').get(id=attendee.id)
+        deferred.institute = 'Other'
+        deferred.save()
+        deferred = Attendee.objects.only('id', 'institute').get(id=attendee.id)
+        deferred.save(update_fields=['institute'])
+        payment = PaymentHistory.objects.only('id', 'amount').get(attendee=attendee)
+        payment.amount = 12000
+        payment.save()
+        stats = self.counters()
+        self.assertEqual({key: stats[key] for key in expected}, expected)
+        self.assertEqual(reconcile_counters([self.event.id]), [])
+
+    def test_reconciliation_repairs_drift(self):
+        Attendee.objects.bulk_create([
+            Attendee(
+                event=self.event, attendee_nametag_id=10 + i, first_name='A', last_name=str(i), nationality=1,
+                institute='I', is_attended=True,
+            )
+            for i in range(3)
+        ])
+        EventCounters.objects.filter(event=self.event).delete()
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        EventCounters.objects.filter(event=other).update(registered=5)
+        self.assertEqual(reconcile_counters(), [other.id])
+        self.assertEqual(
+            list(EventCounters.objects.order_by('event_id').values_list('event_id', 'registered', 'attended')),
+            [(self.event.id, 4, 3), (other.id, 0, 0)],
+        )
+        self.assertIsNotNone(self.counters()['reconciled_at'])
+
+    def test_reconciliation_locks_only_drifted_events(self):
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        EventCounters.objects.filter(event=other).update(registered=5)
+        reconciled = EventCounters.objects.get(event=self.event).reconciled_at
+        with mock.patch('main.counters._correct', wraps=_correct) as correct:
+            self.assertEqual(reconcile_counters(), [other.id])
+        self.assertEqual([c.args[0] for c in correct.call_args_list], [other.id])
+        self.assertNotEqual(EventCounters.objects.get(event=self.event).reconciled_at, reconciled)
+
+
+class CheckInTests(EventTestCase):
+    def setUp(self):
+        self.attendees = [self.reviewer_attendee] + [
+            Attendee.objects.create(event=self.event, first_name=f'A{i}', last_name='B', nationality=1, institute='I')
+            for i in range(4)
+        ]
+        self.onsite = OnSiteAttendee.objects.create(event=self.event, name='On Site', institute='I')
+        self.client.force_login(self.admin)
+
+    def post_checkin(self, items, attended=True):
+        return self.client.post(
+            f'/api/event/{self.event.id}/checkin', {'items': items, 'attended': attended},
+            content_type='application/json',
+        )
+
+    def test_batch_check_in(self):
+        tokens = {
+            (t['kind'], t['nametag_id']): t['token']
+            for t in self.client.get(f'/api/event/{self.event.id}/checkin/tokens').json()
+        }
+        other = Event.objects.create(
+            name='Other', start_date=date(2026, 2, 1), end_date=date(2026, 2, 2), venue='Venue', capacity=0,
+        )
+        first, second = self.attendees[0].attendee_nametag_id, self.attendees[1].attendee_nametag_id
+        response = self.post_checkin([
+            {'nametag_id': first},
+            {'token': tokens['attendee', second]},
+            {'nametag_id': first},
+            {'token': tokens['onsite', self.onsite.onsiteattendee_nametag_id]},
+            {'nametag_id': 999},
+            {'token': checkin_token('attendee', other.id, first)},
+            {'token': tokens['attendee', first][:-1]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            [(r['kind'], r['status']) for r in body['results']],
+            [('attendee', 'checked_in'), ('attendee', 'checked_in'), ('attendee', 'unchanged'),
+             ('onsite', 'checked_in'), ('attendee', 'not_found'), (None, 'invalid_token'), (None, 'invalid_token')],
+        )
+        self.assertEqual(body['results'][0]['name'], 'Re Viewer')
+        self.assertEqual((body['counters']['attended'], body['counters']['onsite_confirmed']), (2, 1))
+        self.assertEqual(Attendee.objects.filter(event=self.event, is_attended=True).count(), 2)
+
+        response = self.post_checkin([{'nametag_id': first}, {'nametag_id': 999}], attended=False)
+        self.assertEqual([r['status'] for r in response.json()['results']], ['checked_out', 'not_found'])
+        self.assertEqual(response.json()['counters']['attended'], 1)
+        self.assertEqual(reconcile_counters([self.event.id]), [])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        counts = []
+        for attendees in (self.attendees[:1], self.attendees[1:]):
+            with CaptureQueriesContext(connection) as ctx:
+                check_in(self.event, [{'nametag_id': a.attendee_nametag_id} for a in attendees])
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rejects_invalid_batches(self):
+        for items, code in [
+            ([{'nametag_id': 1}] * (MAX_CHECKIN_BATCH + 1), 'too_many'),
+            ([{}], 'invalid_item'),
+        ]:
+            with self.subTest(code=code):
+                response = self.post_checkin(items)
+                self.assertEqual((response.status_code, response.json()['code']), (400, code))
+
+
+class CheckInSyncTests(EventTestCase):
+    def setUp(self):
+        self.attendees = [self.reviewer_attendee] + [
+            Attendee.objects.create(event=self.event, first_name=f'A{i}', last_name='B', nationality=1, institute='I')
+            for i in range(3)
+        ]
+        self.client.force_login(self.admin)
+
+    def get(self, path):
+        response = self.client.get(f'/api/event/{self.event.id}/checkin/{path}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_cursor(self):
+        snapshot = self.get('snapshot')
+        self.assertTrue(snapshot['full'])
+        self.assertEqual(len(snapshot['attendees']), 4)
+        cursor = snapshot['cursor']
+
+        first, second, third = self.attendees[1:]
+        check_in(self.event, [{'nametag_id': first.attendee_nametag_id}])
+        second.first_name = 'Renamed'
+        second.save(update_fields=['first_name'])
+        deleted_id = third.id
+        third.delete()
+        onsite = OnSiteAttendee.objects.create(event=self.event, name='On Site', institute='I')
+
+        changes = self.get(f'changes?cursor={cursor}')
+        self.assertFalse(changes['full'])
+        self.assertEqual(
+            sorted((p['id'], p['name'], p['checked_in']) for p in changes['attendees']),
+            [(first.id, 'A0 B', True), (second.id, 'Renamed B', False)],
+        )
+        self.assertEqual([p['id'] for p in changes['onsite']], [onsite.id])
+        self.assertEqual((changes['deleted_attendees'], changes['deleted_onsite']), ([deleted_id], []))
+
+        unchanged = self.get(f'changes?cursor={changes["cursor"]}')
+        self.assertEqual(unchanged['cursor'], changes['cursor'])
+        self.assertEqual(unchanged['attendees'] + unchanged['onsite'] + unchanged['deleted_attendees'], [])
+        self.assertTrue(self.get(f'changes?cursor={changes["cursor"] + 100}')['full'])
+
+    def test_saves_are_numbered_by_sync(self):
+        attendee = self.attendees[1]
+        check_in(self.event, [{'nametag_id': attendee.attendee_nametag_id}])
+        cursor = self.get('snapshot')['cursor']
+        self.assertFalse(Attendee.objects.filter(event=self.event, change_seq=0).exists())
+
+        # Saving takes no sequence number, so it doesn't wait on the counters row
+        attendee.refresh_from_db()
+        attendee.first_name = 'Renamed'
+        with CaptureQueriesContext(connection) as ctx:
+            attendee.save()
+        self.assertEqual(attendee.change_seq, 0)
+        self.assertFalse([q for q in ctx.captured_queries if 'change_seq' in q['sql'] and 'eventcounters' in q['sql']])
+
+        # Until a sync numbers it, the change still counts as made after any cursor
+        results = check_in(self.event, [{'nametag_id': attendee.attendee_nametag_id}], False, unchanged_since=cursor)
+        self.assertEqual(results[0]['status'], 'conflict')
+        changes = self.get(f'changes?cursor={cursor}')
+        self.assertEqual([(p['id'], p['name']) for p in changes['attendees']], [(attendee.id, 'Renamed B')])
+        attendee.refresh_from_db()
+        self.assertEqual(attendee.change_seq, changes['cursor'])
+        self.assertGreater(changes['cursor'], cursor)
+
+    def test_upload_resolves_conflicts(self):
+        first, second, third = (a.attendee_nametag_id for a in self.attendees[1:])
+        check_in(self.event, [{'nametag_id': first}])
+        cursor = self.get('snapshot')['cursor']
+        # Another desk checks the first attendee out and in again after this desk went offline
+        check_in(self.event, [{'nametag_id': first}], attended=False)
+        check_in(self.event, [{'nametag_id': first}])
+
+        response = self.client.post(f'/api/event/{self.event.id}/checkin/upload', {'cursor': cursor, 'items': [
+            {'nametag_id': second},
+            {'nametag_id': first, 'attended': False},
+            {'nametag_id': second, 'attended': False},
+            {'nametag_id': third},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            [r['status'] for r in body['results']], ['superseded', 'conflict', 'unchanged', 'checked_in'],
+        )
+        self.assertEqual(body['counters']['attended'], 2)
+        self.assertEqual(
+            sorted((p['nametag_id'], p['checked_in']) for p in body['changes']['attendees']),
+            [(first, True), (third, True)],
+        )
+
+
+class AbstractBookTests(EventTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.write(self.abstract, build_docx('Zebra talk', 'Re Viewer', ['Talk body.']))
+        self.abstract.type = 'speaker'
+        self.abstract.title = 'Zebra talk'
+        self.abstract.save()
+        author = Attendee.objects.create(
+            event=self.event, first_name='Ann', last_name='Author', nationality=1, institute='Uni',
+        )
+        for title, short_talk, build in [('Beta poster', False, build_odt), ('Alpha poster', True, build_docx)]:
+            extension = '.odt' if build is build_odt else '.docx'
+            abstract = Abstract.objects.create(
+                attendee=author, event=self.event, title=title, wants_short_talk=short_talk,
+                file_path=f'abstracts/{title}/abstract{extension}',
+            )
+            self.write(abstract, build(title, 'Ann Author', [f'{title} body.']))
+
+    def write(self, abstract, content):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        default_storage.save(abstract.file_path, ContentFile(content))
+
+    def compile(self, format='html', workers=1):
+        book = AbstractBook.objects.create(event=self.event, format=format)
+        compile_book(book.id, workers=workers)
+        book.refresh_from_db()
+        self.assertEqual(book.status, 'completed', book.error)
+        return book
+
+    def read(self, book):
+        from django.core.files.storage import default_storage
+        with default_storage.open(book.file_path) as f:
+            return f.read()
+
+    def test_html_book(self):
+        book = self.compile()
+        self.assertEqual((book.total, book.converted, book.reused), (3, 3, 0))
+        html = self.read(book).decode()
+        # Talks, then posters with short talks, then the other posters
+        positions = [html.index(f'<h3>{title}</h3>') for title in (
+            'T1. Zebra talk', 'S1. Alpha poster', 'P1. Beta poster',
+        )]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('<a href="#abstract-S1">S1. Alpha poster</a>', html)
+        self.assertIn('Beta poster body.', html)
+        self.assertIn(
+            'Ann Author (Uni): <a href="#abstract-S1">S1</a>, <a href="#abstract-P1">P1</a>', html,
+        )
+        self.assertLess(html.index('Ann Author (Uni)'), html.index('Re Viewer (Inst)'))
+
+    def test_renderings_are_reused(self):
+        self.compile()
+        book = self.compile()
+        self.assertEqual((book.total, book.converted, book.reused), (3, 3, 3))
+
+        import os
+        from django.conf import settings
+        with open(os.path.join(settings.MEDIA_ROOT, self.abstract.file_path), 'wb') as f:
+            f.write(build_docx('Zebra talk', 'Re Viewer', ['Revised body, longer.']))
+        book = self.compile()
+        self.assertEqual(book.reused, 2)
+        self.assertIn('Revised body, longer.', self.read(book).decode())
+
+    def test_reviewer_bodies_share_renderings(self):
+        missing = Abstract.objects.create(
+            attendee=self.reviewer_attendee, event=self.event, title='Missing', file_path='abstracts/Missing/abstract.docx',
+        )
+        self.client.force_login(self.reviewer)
+        url = f'/api/event/{self.event.id}/reviewer/abstracts'
+        bodies = {a['id']: a['body'] for a in self.client.get(url).json()}
+        self.assertIn('Talk body.', bodies[self.abstract.id])
+        self.assertIn('error occured', bodies[missing.id])
+        self.assertEqual(AbstractRendering.objects.filter(abstract__event=self.event).count(), 3)
+
+        with mock.patch('main.abstract_book.convert_file') as convert:
+            self.assertEqual({a['id']: a['body'] for a in self.client.get(url).json()}, bodies)
+            self.assertEqual(
+                self.client.get(f'/api/event/{self.event.id}/abstract/{self.abstract.id}').json()['body'],
+                bodies[self.abstract.id],
+            )
+        convert.assert_not_called()
+        missing.delete()
+        self.assertEqual(self.compile().reused, 3)
+
+    def test_docx_book_with_process_pool(self):
+        import io
+        import docx
+        book = self.compile('docx', workers=2)
+        self.assertEqual(AbstractRendering.objects.filter(abstract__event=self.event).count(), 3)
+        text = [p.text for p in docx.Document(io.BytesIO(self.read(book))).paragraphs]
+        self.assertIn('T1. Zebra talk', text)
+        self.assertIn('Alpha poster body.', text)
+        self.assertIn('Re Viewer (Inst): T1', text)
+
+    def test_process_pool_in_prefork_worker(self):
+        import billiard
+        from django.conf import settings
+        paths = [(a.id, os.path.join(settings.MEDIA_ROOT, a.file_path)) for a in self.event.abstracts.all()]
+        paths.append((0, os.path.join(settings.MEDIA_ROOT, 'abstracts/missing.docx')))
+        with billiard.Pool(1) as worker:
+            result = dict(worker.apply(convert_in_worker, (paths,)))
+        self.assertEqual(result.pop(0), CONVERSION_ERROR)
+        self.assertIn('Talk body.', result[self.abstract.id])
+        self.assertEqual(len(result), 3)
+
+    def test_endpoint(self):
+        from backend.celery import app as celery_app
+        self.client.force_login(self.admin)
+        url = f'/api/event/{self.event.id}/abstract_book'
+        self.assertEqual(
+            self.client.post(url, {'format': 'pdf'}, content_type='application/json').json()['code'],
+            'invalid_format',
+        )
+        celery_app.conf.task_always_eager = True
+        try:
+            response = self.client.post(url, {'format': 'html'}, content_type='application/json')
+        finally:
+            celery_app.conf.task_always_eager = False
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertTrue(response.json()['link'].endswith('/abstract-book.html'))
+        books = self.client.get(f'/api/event/{self.event.id}/abstract_books').json()
+        self.assertEqual([b['id'] for b in books], [response.json()['id']])
+
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(f'/api/event/{self.event.id}/abstract_books').status_code, 403)
+
+
+class ConverterTests(TestCase):
+    DOCX_STYLES = (
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:rPr><w:i/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Body"><w:pPr><w:jc w:val="right"/></w:pPr></w:style>'
+        '<w:style w:styleId="Untyped"><w:rPr><w:b/></w:rPr></w:style>'
+        '<w:style w:type="character" w:styleId="Shared"><w:rPr><w:b/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Shared"><w:rPr><w:u w:val="single"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Under"><w:basedOn w:val="Normal"/><w:pPr><w:jc w:val="center"/></w:pPr>'
+        '<w:rPr><w:u w:val="wave"/><w:vertAlign w:val="subscript"/></w:rPr></w:style>'
+    )
+    DOCX_BODY = (
+        '<w:p><w:r><w:t>Default &amp; &lt;style&gt;</w:t></w:r></w:p>'
+        '<w:p><w:pPr><w:pStyle w:val="Untyped"/></w:pPr><w:r><w:t>Untyped</w:t></w:r></w:p>'
+        '<w:p><w:pPr><w:pStyle w:val="Shared"/></w:pPr><w:r><w:t>Shared</w:t></w:r></w:p>'
+        '<w:p><w:pPr><w:pStyle w:val="Under"/><w:jc w:val="distribute"/></w:pPr>'
+        '<w:r><w:rPr><w:u/><w:b w:val="off"/></w:rPr><w:t>inherits</w:t></w:r>'
+        '<w:r><w:rPr><w:u w:val="none"/><w:vertAlign w:val="baseline"/></w:rPr><w:t xml:space="preserve"> plain </w:t></w:r>'
+        '<w:r><w:t> </w:t><w:br w:type="page"/><w:cr/><w:ptab w:relativeTo="margin" w:alignment="right" w:leader="none"/>'
+        '<w:noBreakHyphen/><w:tab/><w:br/></w:r>'
+        '<w:r><w:rPr><w:b/></w:rPr></w:r>'
+        '<w:ins w:id="1" w:author="A" w:date="2020-01-01T00:00:00Z"><w:r><w:t>inserted</w:t></w:r></w:ins>'
+        '<w:hyperlink w:history="1"><w:r><w:rPr><w:i w:val="0"/></w:rPr><w:t>link</w:t></w:r></w:hyperlink>'
+        '</w:p>'
+        '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>In a table</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+        '<w:p/>'
+        '<w:sectPr/>'
+    )
+    DOCX_HTML = (
+        '<p class="docx_paragraphs" style="text-align: right;">Default &amp; &lt;style&gt;</p>'
+        '<p class="docx_paragraphs" style="text-align: right;">Untyped</p>'
+        '<p class="docx_paragraphs" style="text-align: right;">Shared</p>'
+        '<p class="docx_paragraphs" style="text-align: DISTRIBUTE (4);"><sub><u>inherits</u></sub> plain '
+        '<sub><u> \n\t-\t\n</u></sub><sub><u><b></b></u></sub><sub><u>link</u></sub></p>'
+        '<p class="docx_paragraphs" style="text-align: right;"></p>'
+    )
+    ODT_STYLES = (
+        '<style:style style:name="Standard" style:family="paragraph">'
+        '<style:paragraph-properties fo:text-align="start"/></style:style>'
+        '<style:style style:name="Heading" style:family="paragraph" style:parent-style-name="Standard">'
+        '<style:text-properties fo:font-weight="bold" style:text-position="super 58%"/></style:style>'
+        '<style:style style:name="Shared" style:family="paragraph" style:parent-style-name="Heading">'
+        '<style:paragraph-properties fo:text-align="center"/></style:style>'
+    )
+    ODT_AUTOMATIC_STYLES = (
+        '<style:style style:name="Shared" style:family="paragraph">'
+        '<style:text-properties fo:font-style="italic"/></style:style>'
+        '<style:style style:name="P1" style:family="paragraph" style:parent-style-name="P2">'
+        '<style:text-properties style:text-underline-style="solid"/></style:style>'
+        '<style:style style:name="P2" style:family="paragraph" style:parent-style-name="Heading"/>'
+        '<style:style style:name="T1" style:family="text">'
+        '<style:text-properties style:text-position="sub 58%" fo:font-weight="normal"/></style:style>'
+    )
+    ODT_TEXT = (
+        '<text:p text:style-name="P1">Lead <text:span text:style-name="T1">sub</text:span> tail &amp; more'
+        '<text:span text:style-name="Heading"> </text:span><text:span/><text:s text:c="3"/>  '
+        '<text:a xlink:href="https://example.com">link</text:a> after<text:line-break/>'
+        '<text:span>Note<text:note><text:note-body><text:p text:style-name="Shared">Nested '
+        '<text:span text:style-name="T1">x</text:span></text:p></text:note-body></text:note>ref</text:span></text:p>'
+        '<text:p text:style-name="Shared">Shared<text:p>Direct child</text:p>tail</text:p>'
+        '<text:h text:outline-level="1">Heading is skipped</text:h>'
+        '<table:table xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"><table:table-row>'
+        '<table:table-cell><text:p text:style-name="Standard">Cell</text:p></table:table-cell>'
+        '</table:table-row></table:table>'
+        '<text:p text:style-name="Missing">   </text:p>'
+        '<text:p text:style-name="P2">P2</text:p>'
+    )
+    ODT_HTML = (
+        '<p class="odt_paragraphs" style="text-align: start;"><b><u><sup>Lead </sup></u></b><u><sub>sub</sub></u>'
+        '<b><u><sup> tail &amp; more</sup></u></b><b><u><sup> </sup></u></b><b><u><sup></sup></u></b>'
+        '<b><u><sup>link</sup></u></b><b><u><sup> after</sup></u></b><br/><b><u><sup>Note</sup></u></b></p>'
+        '<p class="odt_paragraphs" style="text-align: start;"><b><i><sup>Nested </sup></i></b><i><sub>x</sub></i></p>'
+        '<p class="odt_paragraphs" style="text-align: start;"><b><i><sup>Shared</sup></i></b>'
+        '<b><i><sup>Direct child</sup></i></b><b><i><sup>tail</sup></i></b></p>'
+        '<p class="odt_paragraphs" style="text-align: left;">Direct child</p>'
+        '<p class="odt_paragraphs" style="text-align: start;">Cell</p>'
+        '<p class="odt_paragraphs" style="text-align: left;"></p>'
+        '<p class="odt_paragraphs" style="text-align: start;"><b><sup>P2</sup></b></p>'
+    )
+
+    def convert(self, converter, extension, content):
+        with tempfile.NamedTemporaryFile(suffix=extension) as f:
+            f.write(content)
+            f.flush()
+            return converter(f.name)
+
+    def test_golden_docx(self):
+        for styles, html in [(self.DOCX_STYLES, self.DOCX_HTML), (None, None)]:
+            content = docx_package(self.DOCX_BODY, styles)
+            expected = self.convert(legacy_docx_to_html, '.docx', content)
+            if html is not None:
+                self.assertEqual(expected, html)
+            self.assertEqual(self.convert(docx_to_html, '.docx', content), expected)
+
+    def test_golden_odt(self):
+        content = odt_package(self.ODT_TEXT, self.ODT_AUTOMATIC_STYLES, self.ODT_STYLES)
+        self.assertEqual(self.convert(legacy_odt_to_html, '.odt', content), self.ODT_HTML)
+        self.assertEqual(self.convert(odt_to_html, '.odt', content), self.ODT_HTML)
+
+    def test_corpus_matches_legacy(self):
+        legacy = {'.docx': legacy_docx_to_html, '.odt': legacy_odt_to_html}
+        streaming = {'.docx': docx_to_html, '.odt': odt_to_html}
+        for seed in range(3):
+            for index, (extension, content) in enumerate(converter_corpus(seed, documents=4, paragraphs=15, runs=6)):
+                with self.subTest(seed=seed, document=index):
+                    self.assertEqual(
+                        self.convert(streaming[extension], extension, content),
+                        self.convert(legacy[extension], extension, content),
+                    )
+
+    def test_style_cycles(self):
+        # The legacy converter raised RecursionError on these
+        styles = (
+            '<style:style style:name="A" style:family="paragraph" style:parent-style-name="B">'
+            '<style:text-properties fo:font-weight="bold"/></style:style>'
+            '<style:style style:name="B" style:family="paragraph" style:parent-style-name="A"/>'
+        )
+        content = odt_package('<text:p text:style-name="A">Loop</text:p>', styles=styles)
+        self.assertEqual(
+            self.convert(odt_to_html, '.odt', content), '<p class="odt_paragraphs" style="text-align: left;"><b>Loop</b></p>',
+        )
+
+    def test_benchmark(self):
+        results = run_converter_benchmark(converter_corpus(documents=2, paragraphs=5, runs=3))
+        self.assertEqual(set(results), {'.docx', '.odt'})
+        for result in results.values():
+            self.assertEqual((result['documents'], result['mismatches']), (1, []))
+            self.assertGreater(result['legacy_ms'], 0)
@@ -0,0 +1,226 @@
+"""
+Request/trace correlation and span timing.
+
+TraceMiddleware assigns every request a trace ID (taken from an incoming
+X-Request-ID header when present) and returns it in the X-Request-ID
+response header. The ID is stored in a context variable, added to every log
+record by TraceIdFilter, and copied into the headers of Celery tasks
+published during the request, so a task's log lines and spans carry the ID
+of the request that queued it.
+
+Spans are timed for the request or task itself, SQL queries, template
+rendering, outgoing HTTP calls made with `requests`, and SMTP sends (see
+main.tasks). Other code can add spans with `with span('name', **attrs)`. They
+are buffered per request/task and appended as JSON lines to
+settings.TRACE_FILE. When it is unset no spans are collected; requests and
+tasks still get a trace ID for their log lines.
+"""
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+from django.db import connections
+
+trace_id_var = contextvars.ContextVar('trace_id', default=None)
+_spans_var = contextvars.ContextVar('spans', default=None)
+_parent_var = contextvars.ContextVar('span_parent', default=None)
+
+_VALID_TRACE_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+_write_lock = threading.Lock()
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    return trace_id_var.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a span of the current trace. A no-op outside a trace."""
+    spans = _spans_var.get()
+    if spans is None:
+        yield attrs
+        return
+    span_id = new_id()[:16]
+    parent_token = _parent_var.set(span_id)
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs['error'] = repr(e)
+        raise
+    finally:
+        _parent_var.reset(parent_token)
+        spans.append({
+            'trace_id': trace_id_var.get(),
+            'span_id': span_id,
+            'parent_id': _parent_var.get(),
+            'name': name,
+            'start': started,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'attrs': attrs,
+        })
+
+
+def export_spans(spans):
+    path = settings.TRACE_FILE
+    if not path or not spans:
+        return
+    lines = ''.join(json.dumps(s, default=str) + '\n' for s in spans)
+    with _write_lock:
+        try:
+            with open(path, 'a') as f:
+                f.write(lines)
+        except OSError:
+            logging.getLogger(__name__).exception('Could not write spans to %s', path)
+
+
+def _db_span(execute, sql, params, many, context):
+    with span('db.query', alias=context['connection'].alias, sql=sql[:500]):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def trace(trace_id, name, **attrs):
+    """Run a request or task as a trace root: set the trace ID, time DB queries and export the spans"""
+    trace_token = trace_id_var.set(trace_id)
+    if not settings.TRACE_FILE:
+        try:
+            yield attrs
+        finally:
+            trace_id_var.reset(trace_token)
+        return
+    spans_token = _spans_var.set([])
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_db_span))
+            with span(name, **attrs) as root:
+                yield root
+    finally:
+        spans = _spans_var.get()
+        _spans_var.reset(spans_token)
+        trace_id_var.reset(trace_token)
+        export_spans(spans)
+
+
+class TraceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.headers.get('X-Request-ID', '')
+        trace_id = incoming if _VALID_TRACE_ID.match(incoming) else new_id()
+        request.trace_id = trace_id
+        with trace(trace_id, 'http.request', method=request.method, path=request.path) as root:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            root['route'] = match.route if match else None
+            root['status'] = response.status_code
+        response['X-Request-ID'] = trace_id
+        return response
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds trace_id to every log record"""
+
+    def filter(self, record):
+        if not hasattr(record, 'trace_id'):
+            record.trace_id = trace_id_var.get()
+        return True
+
+
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per log line; `extra` fields are included as top-level keys"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key not in data:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+# Instrumentation for libraries without a hook of their own
+
+def instrument():
+    """Wrap template rendering and `requests` calls in spans. Safe to call more than once."""
+    import requests
+    from django.template import Template
+
+    if getattr(Template.render, '_traced', False):
+        return
+
+    original_render = Template.render
+
+    def render(self, context):
+        with span('template.render', template=self.origin.name if self.origin else None):
+            return original_render(self, context)
+    render._traced = True
+    Template.render = render
+
+    original_send = requests.Session.send
+
+    def send(self, request, **kwargs):
+        with span('http.client', method=request.method, url=request.url.split('?')[0]) as attrs:
+            response = original_send(self, request, **kwargs)
+            attrs['status'] = response.status_code
+            return response
+    requests.Session.send = send
+
+
+# Celery propagation
+
+@before_task_publish.connect
+def _propagate_trace_id(headers=None, **kwargs):
+    trace_id = trace_id_var.get()
+    if headers is not None and trace_id:
+        headers['trace_id'] = trace_id
+
+
+_task_traces = {}
+
+
+@task_prerun.connect
+def _start_task_trace(task_id=None, task=None, **kwargs):
+    # Eagerly applied tasks are not published, so they continue the caller's trace
+    trace_id = getattr(task.request, 'trace_id', None) or trace_id_var.get() or new_id()
+    published_at = getattr(task.request, 'published_at', None)
+    attrs = {'task': task.name, 'task_id': task_id}
+    if published_at:
+        attrs['queue_wait_ms'] = round(max(0, time.time() - published_at) * 1000, 3)
+    # prerun and postrun are called from the same worker call stack, so the
+    # trace is entered here and exited in _finish_task_trace
+    task_trace = trace(trace_id, 'celery.task', **attrs)
+    root = task_trace.__enter__()
+    _task_traces[task_id] = (task_trace, root)
+
+
+@task_postrun.connect
+def _finish_task_trace(task_id=None, state=None, **kwargs):
+    entry = _task_traces.pop(task_id, None)
+    if entry is not None:
+        task_trace, root = entry
+        root['state'] = state
+        task_trace.__exit__(None, None, None)
@@ -1,7 +1,3 @@
-import docx
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.text.hyperlink import Hyperlink
-
 import zipfile
 import xml.etree.ElementTree as ET
 import os
@@ -277,8 +273,12 @@ def __process_run(r, p):
         r_text = f'<sup>{r_text}</sup>'
     return r_text
 
-def docx_to_html(file_path):
+def legacy_docx_to_html(file_path):
     """
+    The python-docx based converter that main.converters.docx_to_html()
+    replaced, kept as the reference for its golden tests and the
+    benchmark_converters command.
+
     Convert a DOCX document to HTML focusing only on basic formatting:
     - Paragraph alignment
     - Bold, italic, underline
@@ -290,6 +290,10 @@ def docx_to_html(file_path):
     Returns:
         str: HTML content of the document
     """
+    # python-docx is slow to import and only needed here, so it loads on first use
+    import docx
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.text.hyperlink import Hyperlink
 
     doc = docx.Document(file_path)
     html = ''
@@ -365,8 +369,12 @@ def __resolve_style(style_name, style_dict, style_hierarchy_dict, other_style_di
         
     return resolved_style
 
-def odt_to_html(file_path):
+def legacy_odt_to_html(file_path):
     """
+    The ElementTree based converter that main.converters.odt_to_html()
+    replaced, kept as the reference for its golden tests and the
+    benchmark_converters command.
+
     Convert an ODT document to HTML focusing only on basic formatting:
     - Paragraph alignment
     - Bold, italic, underline
@@ -0,0 +1,112 @@
+"""
+Reviewer votes on abstracts.
+
+Votes are Vote rows (reviewer, abstract, score). Abstract.vote_count and
+Abstract.vote_score are running tallies that change in the same
+transaction as the votes, so listing or ranking abstracts needs no COUNT.
+Code that adds or removes votes must go through this module; votes that
+are deleted along with their reviewer are taken out of the tallies by
+main.signals. recount_tallies() rebuilds the tallies from the votes if they
+drift.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Count
+from django.db.models.functions import Coalesce
+
+from main.models import Abstract, Attendee, Vote
+
+MAX_SCORE = 5
+
+
+class BallotError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _apply_tallies(deltas):
+    """Apply {abstract_id: (count delta, score delta)}, one UPDATE per distinct delta"""
+    groups = defaultdict(list)
+    for abstract_id, delta in deltas.items():
+        if delta != (0, 0):
+            groups[delta].append(abstract_id)
+    for (count, score), abstract_ids in groups.items():
+        Abstract.objects.filter(id__in=abstract_ids).update(
+            vote_count=F('vote_count') + count, vote_score=F('vote_score') + score,
+        )
+
+
+def _replace_votes(reviewer, votes):
+    # Locking the reviewer serializes concurrent ballots from the same reviewer
+    Attendee.objects.select_for_update().filter(id=reviewer.id).exists()
+    current = dict(Vote.objects.filter(reviewer=reviewer).values_list('abstract_id', 'score'))
+    removed = current.keys() - votes.keys()
+    if removed:
+        Vote.objects.filter(reviewer=reviewer, abstract_id__in=removed).delete()
+    changed = [
+        Vote(reviewer=reviewer, abstract_id=abstract_id, score=score)
+        for abstract_id, score in votes.items() if current.get(abstract_id) != score
+    ]
+    if changed:
+        Vote.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=['reviewer', 'abstract'], update_fields=['score'],
+        )
+    _apply_tallies({
+        abstract_id: (
+            (abstract_id in votes) - (abstract_id in current),
+            votes.get(abstract_id, 0) - current.get(abstract_id, 0),
+        )
+        for abstract_id in current.keys() | votes.keys()
+    })
+
+
+def submit_ballot(event, reviewer, votes):
+    """
+    Replace `reviewer`'s votes with `votes`, a list of (abstract_id, score).
+    The ballot is validated as a whole (Event.max_votes, scores, abstracts
+    of this event) and written in one transaction. Raises BallotError.
+    """
+    ballot = dict(votes)
+    if len(ballot) != len(votes):
+        raise BallotError('duplicate_vote', 'Each abstract can only be voted for once.')
+    if event.max_votes is not None and len(ballot) > event.max_votes:
+        raise BallotError('too_many_votes', f'You can vote for up to {event.max_votes} abstracts.')
+    if any(not 1 <= score <= MAX_SCORE for score in ballot.values()):
+        raise BallotError('invalid_score', f'Scores must be between 1 and {MAX_SCORE}.')
+    if ballot and event.abstracts.filter(id__in=ballot).count() != len(ballot):
+        raise BallotError('invalid_abstract', 'Abstract not found.')
+    with transaction.atomic():
+        _replace_votes(reviewer, ballot)
+
+
+def withdraw_votes(reviewer):
+    """Remove all votes of `reviewer`, e.g. before they stop being a reviewer or are deregistered"""
+    with transaction.atomic():
+        _replace_votes(reviewer, {})
+
+
+def release_votes(reviewer):
+    """Take `reviewer`'s votes out of the tallies, before the votes are deleted along with the reviewer"""
+    _apply_tallies({
+        abstract_id: (-1, -score)
+        for abstract_id, score in Vote.objects.filter(reviewer=reviewer).values_list('abstract_id', 'score')
+    })
+
+
+def ballot_version(votes):
+    """Version stamp of a reviewer's ballot: changes whenever a vote is added, removed or rescored"""
+    content = ','.join(f'{vote.abstract_id}:{vote.score}' for vote in sorted(votes, key=lambda vote: vote.abstract_id))
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
+
+
+def recount_tallies(event):
+    """Rebuild the vote tallies of the event's abstracts from their votes"""
+    votes = Vote.objects.filter(abstract=OuterRef('pk')).values('abstract')
+    Abstract.objects.filter(event=event).update(
+        vote_count=Coalesce(Subquery(votes.annotate(n=Count('id')).values('n'), output_field=IntegerField()), 0),
+        vote_score=Coalesce(Subquery(votes.annotate(n=Sum('score')).values('n'), output_field=IntegerField()), 0),
+    )
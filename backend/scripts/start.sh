@@ -5,7 +5,9 @@ while ! nc -z db 5432; do
 done
 
 python manage.py migrate
-python manage.py ensure_superuser
+python manage.py createcachetable
+# migrate already ran the system checks
+python manage.py ensure_superuser --skip-checks
 
 if [ "$DEBUG" = "True" ]; then
     python manage.py runserver 0.0.0.0:8080
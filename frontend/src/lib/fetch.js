@@ -2,12 +2,13 @@ import { env } from '$env/dynamic/private';
 
 const BASE_URL = env.API_BASE_URL || 'http://backend:8080/';
 
-async function send({ method, path, data, cookies }) {
+async function send({ method, path, data, cookies, extra_headers }) {
     const url = new URL(path, BASE_URL);
 
     let headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
+        ...extra_headers,
     }
 
     if (cookies) {
@@ -60,15 +61,15 @@ async function send({ method, path, data, cookies }) {
             }
         }
 
-        return { ok: response.ok, status: response.status, data: responseData, sessionid: sessionid };
+        return { ok: response.ok, status: response.status, data: responseData, sessionid: sessionid, etag: response.headers.get('etag') };
     } catch (error) {
         console.error('Fetch error:', error);
         return { ok: false, error: error.message };
     }
 }
 
-export function get(path, cookies) {
-    return send({ method: 'GET', path, cookies });
+export function get(path, cookies, extra_headers) {
+    return send({ method: 'GET', path, cookies, extra_headers });
 }
 
 export function del(path, cookies) {
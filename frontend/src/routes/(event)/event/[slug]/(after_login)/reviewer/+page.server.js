@@ -2,6 +2,34 @@ import { get, post } from '$lib/fetch';
 import { redirect } from '@sveltejs/kit';
 import { error } from '@sveltejs/kit';
 
+// Last ballot per session and event, revalidated with If-None-Match so an unchanged ballot costs a 304
+const ballots = new Map();
+const MAX_CACHED_BALLOTS = 1000;
+
+async function load_ballot(slug, cookies) {
+    const sessionid = cookies.get('sessionid');
+    const key = `${sessionid}:${slug}`;
+    const cached = sessionid ? ballots.get(key) : undefined;
+    const response = await get(
+        `api/event/${slug}/reviewer/ballot`, cookies, cached ? { 'If-None-Match': cached.etag } : {},
+    );
+    if (response.status === 304 && cached) {
+        return cached.ballot;
+    }
+    if (!response.ok || response.status !== 200) {
+        throw error(500, "Internal Server Error");
+    }
+    if (sessionid && response.etag) {
+        ballots.delete(key);
+        if (ballots.size >= MAX_CACHED_BALLOTS) {
+            // Maps iterate in insertion order, so this drops the least recently stored ballot
+            ballots.delete(ballots.keys().next().value);
+        }
+        ballots.set(key, { etag: response.etag, ballot: response.data });
+    }
+    return response.data;
+}
+
 /** @type {import('./$types').PageServerLoad} */
 export async function load({ parent, params, cookies }) {
     let rtn = await parent();
@@ -16,13 +44,10 @@ export async function load({ parent, params, cookies }) {
     }
 
     if (rtn.is_reviewer) {
-        rtn.vote = await get_data_or_500('reviewer/vote');
-        if (rtn.vote.voted_abstracts.length === 0) {
-            let abstracts = await get_data_or_500('abstracts');
-            rtn.abstracts = [];
-            for (let abstract of abstracts) {
-                rtn.abstracts.push( await get_data_or_500(`abstract/${abstract.id}`) );
-            }
+        // Only the voted abstract IDs; the abstracts, with their bodies in one request, only while there is something to vote on
+        rtn.ballot = await load_ballot(params.slug, cookies);
+        if (rtn.ballot.votes.length === 0) {
+            rtn.abstracts = await get_data_or_500('reviewer/abstracts');
         }
     } else {
         return redirect(303, `/event/${params.slug}`);